@@ -0,0 +1,389 @@
+#! /usr/bin/env python
+
+import os
+import csv
+import json
+import time
+import logging
+
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from text_terms import BATCH_SIZE, MAX_TERMS, NGRAMS, count_terms, get_month, prune
+from trends import get_week
+from util import METRICS, print_dict
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("analysis-pipeline")
+
+# Rows the CSV accumulator buffers before writing them out
+CSV_BUFFER_ROWS = 1000
+
+# Analyses register their accumulator here by name so scripts can pick which
+# ones to run. Every accumulator takes decoded IssueRecords one at a time via
+# add(), finish() is called once the stream is done and report() returns the
+# lines to log
+ACCUMULATORS = {}
+
+
+def register(name):
+    def wrap(cls):
+        cls.name = name
+        ACCUMULATORS[name] = cls
+        return cls
+
+    return wrap
+
+
+# Feed every issue to every accumulator in a single pass. Issues can be any
+# iterable so a stream of pages never has to be held in memory. Only the time
+# spent in the accumulators counts towards the analysis span, not the time
+# waiting on a stream
+def run_pipeline(issues, accumulators):
+    start = time.time()
+    busy = 0.0
+    count = 0
+    for issue in issues:
+        count += 1
+        issue_start = time.perf_counter()
+        for accumulator in accumulators:
+            accumulator.add(issue)
+        busy += time.perf_counter() - issue_start
+    finish_start = time.perf_counter()
+    for accumulator in accumulators:
+        accumulator.finish()
+    METRICS.record("analysis", busy + time.perf_counter() - finish_start)
+    METRICS.incr("issues_analyzed", count)
+    logger.info(
+        "Ran %s over %d issues in %.2fs",
+        ", ".join(accumulator.name for accumulator in accumulators) or "no analyses",
+        count,
+        time.time() - start,
+    )
+    return accumulators
+
+
+# Feed every issue to the accumulators of each period its date falls in, in a
+# single pass. Periods have a start (inclusive) and end (exclusive) formatted
+# like the dates get_date returns so they compare as strings, and can overlap.
+# Returns a list of accumulators per period
+def run_period_pipeline(issues, periods, get_date, make_accumulators):
+    start = time.time()
+    bounds = [(period["start"], period["end"]) for period in periods]
+    period_accumulators = [make_accumulators() for _ in periods]
+    busy = 0.0
+    count = 0
+    for issue in issues:
+        count += 1
+        issue_start = time.perf_counter()
+        date = get_date(issue)
+        if date is None:
+            continue
+        for (period_start, period_end), accumulators in zip(
+            bounds, period_accumulators
+        ):
+            if period_start <= date < period_end:
+                for accumulator in accumulators:
+                    accumulator.add(issue)
+        busy += time.perf_counter() - issue_start
+    finish_start = time.perf_counter()
+    for accumulators in period_accumulators:
+        for accumulator in accumulators:
+            accumulator.finish()
+    METRICS.record("analysis", busy + time.perf_counter() - finish_start)
+    METRICS.incr("issues_analyzed", count)
+    logger.info(
+        "Ran analyses for %d periods over %d issues in %.2fs",
+        len(periods),
+        count,
+        time.time() - start,
+    )
+    return period_accumulators
+
+
+# Write pages of issues to a CSV as they arrive and pass the issues on so the
+# same stream can feed other accumulators. Each page is flushed and the next
+# page number is kept in <fn>.progress so an interrupted export can continue
+# from where it stopped with resume_page()
+def export_csv_pages(pages, fn, header, get_row, query, start_page=0):
+    progress_fn = fn + ".progress"
+    mode = "a" if start_page else "w"
+    page_num = start_page
+    with open(fn, mode, newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if not start_page:
+            w.writerow(header)
+        for issues in pages:
+            with METRICS.span("csv_write"):
+                w.writerows([get_row(issue) for issue in issues])
+                f.flush()
+            page_num += 1
+            with open(progress_fn, "w") as p:
+                json.dump({"query": query, "next_page": page_num}, p)
+            logger.debug("Wrote page %d to %s", page_num - 1, fn)
+            yield from issues
+    os.remove(progress_fn)
+    logger.info("Finished writing %s", fn)
+
+
+# Page to continue an interrupted export of the same query from, 0 if there's
+# nothing to resume
+def resume_page(fn, query):
+    progress_fn = fn + ".progress"
+    if not os.path.exists(progress_fn):
+        return 0
+    with open(progress_fn, "r") as p:
+        progress = json.load(p)
+    if progress["query"] != query:
+        logger.warning("%s is from a different query, starting over", progress_fn)
+        return 0
+    logger.info("Resuming %s from page %d", fn, progress["next_page"])
+    return progress["next_page"]
+
+
+class Accumulator:
+    name = None
+
+    def add(self, issue):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def report(self):
+        return []
+
+
+# Write every issue to a CSV using the row builder of the script's JiraAnalysis.
+# Rows are buffered and written CSV_BUFFER_ROWS at a time
+@register("write_issues")
+class CsvAccumulator(Accumulator):
+    def __init__(self, fn, header, get_row):
+        self.get_row = get_row
+        self.rows = []
+        self.f = open(fn, "w", newline="", encoding="utf-8")
+        self.w = csv.writer(self.f)
+        self.w.writerow(header)
+
+    def add(self, issue):
+        self.rows.append(self.get_row(issue))
+        if len(self.rows) >= CSV_BUFFER_ROWS:
+            self.flush()
+
+    def flush(self):
+        with METRICS.span("csv_write"):
+            self.w.writerows(self.rows)
+        self.rows = []
+
+    def finish(self):
+        self.flush()
+        self.f.close()
+
+
+# Count and story points per priority
+@register("priorities")
+class PriorityAccumulator(Accumulator):
+    def __init__(self):
+        self.priority_count = Counter()
+        self.priority_story_points = defaultdict(float)
+        self.no_priority_stories = []
+
+    def add(self, issue):
+        priority = issue.priority
+        if priority is not None:
+            self.priority_count.update([priority])
+            self.priority_story_points[priority] += float(issue.story_points)
+        else:
+            self.no_priority_stories.append(issue)
+
+    def report(self):
+        lines = [
+            "Priority counts",
+            print_dict(self.priority_count, "\n"),
+            "Priority story points",
+            print_dict(self.priority_story_points, "\n"),
+            "No priorities",
+        ]
+        for issue in self.no_priority_stories:
+            lines.append("\t %s %s" % (issue, issue.summary))
+        return lines
+
+
+# Number of sprints it takes a team to finish a story
+@register("sprint_lag")
+class SprintLagAccumulator(Accumulator):
+    def __init__(self):
+        self.team_sprint_counts = defaultdict(list)
+        self.team_sprint_story_point_sum = defaultdict(float)
+        self.team_story_point_sum = defaultdict(float)
+        self.team_bugs = defaultdict(int)
+
+    def add(self, issue):
+        team = issue.team
+        num_sprints = len(issue.sprints or ())
+        story_points = issue.story_points
+        issue_type = issue.issue_type
+
+        # Has a team and was actually done via sprint process
+        if team and num_sprints > 0 and issue_type == "story":
+            self.team_sprint_counts[team].append(num_sprints)
+
+            if story_points > 0:
+                self.team_sprint_story_point_sum[team] += num_sprints * story_points
+                self.team_story_point_sum[team] += story_points
+
+        if issue_type == "bug":
+            self.team_bugs[team] += 1
+
+    def report(self):
+        lines = ["Team\tSprint Lag\tSP Sprint Lag\tBugs"]
+        for team, counts in self.team_sprint_counts.items():
+            if self.team_sprint_story_point_sum[team] > 0:
+                lines.append(
+                    "%s\t%s\t%s\t%s"
+                    % (
+                        team,
+                        sum(counts) * 1.0 / len(counts),
+                        self.team_sprint_story_point_sum[team]
+                        / self.team_story_point_sum[team],
+                        self.team_bugs[team],
+                    )
+                )
+            else:
+                lines.append("%s\tNA\tNA\t%s" % (team, self.team_bugs[team]))
+        return lines
+
+
+# Story points done per assignee
+@register("story_points")
+class StoryPointAccumulator(Accumulator):
+    def __init__(self):
+        self.user_story_point_sum = Counter()
+        self.user_data = {}
+
+    def add(self, issue):
+        story_points = issue.story_points
+        assignee = issue.assignee
+        self.user_story_point_sum.update({assignee: int(story_points)})
+        if assignee not in self.user_data:
+            self.user_data[assignee] = defaultdict(int)
+        issue_type = issue.issue_type
+        self.user_data[assignee][issue_type + "_cnt"] += 1
+        self.user_data[assignee][issue_type + "_story_points"] += int(story_points)
+
+    def report(self):
+        lines = ["User\tSP\tStories\tBugs"]
+        for user, story_points in self.user_story_point_sum.most_common(100):
+            lines.append("%s\t%s\t%s" % (user, story_points, self.user_data[user]))
+        return lines
+
+
+# Weekly cells for the trend cube keyed by (week, team, assignee, issue type,
+# investment area) with [issues, story points, sprints], by resolution week
+@register("trends")
+class TrendAccumulator(Accumulator):
+    def __init__(self):
+        self.cells = defaultdict(lambda: [0, 0.0, 0])
+        self.day_weeks = {}
+
+    def add(self, issue):
+        if not issue.resolutiondate:
+            return
+        # Jira dates are in the user's timezone, so the day is the local one
+        day = issue.resolutiondate[:10]
+        week = self.day_weeks.get(day)
+        if week is None:
+            week = self.day_weeks[day] = get_week(datetime.strptime(day, "%Y-%m-%d"))
+        cell = self.cells[
+            (
+                week,
+                issue.team or "",
+                issue.assignee or "",
+                issue.issue_type or "",
+                ",".join(issue.investment_area or ()),
+            )
+        ]
+        cell[0] += 1
+        cell[1] += float(issue.story_points or 0)
+        cell[2] += len(issue.sprints or ())
+
+    def report(self):
+        weeks = set(key[0] for key in self.cells)
+        return ["Trend cube: %d cells over %d weeks" % (len(self.cells), len(weeks))]
+
+
+# Term and n-gram counts of summaries and descriptions per month by resolution
+# date. Texts are tokenized in batches, across a pool of workers processes when
+# there's more than one, with a bounded number of batches in flight and counts
+# pruned to the most common terms so memory doesn't grow with the corpus
+@register("terms")
+class TermAccumulator(Accumulator):
+    def __init__(
+        self, workers=1, ngrams=NGRAMS, max_terms=MAX_TERMS, batch_size=BATCH_SIZE
+    ):
+        self.workers = workers
+        self.ngrams = ngrams
+        self.max_terms = max_terms
+        self.batch_size = batch_size
+        self.counts = {}
+        self.batches = defaultdict(list)
+        self.pending = deque()
+        self.executor = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    def add(self, issue):
+        if not issue.resolutiondate:
+            return
+        period = get_month(issue.resolutiondate)
+        batch = self.batches[period]
+        batch.append(issue.summary)
+        batch.append(issue.description)
+        if len(batch) >= self.batch_size:
+            self.batches[period] = []
+            self.submit(period, batch)
+
+    def submit(self, period, texts):
+        if self.executor is None:
+            self.merge(period, count_terms(texts, self.ngrams))
+            return
+        self.pending.append(
+            (period, self.executor.submit(count_terms, texts, self.ngrams))
+        )
+        while len(self.pending) > 2 * self.workers:
+            period, future = self.pending.popleft()
+            self.merge(period, future.result())
+
+    def merge(self, period, counts):
+        period_counts = self.counts.setdefault(
+            period, {n: Counter() for n in self.ngrams}
+        )
+        for n, counter in counts.items():
+            period_counts[n].update(counter)
+            period_counts[n] = prune(period_counts[n], self.max_terms)
+
+    def finish(self):
+        for period, batch in self.batches.items():
+            if batch:
+                self.submit(period, batch)
+        self.batches.clear()
+        while self.pending:
+            period, future = self.pending.popleft()
+            self.merge(period, future.result())
+        if self.executor is not None:
+            self.executor.shutdown()
+        for period_counts in self.counts.values():
+            for n, counter in period_counts.items():
+                if len(counter) > self.max_terms:
+                    period_counts[n] = Counter(
+                        dict(counter.most_common(self.max_terms))
+                    )
+
+    def report(self):
+        totals = Counter()
+        for period_counts in self.counts.values():
+            totals.update(period_counts.get(1, {}))
+        lines = ["Top terms over %d months" % len(self.counts)]
+        for term, count in totals.most_common(20):
+            lines.append("%s\t%s" % (term, count))
+        return lines
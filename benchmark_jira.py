@@ -0,0 +1,270 @@
+#! /usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import getopt
+import logging
+import resource
+import platform
+import tempfile
+import subprocess
+import urllib.request
+
+from datetime import datetime
+
+from fake_jira import DEFAULT_PORT, TEAMS
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("benchmark-jira")
+
+START_DATE = "2022-01-01"
+END_DATE = "2023-01-01"
+ANALYSES = ["write_issues", "priorities", "sprint_lag", "story_points"]
+SERVER_START_TIMEOUT = 30
+
+
+def make_jira_analysis(url, workers):
+    import jira_analysis
+
+    return jira_analysis.JiraAnalysis(
+        url, "user", "token", TEAMS, workers, None, False, ANALYSES
+    )
+
+
+def make_epic_analysis(url, workers):
+    import jira_epic_stories
+
+    return jira_epic_stories.JiraAnalysis(url, "user", "token", TEAMS, workers)
+
+
+def run_epic_summary(ea, fn):
+    query = ea.get_issue_query(START_DATE, END_DATE)
+    return ea.summarize_by_epic(ea.get_issues(query))
+
+
+# Each case builds one of the JiraAnalysis classes and runs a method on it
+CASES = {
+    "analysis.get_issues": (
+        make_jira_analysis,
+        lambda ja, fn: ja.get_issues(ja.get_issue_query(START_DATE, END_DATE)),
+    ),
+    "analysis.write_issues": (
+        make_jira_analysis,
+        lambda ja, fn: ja.write_issues(START_DATE, END_DATE, fn),
+    ),
+    "analysis.run_analyses": (
+        make_jira_analysis,
+        lambda ja, fn: ja.run_analyses(START_DATE, END_DATE, ANALYSES, fn, cache=False),
+    ),
+    "epic.get_issues": (
+        make_epic_analysis,
+        lambda ea, fn: ea.get_issues(ea.get_issue_query(START_DATE, END_DATE)),
+    ),
+    "epic.write_issues": (
+        make_epic_analysis,
+        lambda ea, fn: ea.write_issues(fn, START_DATE, END_DATE),
+    ),
+    "epic.summarize_by_epic": (make_epic_analysis, run_epic_summary),
+}
+
+
+def server_request(port, path, method="GET"):
+    request = urllib.request.Request(
+        "http://127.0.0.1:%d%s" % (port, path), method=method
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+# Start fake_jira.py in its own process so it doesn't share a GIL or memory
+# with what's being measured
+def start_server(num_issues, num_epics, port, extra_args=()):
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_jira.py"),
+            "--issues",
+            str(num_issues),
+            "--epics",
+            str(num_epics),
+            "--port",
+            str(port),
+        ]
+        + list(extra_args),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    start = time.time()
+    while time.time() - start < SERVER_START_TIMEOUT:
+        try:
+            server_request(port, "/_stats")
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise Exception("Fake Jira didn't start on port %d" % port)
+
+
+# Run a single case in this process and print its timings as JSON. Peak RSS
+# covers the whole process so every case runs in a fresh one
+def run_case(case, port, workers):
+    make, run = CASES[case]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.time()
+        analysis = make("http://127.0.0.1:%d" % port, workers)
+        run(analysis, os.path.join(tmp, "issues.csv"))
+        wall_time = time.time() - start
+    print(
+        json.dumps(
+            {
+                "wall_time": wall_time,
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                / 1024.0,
+            }
+        )
+    )
+
+
+def measure_case(case, port, workers):
+    server_request(port, "/_stats/reset", "POST")
+    output = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--run-case",
+            case,
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    result = json.loads(output.stdout.decode("utf-8").strip().split("\n")[-1])
+    stats = server_request(port, "/_stats")
+    result.update(
+        {
+            "case": case,
+            "requests": stats["requests"],
+            "bytes_received": stats["bytes_sent"],
+            "bytes_sent": stats["bytes_received"],
+            "writes": stats["updates"] + stats["bulk_edits"],
+        }
+    )
+    logger.info(
+        "%s: %.2fs, %d requests, %.1f MB received, peak RSS %.1f MB",
+        case,
+        result["wall_time"],
+        result["requests"],
+        result["bytes_received"] / 1e6,
+        result["peak_rss_mb"],
+    )
+    return result
+
+
+def get_git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Append a run to the results file so runs can be compared over time
+def save_results(fn, run):
+    runs = []
+    if os.path.exists(fn):
+        with open(fn, "r") as f:
+            runs = json.load(f)
+    runs.append(run)
+    with open(fn, "w") as f:
+        json.dump(runs, f, indent=2)
+    logger.info("Saved results to %s", fn)
+
+
+if __name__ == "__main__":
+    sizes = [1000, 10000]
+    num_epics = 500
+    cases = list(CASES)
+    port = DEFAULT_PORT
+    workers = 4
+    output = "benchmark_results.json"
+    case_to_run = None
+
+    usage = (
+        "benchmark_jira.py --issues <count,count> --epics <count> --cases <case,case> "
+        "--port <port> --workers <count> --output <file>"
+    )
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "h",
+            [
+                "issues=",
+                "epics=",
+                "cases=",
+                "port=",
+                "workers=",
+                "output=",
+                "run-case=",
+            ],
+        )
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(usage)
+            print("Cases: %s" % ", ".join(CASES))
+            sys.exit()
+        elif opt == "--issues":
+            sizes = [int(size) for size in arg.split(",")]
+        elif opt == "--epics":
+            num_epics = int(arg)
+        elif opt == "--cases":
+            cases = arg.split(",")
+        elif opt == "--port":
+            port = int(arg)
+        elif opt == "--workers":
+            workers = int(arg)
+        elif opt == "--output":
+            output = arg
+        elif opt == "--run-case":
+            case_to_run = arg
+
+    if case_to_run:
+        run_case(case_to_run, port, workers)
+        sys.exit()
+
+    for case in cases:
+        if case not in CASES:
+            raise Exception("Unknown case %s, pick from %s" % (case, ", ".join(CASES)))
+
+    run = {
+        "started_at": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "workers": workers,
+        "results": [],
+    }
+    for num_issues in sizes:
+        logger.info("Benchmarking against %d issues", num_issues)
+        server = start_server(num_issues, num_epics, port)
+        try:
+            for case in cases:
+                result = measure_case(case, port, workers)
+                result["issues"] = num_issues
+                run["results"].append(result)
+        finally:
+            server.terminate()
+            server.wait()
+    save_results(output, run)
@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+
+import sys
+import time
+import random
+import logging
+
+from label_rules import LabelClassifier, get_default_rules
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("benchmark-labels")
+
+TEAM_LABELS = ["Backend", "Frontend", "Data", "Mobile", "Platform", "Growth"]
+OTHER_LABELS = ["tech-debt", "customer", "oncall", "security", "ux", "needs-qa"]
+
+
+# The team lookup the scripts used before the label rules
+def legacy_team(labels, team_labels):
+    for label in labels:
+        for team_label in team_labels:
+            if team_label.lower() == label.lower():
+                return team_label
+    return None
+
+
+# The priority lookup the scripts used before the label rules
+def legacy_priority(labels):
+    for label in labels:
+        if "2018:q1:" in label.lower() or "2018:q2" in label.lower():
+            try:
+                return int(label.split(":")[-1])
+            except:
+                return 100
+    return 100
+
+
+# Label sets that look like ours: a team, a priority and a few other labels
+def make_issues(num_issues, seed=0):
+    rng = random.Random(seed)
+    issues = []
+    for _ in range(num_issues):
+        labels = rng.sample(OTHER_LABELS, rng.randint(0, 3))
+        if rng.random() < 0.8:
+            labels.append(rng.choice(TEAM_LABELS).lower())
+        if rng.random() < 0.6:
+            labels.append("2018:q%d:%d" % (rng.randint(1, 2), rng.randint(1, 5)))
+        rng.shuffle(labels)
+        issues.append(labels)
+    return issues
+
+
+def time_it(name, fn, issues):
+    start = time.time()
+    results = [fn(labels) for labels in issues]
+    elapsed = time.time() - start
+    logger.info(
+        "%s: %.3fs (%.2fus per issue)", name, elapsed, elapsed / len(issues) * 1e6
+    )
+    return results, elapsed
+
+
+if __name__ == "__main__":
+    num_issues = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    issues = make_issues(num_issues)
+    logger.info("Classifying %d synthetic issues", num_issues)
+
+    legacy, legacy_time = time_it(
+        "Legacy loops",
+        lambda labels: (legacy_team(labels, TEAM_LABELS), legacy_priority(labels)),
+        issues,
+    )
+
+    start = time.time()
+    classifier = LabelClassifier(get_default_rules(TEAM_LABELS))
+    logger.info("Compiled label rules in %.4fs", time.time() - start)
+
+    def classify(labels):
+        classes = classifier.classify(labels)
+        return classes["team"], classes["priority"]
+
+    compiled, compiled_time = time_it("Compiled rules", classify, issues)
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+    if mismatches:
+        raise Exception("%d issues classified differently" % mismatches)
+    logger.info(
+        "Same results for all %d issues, %.1fx faster",
+        num_issues,
+        legacy_time / compiled_time,
+    )
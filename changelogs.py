@@ -0,0 +1,232 @@
+#! /usr/bin/env python
+
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from jira.exceptions import JIRAError
+
+from jira_helper import fetch_all_pages
+from periods import parse_jira_dates
+from util import METRICS
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("changelogs")
+
+# Issues per key in (...) search when fetching changelogs
+KEY_CHUNK_SIZE = 100
+CHANGELOG_PAGE_SIZE = 100
+# Work starts the first time an issue moves into one of these statuses and is
+# done the last time it moves into one of the done statuses
+START_STATUSES = ("in progress",)
+DONE_STATUSES = ("done",)
+PERCENTILES = (50, 85, 95)
+MS_PER_DAY = 24 * 60 * 60 * 1000.0
+
+
+# The status changes in changelog histories as [when, from, to]
+def get_status_transitions(histories):
+    transitions = []
+    for history in histories:
+        for item in history.get("items", ()):
+            if item.get("field") == "status":
+                transitions.append(
+                    [history["created"], item.get("fromString"), item.get("toString")]
+                )
+    return transitions
+
+
+# Searches only include the first page of an issue's changelog, page through the
+# rest with the changelog endpoint (Jira Cloud)
+def fetch_remaining_histories(jira, key, start_at):
+    histories = []
+    while True:
+        try:
+            response = jira._session.get(
+                jira._get_url("issue/%s/changelog" % key),
+                params={"startAt": start_at, "maxResults": CHANGELOG_PAGE_SIZE},
+            )
+        except JIRAError as e:
+            logger.warning("Couldn't page through the changelog of %s: %s", key, e)
+            return histories
+        page = response.json()
+        values = page.get("values", [])
+        histories.extend(values)
+        start_at += len(values)
+        if page.get("isLast", True) or not values:
+            return histories
+
+
+# Fetch the changelogs of issues with expand=changelog on key in (...) searches,
+# up to max_workers searches at a time. Returns {key: (updated, transitions)}
+def fetch_changelogs(jira, keys, max_workers=1):
+    chunks = [keys[i : i + KEY_CHUNK_SIZE] for i in range(0, len(keys), KEY_CHUNK_SIZE)]
+
+    def fetch_chunk(chunk):
+        return fetch_all_pages(
+            jira,
+            "key in (%s)" % ",".join(chunk),
+            fields=["updated"],
+            raw=True,
+            expand="changelog",
+        )
+
+    changelogs = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for issues in executor.map(fetch_chunk, chunks):
+            for issue in issues:
+                raw = issue.raw
+                changelog = raw.get("changelog", {})
+                histories = changelog.get("histories", [])
+                if changelog.get("total", 0) > len(histories):
+                    histories = histories + fetch_remaining_histories(
+                        jira, raw["key"], len(histories)
+                    )
+                changelogs[raw["key"]] = (
+                    raw.get("fields", {}).get("updated"),
+                    get_status_transitions(histories),
+                )
+    return changelogs
+
+
+# Status transitions for the issues, {key: transitions}. Changelogs are kept in
+# the store and only fetched for issues updated since theirs was fetched
+def sync_changelogs(jira, store, issues, max_workers=1):
+    updated = {str(issue.key): issue.updated for issue in issues}
+    stored = store.get_updated(updated) if store is not None else {}
+    stale = [key for key, value in updated.items() if stored.get(key) != value]
+    METRICS.incr("changelog_store_hits", len(updated) - len(stale))
+    METRICS.incr("changelog_store_misses", len(stale))
+    logger.info(
+        "Fetching changelogs for %d of %d issues, the rest are stored",
+        len(stale),
+        len(updated),
+    )
+    with METRICS.span("changelog_fetch"):
+        changelogs = fetch_changelogs(jira, stale, max_workers) if stale else {}
+    if store is None:
+        return {key: transitions for key, (_, transitions) in changelogs.items()}
+    store.save(changelogs)
+    return store.load(updated)
+
+
+# Every transition of every issue as flat arrays: the index of the issue, when
+# it happened (ms since the epoch in UTC) and the status it moved to
+def get_transition_table(keys, transitions):
+    issue_idx = []
+    times = []
+    statuses = []
+    for i, key in enumerate(keys):
+        for when, _, to_status in transitions.get(key, ()):
+            issue_idx.append(i)
+            times.append(when)
+            statuses.append((to_status or "").lower())
+    return (
+        np.array(issue_idx, dtype=np.int64),
+        parse_jira_dates(times).astype(np.int64),
+        np.array(statuses, dtype=str),
+    )
+
+
+# Cycle time (first start to last done) and lead time (created to last done) in
+# days for every issue, NaN where it can't be worked out. Issues without a done
+# transition fall back to their resolution date
+def get_cycle_times(
+    issues, transitions, start_statuses=START_STATUSES, done_statuses=DONE_STATUSES
+):
+    keys = [str(issue.key) for issue in issues]
+    issue_idx, times, statuses = get_transition_table(keys, transitions)
+
+    started = np.isin(statuses, [status.lower() for status in start_statuses])
+    first_start = np.full(len(keys), np.iinfo(np.int64).max)
+    np.minimum.at(first_start, issue_idx[started], times[started])
+    finished = np.isin(statuses, [status.lower() for status in done_statuses])
+    last_done = np.full(len(keys), np.iinfo(np.int64).min)
+    np.maximum.at(last_done, issue_idx[finished], times[finished])
+
+    resolved = parse_jira_dates([issue.resolutiondate for issue in issues])
+    created = parse_jira_dates([issue.created for issue in issues])
+    has_done = last_done != np.iinfo(np.int64).min
+    done = np.where(has_done, last_done, resolved.astype(np.int64))
+    done_ok = has_done | ~np.isnat(resolved)
+
+    cycle = np.where(
+        done_ok & (first_start != np.iinfo(np.int64).max) & (first_start <= done),
+        (done - first_start) / MS_PER_DAY,
+        np.nan,
+    )
+    lead = np.where(
+        done_ok & ~np.isnat(created),
+        (done - created.astype(np.int64)) / MS_PER_DAY,
+        np.nan,
+    )
+    return cycle, lead
+
+
+# Linear interpolated percentiles of values per group in one sort, the same as
+# np.percentile per group. Returns the count per group and a groups x
+# percentiles array, NaN for groups without values
+def group_percentiles(groups, values, num_groups, percentiles=PERCENTILES):
+    found = ~np.isnan(values)
+    groups = groups[found]
+    values = values[found]
+    order = np.lexsort((values, groups))
+    groups = groups[order]
+    values = values[order]
+
+    counts = np.bincount(groups, minlength=num_groups)
+    starts = np.cumsum(counts) - counts
+    result = np.full((num_groups, len(percentiles)), np.nan)
+    has = counts > 0
+    positions = starts[has, None] + (counts[has, None] - 1) * (
+        np.array(percentiles) / 100.0
+    )
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+    result[has] = values[lower] * (1 - fraction) + values[upper] * fraction
+    return counts, result
+
+
+# Cycle and lead time percentiles per team, {team: {"cycle": (count,
+# percentiles), "lead": (count, percentiles)}}
+def get_team_cycle_stats(teams, cycle, lead, percentiles=PERCENTILES):
+    names, groups = np.unique(
+        np.array([team or "None" for team in teams], dtype=str), return_inverse=True
+    )
+    cycle_counts, cycle_percentiles = group_percentiles(
+        groups, cycle, len(names), percentiles
+    )
+    lead_counts, lead_percentiles = group_percentiles(
+        groups, lead, len(names), percentiles
+    )
+    return {
+        name: {
+            "cycle": (int(cycle_counts[i]), cycle_percentiles[i].tolist()),
+            "lead": (int(lead_counts[i]), lead_percentiles[i].tolist()),
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def report_cycle_stats(stats, percentiles=PERCENTILES):
+    columns = ["p%d" % p for p in percentiles]
+    lines = [
+        "\t".join(
+            ["Team", "Cycle Issues"]
+            + ["Cycle " + c for c in columns]
+            + ["Lead Issues"]
+            + ["Lead " + c for c in columns]
+        )
+    ]
+    for team, team_stats in sorted(stats.items()):
+        row = [team]
+        for measure in ("cycle", "lead"):
+            count, values = team_stats[measure]
+            row.append(str(count))
+            row.extend("NA" if np.isnan(v) else "%.1f" % v for v in values)
+        lines.append("\t".join(row))
+    return lines
@@ -0,0 +1,572 @@
+#! /usr/bin/env python
+
+import json
+import time
+import heapq
+import itertools
+import random
+import logging
+
+from math import ceil
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+from requests.adapters import HTTPAdapter
+
+from jira_helper import fetch_all_pages
+from util import METRICS
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("epic-updates")
+
+# Keys per search so the JQL stays well under URL length limits
+KEY_CHUNK_SIZE = 200
+
+# Writes start at START_WRITE_WORKERS in flight and grow towards
+# MAX_WRITE_WORKERS for as long as Jira keeps accepting them
+START_WRITE_WORKERS = 4
+MAX_WRITE_WORKERS = 16
+MAX_WRITE_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# Jira Cloud's bulk edit API sets fields on up to BULK_MAX_ISSUES issues in one
+# request. The edit runs as a task on the server that we poll until it's done
+JIRA_V3_URL = "{server}/rest/api/3/{path}"
+BULK_MAX_ISSUES = 1000
+BULK_POLL_INTERVAL = 0.5
+BULK_POLL_TIMEOUT = 300
+BULK_DONE_STATUSES = ("COMPLETE", "FAILED", "CANCELLED", "DEAD")
+# Statuses that mean the server doesn't have the bulk edit API (Server/DC)
+BULK_UNAVAILABLE_STATUSES = (404, 405, 501)
+# A bulk edit is a POST and at least one poll of its task BULK_POLL_INTERVAL
+# later, which takes about as long as this many single PUTs
+BULK_EDIT_COST = 4
+
+
+# Current values of the given fields for every epic, keyed by epic id. The epics
+# are read with one paginated key in (...) search rather than a GET per epic
+def get_current_values(jira, epic_ids, fields, max_workers=1):
+    epic_ids = sorted(epic_ids)
+    current = {}
+    for i in range(0, len(epic_ids), KEY_CHUNK_SIZE):
+        chunk = epic_ids[i : i + KEY_CHUNK_SIZE]
+        query = "key in (%s)" % ", ".join('"%s"' % epic_id for epic_id in chunk)
+        for epic in fetch_all_pages(jira, query, max_workers, fields, raw=True):
+            current[epic.raw["key"]] = epic.raw.get("fields", {})
+    return current
+
+
+# Jira hands numbers back as floats so 15 and 15.0 are the same value
+def values_equal(current, new):
+    if isinstance(current, (int, float)) and isinstance(new, (int, float)):
+        return abs(current - new) < 1e-9
+    return current == new
+
+
+# Work out which epic fields actually need writing. updates maps epic id to the
+# fields we want it to have and the result only keeps the epics and fields whose
+# value in Jira is different, along with how many writes were skipped
+def plan_epic_updates(jira, updates, max_workers=1):
+    fields = sorted(
+        {field for epic_fields in updates.values() for field in epic_fields}
+    )
+    current = get_current_values(jira, updates, fields, max_workers)
+
+    planned = {}
+    for epic_id, epic_fields in updates.items():
+        existing = current.get(epic_id, {})
+        changed = {
+            field: value
+            for field, value in epic_fields.items()
+            if not values_equal(existing.get(field), value)
+        }
+        if changed:
+            planned[epic_id] = changed
+
+    skipped = len(updates) - len(planned)
+    logger.info(
+        "Skipping %d of %d epic writes with no changes, %d to update",
+        skipped,
+        len(updates),
+        len(planned),
+    )
+    return planned, skipped
+
+
+# Write fields to an issue with a single PUT and without notifying watchers.
+# Unlike jira.issue(...).update(...) this doesn't GET the issue first
+def put_issue_fields(jira, issue_id, fields):
+    response = jira._session.put(
+        jira._get_url("issue/%s" % issue_id),
+        params={"notifyUsers": "false"},
+        data=json.dumps({"fields": fields}),
+    )
+    return response
+
+
+# Seconds Jira asked us to wait, either a number or an HTTP date. None if the
+# response didn't say
+def get_retry_after(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Jira Cloud flags responses once a client gets close to its rate limit
+def is_near_limit(response):
+    if response is None:
+        return False
+    if response.headers.get("X-RateLimit-NearLimit", "").lower() == "true":
+        return True
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    return remaining is not None and remaining.isdigit() and int(remaining) == 0
+
+
+# Runs writes with as much concurrency as Jira allows. The number of writes in
+# flight grows by one for every window that succeeds and halves when Jira
+# throttles us (AIMD). Throttled and failed writes are retried with exponential
+# backoff, waiting at least as long as any Retry-After header asks, and writes
+# that are rejected outright or run out of retries are reported as failed.
+# on_applied is called with the id of every write as soon as it succeeds
+class WriteScheduler:
+    def __init__(
+        self,
+        write,
+        max_workers=MAX_WRITE_WORKERS,
+        start_workers=START_WRITE_WORKERS,
+        max_retries=MAX_WRITE_RETRIES,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        on_applied=None,
+    ):
+        self.write = write
+        self.on_applied = on_applied
+        self.max_workers = max_workers
+        self.limit = float(min(start_workers, max_workers))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.applied = 0
+        self.retried = 0
+        self.failed = []
+        self.sequence = itertools.count()
+
+    def increase(self):
+        self.limit = min(self.max_workers, self.limit + 1.0 / self.limit)
+
+    # Only back off once per round of writes, the ones already in flight when we
+    # backed off were sent at the old rate and say nothing new
+    def decrease(self, submitted_at):
+        if submitted_at < self.last_decrease:
+            return
+        self.limit = max(1.0, self.limit / 2)
+        self.last_decrease = time.time()
+        logger.info("Throttled, lowering write concurrency to %d", int(self.limit))
+
+    def get_delay(self, attempt, response):
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        delay *= 0.5 + random.random() / 2
+        retry_after = get_retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    # writes maps an issue id to the fields to write. Returns a summary of how
+    # many writes were applied, how many retries it took and which ones failed
+    def run(self, writes, log_failures=True):
+        pending = deque((issue_id, fields, 0) for issue_id, fields in writes.items())
+        delayed = []
+        in_flight = {}
+        failed_before = len(self.failed)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        start = time.time()
+        try:
+            while pending or delayed or in_flight:
+                now = time.time()
+                while delayed and delayed[0][0] <= now:
+                    pending.append(heapq.heappop(delayed)[2])
+
+                if now >= self.paused_until:
+                    while pending and len(in_flight) < int(self.limit):
+                        write = pending.popleft()
+                        future = executor.submit(self.write, write[0], write[1])
+                        in_flight[future] = (write, time.time())
+
+                # Only wake for the end of a pause if there's room to send
+                # pending writes then, otherwise wait for a write to finish
+                wake_at = []
+                if (
+                    pending
+                    and self.paused_until > now
+                    and len(in_flight) < int(self.limit)
+                ):
+                    wake_at.append(self.paused_until)
+                if delayed:
+                    wake_at.append(delayed[0][0])
+                timeout = max(0.0, min(wake_at) - now) if wake_at else None
+                if not in_flight:
+                    time.sleep(timeout or 0)
+                    continue
+
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write, submitted_at = in_flight.pop(future)
+                    self.handle(future, write, submitted_at, delayed)
+        finally:
+            executor.shutdown(wait=True)
+
+        summary = {
+            "applied": self.applied,
+            "retried": self.retried,
+            "failed": len(self.failed),
+        }
+        logger.info(
+            "Writes applied %d, retried %d, failed %d in %.2fs",
+            self.applied,
+            self.retried,
+            len(self.failed),
+            time.time() - start,
+        )
+        if log_failures:
+            self.log_failures(self.failed[failed_before:])
+        return summary
+
+    def log_failures(self, failures):
+        for issue_id, e in failures:
+            logger.error("Failed updating %s: %s", issue_id, e)
+
+    def handle(self, future, write, submitted_at, delayed):
+        issue_id, fields, attempt = write
+        try:
+            response = future.result()
+        except Exception as e:
+            response = getattr(e, "response", None)
+            status = getattr(e, "status_code", None)
+            throttled = status in (429, 503)
+            # Anything else Jira rejected won't succeed by asking again
+            retryable = status is None or throttled or status >= 500
+            if not retryable or attempt >= self.max_retries:
+                self.failed.append((issue_id, e))
+                return
+
+            if throttled:
+                self.decrease(submitted_at)
+            delay = self.get_delay(attempt, response)
+            if throttled and get_retry_after(response) is not None:
+                self.paused_until = max(self.paused_until, time.time() + delay)
+            logger.debug("Retrying %s in %.2fs: %s", issue_id, delay, e)
+            self.retried += 1
+            heapq.heappush(
+                delayed,
+                (
+                    time.time() + delay,
+                    next(self.sequence),
+                    (issue_id, fields, attempt + 1),
+                ),
+            )
+            return
+
+        self.applied += 1
+        if self.on_applied is not None:
+            self.on_applied(issue_id)
+        if is_near_limit(response):
+            self.decrease(submitted_at)
+        else:
+            self.increase()
+
+
+# requests keeps 10 connections per host by default, fewer than the writes that
+# can be in flight, so size the session's pool to the write workers
+def size_connection_pool(session, max_workers):
+    for prefix in ("https://", "http://"):
+        adapter = session.get_adapter(prefix)
+        if getattr(adapter, "_pool_maxsize", max_workers) < max_workers:
+            session.mount(
+                prefix,
+                HTTPAdapter(pool_maxsize=max_workers, max_retries=adapter.max_retries),
+            )
+
+
+# The jira client's ResilientSession retries 502, 503 and 504 responses itself,
+# sleeping up to a minute between tries, so the scheduler would never see Jira
+# throttling with a 503. Turn those retries off while writing and leave the
+# retrying and backing off to the scheduler
+@contextmanager
+def scheduler_retries_only(session):
+    if not hasattr(session, "max_retries"):
+        yield
+        return
+    max_retries = session.max_retries
+    session.max_retries = 0
+    try:
+        yield
+    finally:
+        session.max_retries = max_retries
+
+
+# The (field, value) pairs worth a bulk edit, each with the issues that need
+# that value. A bulk edit only saves the PUT of an epic whose other changed
+# fields are all bulk edited too, so starting from every pair shared by enough
+# epics to pay for an edit, pairs that don't save more single writes than
+# their edits cost are dropped until the rest all do
+def plan_bulk_groups(updates):
+    groups = defaultdict(list)
+    for issue_id, fields in updates.items():
+        for field, value in fields.items():
+            groups[(field, value)].append(issue_id)
+
+    chosen = {
+        pair for pair, issue_ids in groups.items() if len(issue_ids) > BULK_EDIT_COST
+    }
+    while chosen:
+        covered = {
+            issue_id
+            for issue_id, fields in updates.items()
+            if all(pair in chosen for pair in fields.items())
+        }
+        dropped = {
+            pair
+            for pair in chosen
+            if sum(1 for issue_id in groups[pair] if issue_id in covered)
+            <= bulk_edit_cost(len(groups[pair]))
+        }
+        if not dropped:
+            break
+        chosen -= dropped
+    return {pair: sorted(groups[pair]) for pair in sorted(chosen)}
+
+
+# Requests to set one value on this many issues in bulk
+def bulk_edit_cost(num_issues):
+    return BULK_EDIT_COST * int(ceil(1.0 * num_issues / BULK_MAX_ISSUES))
+
+
+# One bulk edit per (field, value) pair covering every issue that needs that
+# value, split into requests of at most BULK_MAX_ISSUES issues
+def group_bulk_edits(groups):
+    edits = {}
+    for (field, value), issue_ids in groups.items():
+        for i in range(0, len(issue_ids), BULK_MAX_ISSUES):
+            edits["%s=%s/%d" % (field, value, i // BULK_MAX_ISSUES)] = {
+                "field": field,
+                "value": value,
+                "issues": issue_ids[i : i + BULK_MAX_ISSUES],
+            }
+    return edits
+
+
+# Split bulk edits into rounds where no two edits touch the same issue, so an
+# issue is never in two bulk edit tasks at once. Edits of one field never
+# share an issue so there's at most a round per field
+def get_edit_rounds(edits):
+    rounds = []
+    for edit_id, edit in edits.items():
+        for round_edits, issue_ids in rounds:
+            if issue_ids.isdisjoint(edit["issues"]):
+                break
+        else:
+            round_edits, issue_ids = {}, set()
+            rounds.append((round_edits, issue_ids))
+        round_edits[edit_id] = edit
+        issue_ids.update(edit["issues"])
+    return [round_edits for round_edits, _ in rounds]
+
+
+# Set a number field on a batch of issues with the bulk edit API and wait for
+# the task to finish. Issues the task couldn't edit are added to failed
+def bulk_edit_field(jira, field, value, issue_ids, failed):
+    response = jira._session.post(
+        jira._get_url("bulk/issues/fields", base=JIRA_V3_URL),
+        data=json.dumps(
+            {
+                "selectedIssueIdsOrKeys": issue_ids,
+                "selectedActions": [field],
+                "editedFieldsInput": {
+                    "numberCustomFields": [{"fieldId": field, "value": value}]
+                },
+                "sendBulkNotification": False,
+            }
+        ),
+    )
+    task_id = json.loads(response.content)["taskId"]
+
+    start = time.time()
+    while True:
+        progress = json.loads(
+            jira._session.get(
+                jira._get_url("bulk/queue/%s" % task_id, base=JIRA_V3_URL)
+            ).content
+        )
+        if progress["status"] in BULK_DONE_STATUSES:
+            break
+        if time.time() - start > BULK_POLL_TIMEOUT:
+            raise Exception("Timed out waiting for bulk edit task %s" % task_id)
+        time.sleep(BULK_POLL_INTERVAL)
+
+    if (
+        progress["status"] != "COMPLETE"
+        or progress.get("failedAccessibleIssues")
+        or progress.get("invalidOrInaccessibleIssueCount")
+    ):
+        logger.warning(
+            "Bulk edit task %s setting %s ended %s with failures",
+            task_id,
+            field,
+            progress["status"],
+        )
+        failed.extend(issue_ids)
+    return response
+
+
+# Write the fields shared by enough epics with bulk edits through the
+# scheduler, a round at a time. Returns the scheduler's summary along with the
+# fields that still need writing one by one per issue: the fields left out of
+# the bulk edits, or every field of an issue a bulk edit failed on. None if the
+# server has no bulk edit API or bulk edits wouldn't save any round trips. An
+# issue is passed to on_written once all of its fields are written
+def bulk_write_fields(jira, updates, max_workers=MAX_WRITE_WORKERS, on_written=None):
+    groups = plan_bulk_groups(updates)
+    edits = group_bulk_edits(groups)
+    leftover = {}
+    for issue_id, fields in updates.items():
+        rest = {f: v for f, v in fields.items() if (f, v) not in groups}
+        if rest:
+            leftover[issue_id] = rest
+    requests = sum(bulk_edit_cost(len(ids)) for ids in groups.values()) + len(leftover)
+    if requests >= len(updates):
+        logger.info(
+            "%d bulk edits and %d single writes wouldn't beat %d single writes",
+            len(edits),
+            len(leftover),
+            len(updates),
+        )
+        return None
+
+    failed = []
+    # Bulk edits still to go per issue that's written entirely in bulk
+    edits_left = defaultdict(int)
+    for edit in edits.values():
+        for issue_id in edit["issues"]:
+            if issue_id not in leftover:
+                edits_left[issue_id] += 1
+
+    def edit_applied(edit_id):
+        failed_ids = set(failed)
+        written = []
+        for issue_id in edits[edit_id]["issues"]:
+            if issue_id in edits_left and issue_id not in failed_ids:
+                edits_left[issue_id] -= 1
+                if not edits_left[issue_id]:
+                    written.append(issue_id)
+        if written and on_written is not None:
+            on_written(written)
+
+    scheduler = WriteScheduler(
+        lambda edit_id, edit: bulk_edit_field(
+            jira, edit["field"], edit["value"], edit["issues"], failed
+        ),
+        max_workers=max_workers,
+        on_applied=edit_applied,
+    )
+    rounds = get_edit_rounds(edits)
+    logger.info(
+        "Writing %d epics with %d bulk edits in %d rounds and %d single writes",
+        len(updates),
+        len(edits),
+        len(rounds),
+        len(leftover),
+    )
+
+    # Try one edit on its own first so a server without the API costs one request
+    first_id = next(iter(rounds[0]))
+    scheduler.run({first_id: edits[first_id]}, log_failures=False)
+    if scheduler.failed:
+        status = getattr(scheduler.failed[0][1], "status_code", None)
+        if status in BULK_UNAVAILABLE_STATUSES:
+            logger.info("Bulk API unavailable (%s), using PUT", status)
+            return None
+        scheduler.log_failures(scheduler.failed)
+    summary = None
+    for round_edits in rounds:
+        summary = scheduler.run(
+            {
+                edit_id: edit
+                for edit_id, edit in round_edits.items()
+                if edit_id != first_id
+            }
+        )
+
+    for edit_id, _ in scheduler.failed:
+        failed.extend(edits[edit_id]["issues"])
+    for issue_id in set(failed):
+        leftover[issue_id] = updates[issue_id]
+    return summary, leftover
+
+
+# Write the epic updates as one timed phase of the run and count the writes
+def write_epic_updates(
+    jira,
+    updates,
+    max_workers=MAX_WRITE_WORKERS,
+    bulk=True,
+    failed=None,
+    on_written=None,
+):
+    size_connection_pool(jira._session, max_workers)
+    with METRICS.span("epic_update"), scheduler_retries_only(jira._session):
+        summary = write_updates(jira, updates, max_workers, bulk, failed, on_written)
+    for key, value in summary.items():
+        METRICS.incr("epic_writes_" + key, value)
+    return summary
+
+
+# Write every epic's changed fields, in bulk edits when the server supports them
+# and falling back to a PUT per epic otherwise. Epics a bulk edit failed on are
+# also written one by one. Epics that couldn't be written are added to failed
+# and on_written is given the epics that were as they finish
+def write_updates(jira, updates, max_workers, bulk, failed, on_written=None):
+    summary = {"bulk_edits": 0, "applied": 0, "retried": 0, "failed": 0}
+    if not updates:
+        return summary
+
+    result = bulk_write_fields(jira, updates, max_workers, on_written) if bulk else None
+    if result is None:
+        remaining = updates
+    else:
+        bulk_summary, remaining = result
+        summary["bulk_edits"] = bulk_summary["applied"]
+        summary["retried"] = bulk_summary["retried"]
+        summary["applied"] = len(updates) - len(remaining)
+        if remaining:
+            logger.info("Writing %d epics one by one", len(remaining))
+
+    if not remaining:
+        return summary
+
+    scheduler = WriteScheduler(
+        lambda issue_id, fields: put_issue_fields(jira, issue_id, fields),
+        max_workers=max_workers,
+        on_applied=(
+            None if on_written is None else lambda issue_id: on_written([issue_id])
+        ),
+    )
+    result = scheduler.run(remaining)
+    for key in ("applied", "retried", "failed"):
+        summary[key] += result[key]
+    if failed is not None:
+        failed.extend(issue_id for issue_id, _ in scheduler.failed)
+    return summary
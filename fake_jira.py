@@ -0,0 +1,752 @@
+#! /usr/bin/env python
+
+import re
+import sys
+import json
+import time
+import random
+import getopt
+import logging
+import threading
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("fake-jira")
+
+DEFAULT_PORT = 8765
+DEFAULT_ISSUES = 1000
+DEFAULT_EPICS = 100
+DATASET_START = datetime(2022, 1, 1)
+DATASET_DAYS = 365
+# Issues are last updated a fixed time after they're created so both dates grow
+# with the issue number and date clauses map straight to a range of issues
+UPDATED_AFTER = timedelta(days=31)
+# Done issues are resolved 1 to 30 days after they're created
+RESOLVED_WITHIN = timedelta(days=30)
+# Searches filtered issue by issue (resolution dates, unions) keep their
+# matching issue numbers so paging through them doesn't filter again
+MAX_CACHED_SEARCHES = 256
+JIRA_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.000+0000"
+
+# Custom fields the scripts look up by name
+CUSTOM_FIELDS = [
+    "Sprint",
+    "Story Points",
+    "Story Points (Done)",
+    "Investment Area",
+    "Epic Link",
+    "Num Tickets",
+    "Non-pointed Tickets",
+    "Story Points (Done 2022Q1)",
+    "Story Points (Done 2022Q2)",
+    "Story Points (Done 2022Q3)",
+    "Story Points (Done 2022Q4)",
+]
+
+SYSTEM_FIELDS = [
+    "summary",
+    "description",
+    "labels",
+    "assignee",
+    "created",
+    "updated",
+    "resolutiondate",
+    "issuetype",
+    "status",
+]
+
+TEAMS = ["Backend", "Frontend", "Data", "Mobile", "Platform", "Growth"]
+OTHER_LABELS = ["tech-debt", "customer", "oncall", "security", "ux", "needs-qa"]
+ISSUE_TYPES = ["Story", "Bug", "Task", "Spike"]
+WORDS = (
+    "the a fix add remove update api page user report flaky test slow query cache"
+).split()
+
+BULK_DONE_AFTER_POLLS = 1
+
+
+# Synthetic issues TL-1 to TL-<num_issues> that are generated from their number
+# on demand so even 500k issues don't need to be held in memory, plus epics
+# TL-E0 to TL-E<num_epics - 1> that the issues belong to
+class Dataset:
+    def __init__(
+        self,
+        num_issues=DEFAULT_ISSUES,
+        num_epics=DEFAULT_EPICS,
+        extra_fields=(),
+        seed=0,
+    ):
+        self.num_issues = num_issues
+        self.num_epics = num_epics
+        self.seed = seed
+        self.fields = [
+            {
+                "id": name,
+                "key": name,
+                "name": name.title(),
+                "custom": False,
+                "clauseNames": [name],
+            }
+            for name in SYSTEM_FIELDS
+        ]
+        self.custom_fields = {}
+        for i, name in enumerate(CUSTOM_FIELDS + list(extra_fields)):
+            key = "customfield_%d" % (10000 + i)
+            self.custom_fields[name] = key
+            self.fields.append(
+                {
+                    "id": key,
+                    "key": key,
+                    "name": name,
+                    "custom": True,
+                    "clauseNames": ["cf[%d]" % (10000 + i), name],
+                }
+            )
+        self.extra_fields = [self.custom_fields[name] for name in extra_fields]
+        self.resolved_dates = {}
+        self.searches = {}
+        self.lock = threading.Lock()
+
+    # When issue number i (1 based) was created
+    def created(self, i):
+        return DATASET_START + timedelta(days=DATASET_DAYS * (i - 1) / self.num_issues)
+
+    def updated(self, i):
+        return self.created(i) + UPDATED_AFTER
+
+    # When issue number i was resolved, None if it isn't done
+    def resolved(self, i):
+        if i not in self.resolved_dates:
+            value = self.issue(i, "")["fields"]["resolutiondate"]
+            self.resolved_dates[i] = (
+                datetime.strptime(value, JIRA_DATE_FORMAT) if value else None
+            )
+        return self.resolved_dates[i]
+
+    def issue(self, i, base_url):
+        rng = random.Random(self.seed * 1000003 + i)
+        created = self.created(i)
+        done = rng.random() < 0.7
+        labels = rng.sample(OTHER_LABELS, rng.randint(0, 2))
+        if rng.random() < 0.8:
+            labels.append(rng.choice(TEAMS))
+        if rng.random() < 0.5:
+            labels.append("2018:q%d:%d" % (rng.randint(1, 2), rng.randint(1, 5)))
+        user = rng.randint(0, 49)
+        fields = {
+            "summary": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))),
+            "description": " ".join(
+                rng.choice(WORDS) for _ in range(rng.randint(10, 60))
+            ),
+            "labels": labels,
+            "assignee": (
+                {
+                    "self": "%s/rest/api/2/user?username=user%d" % (base_url, user),
+                    "name": "user%d" % user,
+                    "displayName": "User %d" % user,
+                }
+                if rng.random() < 0.9
+                else None
+            ),
+            "created": created.strftime(JIRA_DATE_FORMAT),
+            "updated": self.updated(i).strftime(JIRA_DATE_FORMAT),
+            "resolutiondate": (
+                (created + timedelta(days=rng.randint(1, 30))).strftime(
+                    JIRA_DATE_FORMAT
+                )
+                if done
+                else None
+            ),
+            "issuetype": {
+                "self": "%s/rest/api/2/issuetype/1" % base_url,
+                "name": rng.choice(ISSUE_TYPES),
+            },
+            "status": {
+                "self": "%s/rest/api/2/status/1" % base_url,
+                "name": "Done" if done else rng.choice(["In Progress", "To Do"]),
+            },
+            self.custom_fields["Sprint"]: [
+                {"name": "Sprint %d" % (i // 500 + j)} for j in range(rng.randint(0, 3))
+            ]
+            or None,
+            self.custom_fields["Story Points"]: rng.choice(
+                [None, 0.0, 1.0, 2.0, 3.0, 5.0, 8.0]
+            ),
+            self.custom_fields["Investment Area"]: (
+                [rng.choice(["Growth", "KTLO"])] if rng.random() < 0.5 else None
+            ),
+            self.custom_fields["Epic Link"]: (
+                "TL-E%d" % rng.randrange(self.num_epics)
+                if self.num_epics and rng.random() < 0.75
+                else None
+            ),
+        }
+        for key in self.extra_fields:
+            fields[key] = rng.random() * 100
+        return {
+            "id": str(i),
+            "key": "TL-%d" % i,
+            "self": "%s/rest/api/2/issue/%d" % (base_url, i),
+            "fields": fields,
+        }
+
+    # Status changes that agree with the issue's status and resolution date
+    def changelog(self, issue):
+        fields = self.issue(int(issue["id"]), "")["fields"]
+        rng = random.Random(self.seed * 1000003 + int(issue["id"]) + 1)
+        created = datetime.strptime(fields["created"], JIRA_DATE_FORMAT)
+        changes = []
+        if fields["status"]["name"] != "To Do":
+            changes.append(
+                (created + timedelta(hours=rng.randint(1, 23)), "To Do", "In Progress")
+            )
+        if fields["resolutiondate"]:
+            changes.append(
+                (
+                    datetime.strptime(fields["resolutiondate"], JIRA_DATE_FORMAT),
+                    "In Progress",
+                    "Done",
+                )
+            )
+        histories = [
+            {
+                "id": str(n),
+                "created": when.strftime(JIRA_DATE_FORMAT),
+                "items": [
+                    {"field": "status", "fromString": old, "toString": new},
+                    {"field": "assignee", "fromString": None, "toString": "someone"},
+                ],
+            }
+            for n, (when, old, new) in enumerate(changes)
+        ]
+        return {
+            "startAt": 0,
+            "maxResults": len(histories),
+            "total": len(histories),
+            "histories": histories,
+        }
+
+    def epic(self, key, base_url):
+        return {
+            "id": key,
+            "key": key,
+            "self": "%s/rest/api/2/issue/%s" % (base_url, key),
+            "fields": {"summary": "Epic %s" % key},
+        }
+
+    # Numbers of the issues matching the query's date clauses, newest first.
+    # Clauses on other fields are ignored
+    def issue_numbers(self, jql):
+        with self.lock:
+            numbers = self.searches.get(jql)
+        if numbers is not None:
+            return numbers
+        lo, hi, check = self.match(parse_jql(jql))
+        numbers = range(hi - 1, lo - 1, -1)
+        if check is not None:
+            numbers = [i for i in numbers if check(i)]
+            with self.lock:
+                if len(self.searches) >= MAX_CACHED_SEARCHES:
+                    self.searches.clear()
+                self.searches[jql] = numbers
+        return numbers
+
+    # The issue numbers [lo, hi) a parsed query can match and a check of which
+    # of those do, None when they all do
+    def match(self, node):
+        kind, value = node
+        if kind == "clause":
+            return self.match_clause(value)
+        parts = [self.match(part) for part in value]
+        checks = [check for _, _, check in parts if check is not None]
+        if kind == "and":
+            lo = max(part[0] for part in parts)
+            hi = max(lo, min(part[1] for part in parts))
+            if not checks:
+                return lo, hi, None
+            return lo, hi, lambda i: all(check(i) for check in checks)
+
+        parts = sorted(part for part in parts if part[0] < part[1])
+        if not parts:
+            return 1, 1, None
+        lo = parts[0][0]
+        hi = max(part[1] for part in parts)
+        contiguous = True
+        reach = lo
+        for part_lo, part_hi, _ in parts:
+            contiguous = contiguous and part_lo <= reach
+            reach = max(reach, part_hi)
+        if not checks and contiguous:
+            return lo, hi, None
+        return (
+            lo,
+            hi,
+            lambda i: any(
+                part_lo <= i < part_hi and (check is None or check(i))
+                for part_lo, part_hi, check in parts
+            ),
+        )
+
+    # Created and updated grow with the issue number so they bound a range of
+    # issues directly. Resolution dates bound the creation dates they can have
+    # and each issue in there is checked
+    def match_clause(self, clause):
+        match = re.match(r'^(\w+)\s*(>=|<=|>|<)\s*"([^"]+)"$', clause)
+        if match is None:
+            if re.search(r"(>=|<=|>|<)", clause):
+                raise JqlError("Fake Jira can't search by %s" % clause)
+            return 1, self.num_issues + 1, None
+        field, op, value = match.groups()
+        date = parse_jql_date(value)
+        if field in ("created", "updated"):
+            get_date = self.created if field == "created" else self.updated
+            if op in (">=", ">"):
+                lo = first_index(
+                    lambda i: date_ok(get_date(i), op, date), self.num_issues
+                )
+                return lo, self.num_issues + 1, None
+            hi = first_index(
+                lambda i: not date_ok(get_date(i), op, date), self.num_issues
+            )
+            return 1, hi, None
+        if field == "resolutiondate":
+            if op in (">=", ">"):
+                lo = first_index(
+                    lambda i: self.created(i) >= date - RESOLVED_WITHIN,
+                    self.num_issues,
+                )
+                hi = self.num_issues + 1
+            else:
+                lo = 1
+                hi = first_index(lambda i: self.created(i) > date, self.num_issues)
+
+            def check(i):
+                resolved = self.resolved(i)
+                return resolved is not None and date_ok(resolved, op, date)
+
+            return lo, hi, check
+        raise JqlError("Fake Jira can't search by %s" % field)
+
+
+# JQL the fake can't search by, served as a 400 like Jira's errors
+class JqlError(Exception):
+    pass
+
+
+# A query as nested ("or", parts), ("and", parts) and ("clause", text)
+def parse_jql(jql):
+    tokens = re.findall(r'"[^"]*"|\(|\)|[^\s()"]+', jql)
+    if not tokens:
+        return ("clause", "")
+    node, pos = parse_jql_or(tokens, 0)
+    if pos != len(tokens):
+        raise JqlError("Can't parse JQL %s" % jql)
+    return node
+
+
+def parse_jql_or(tokens, pos):
+    parts = []
+    while True:
+        node, pos = parse_jql_and(tokens, pos)
+        parts.append(node)
+        if pos < len(tokens) and tokens[pos].upper() == "OR":
+            pos += 1
+        else:
+            return (parts[0] if len(parts) == 1 else ("or", parts)), pos
+
+
+def parse_jql_and(tokens, pos):
+    parts = []
+    while True:
+        node, pos = parse_jql_term(tokens, pos)
+        parts.append(node)
+        if pos < len(tokens) and tokens[pos].upper() == "AND":
+            pos += 1
+        else:
+            return (parts[0] if len(parts) == 1 else ("and", parts)), pos
+
+
+# A parenthesized query or a clause running to the next AND, OR or closing
+# parenthesis. Lists like type in (...) are part of their clause
+def parse_jql_term(tokens, pos):
+    if pos < len(tokens) and tokens[pos] == "(":
+        node, pos = parse_jql_or(tokens, pos + 1)
+        if pos >= len(tokens) or tokens[pos] != ")":
+            raise JqlError("Unbalanced parentheses in JQL")
+        return node, pos + 1
+    words = []
+    while (
+        pos < len(tokens)
+        and tokens[pos] != ")"
+        and tokens[pos].upper() not in ("AND", "OR")
+    ):
+        if tokens[pos] == "(":
+            if ")" not in tokens[pos:]:
+                raise JqlError("Unbalanced parentheses in JQL")
+            end = tokens.index(")", pos) + 1
+        else:
+            end = pos + 1
+        words.extend(tokens[pos:end])
+        pos = end
+    if not words:
+        raise JqlError("Empty clause in JQL")
+    return ("clause", " ".join(words)), pos
+
+
+def parse_jql_date(value):
+    for date_format in ("%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d %H:%M", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise JqlError("Can't parse JQL date %s" % value)
+
+
+def date_ok(date, op, value):
+    return {
+        ">=": date >= value,
+        ">": date > value,
+        "<=": date <= value,
+        "<": date < value,
+    }[op]
+
+
+# First issue number in 1..num_issues that pred holds for, pred has to flip from
+# false to true once. num_issues + 1 if it never holds
+def first_index(pred, num_issues):
+    lo, hi = 1, num_issues + 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if pred(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+# Token bucket that rate limits writes, a rate of 0 means no limit
+class RateLimiter:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.at = time.time()
+        self.lock = threading.Lock()
+
+    def take(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.rate, self.tokens + (now - self.at) * self.rate)
+            self.at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# Everything the handlers share: the dataset, fields written to issues and the
+# request stats served on /_stats
+class FakeJira:
+    def __init__(self, dataset, write_rate=0, latency=0, bulk=True, start_at_cost=0):
+        self.dataset = dataset
+        self.limiter = RateLimiter(write_rate)
+        self.latency = latency
+        # Jira gets slower the deeper a search pages, this many seconds per
+        # 1000 issues of startAt
+        self.start_at_cost = start_at_cost
+        self.bulk = bulk
+        self.edits = {}
+        self.tasks = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                "requests": 0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "searches": 0,
+                "issues_served": 0,
+                "updates": 0,
+                "bulk_edits": 0,
+                "throttled": 0,
+            }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    # An issue with any fields written to it since the server started
+    def get_issue(self, key, base_url):
+        if key.startswith("TL-E"):
+            if int(key[4:]) >= self.dataset.num_epics:
+                return None
+            issue = self.dataset.epic(key, base_url)
+        else:
+            number = int(key[3:])
+            if not 1 <= number <= self.dataset.num_issues:
+                return None
+            issue = self.dataset.issue(number, base_url)
+        issue["fields"].update(self.edits.get(key, {}))
+        return issue
+
+    def edit(self, key, fields):
+        with self.lock:
+            self.edits.setdefault(key, {}).update(fields)
+
+    # Search newest issue first. Supports key in (...) and created, updated and
+    # resolutiondate ranges combined with AND and OR, other clauses match every
+    # issue. Comparisons on other fields raise a JqlError
+    def search(self, jql, start_at, max_results, fields, base_url, expand=""):
+        keys = re.search(r"\bkey\s+in\s*\(([^)]*)\)", jql)
+        if keys:
+            keys = [key.strip().strip("\"'") for key in keys.group(1).split(",")]
+            page = [self.get_issue(key, base_url) for key in keys]
+            page = [issue for issue in page if issue is not None]
+            total = len(page)
+            page = page[start_at : start_at + max_results]
+        else:
+            numbers = self.dataset.issue_numbers(jql)
+            total = len(numbers)
+            page = [
+                self.get_issue("TL-%d" % i, base_url)
+                for i in numbers[start_at : start_at + max_results]
+            ]
+
+        if fields:
+            page = [
+                dict(
+                    issue,
+                    fields={k: v for k, v in issue["fields"].items() if k in fields},
+                )
+                for issue in page
+            ]
+        if "changelog" in expand.split(","):
+            page = [
+                (
+                    dict(issue, changelog=self.dataset.changelog(issue))
+                    if not issue["key"].startswith("TL-E")
+                    else issue
+                )
+                for issue in page
+            ]
+        self.count("searches")
+        self.count("issues_served", len(page))
+        return {
+            "startAt": start_at,
+            "maxResults": max_results,
+            "total": total,
+            "issues": page,
+        }
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def base_url(self):
+        return "http://%s" % self.headers.get("Host", "localhost")
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        self.fake.count("bytes_received", len(body))
+        return json.loads(body) if body else {}
+
+    def send(self, data, status=200, headers=None):
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.fake.count("bytes_sent", len(body))
+
+    def start(self):
+        self.fake.count("requests")
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        return urlparse(self.path)
+
+    # Writes go through the rate limiter and get a 429 when it's empty
+    def throttled(self):
+        if self.fake.limiter.take():
+            return False
+        self.fake.count("throttled")
+        self.send({"errorMessages": ["Rate limit exceeded"]}, 429, {"Retry-After": "1"})
+        return True
+
+    def do_GET(self):
+        url = self.start()
+        params = parse_qs(url.query)
+        path = url.path
+        if path == "/_stats":
+            return self.send(self.fake.stats)
+        if path.endswith("/serverInfo"):
+            return self.send(
+                {
+                    "baseUrl": self.base_url,
+                    "version": "8.0.0",
+                    "versionNumbers": [8, 0, 0],
+                }
+            )
+        if path.endswith("/field"):
+            return self.send(self.fake.dataset.fields)
+        if path.endswith("/search"):
+            fields = ",".join(params.get("fields", []))
+            start_at = int(params.get("startAt", [0])[0])
+            if self.fake.start_at_cost:
+                time.sleep(self.fake.start_at_cost * start_at / 1000.0)
+            try:
+                results = self.fake.search(
+                    params.get("jql", [""])[0],
+                    start_at,
+                    int(params.get("maxResults", [50])[0]),
+                    set(fields.split(",")) if fields else None,
+                    self.base_url,
+                    params.get("expand", [""])[0],
+                )
+            except JqlError as e:
+                return self.send({"errorMessages": [str(e)], "errors": {}}, 400)
+            return self.send(results)
+        match = re.match(r".*/rest/api/3/bulk/queue/(\w+)$", path)
+        if match and self.fake.bulk:
+            task_id = match.group(1)
+            self.fake.tasks[task_id] += 1
+            done = self.fake.tasks[task_id] > BULK_DONE_AFTER_POLLS
+            return self.send(
+                {
+                    "taskId": task_id,
+                    "status": "COMPLETE" if done else "RUNNING",
+                    "progressPercent": 100 if done else 50,
+                }
+            )
+        match = re.match(r".*/rest/api/2/issue/([^/]+)$", path)
+        if match:
+            issue = self.fake.get_issue(match.group(1), self.base_url)
+            if issue is not None:
+                return self.send(issue)
+        self.send({"errorMessages": ["Not found: %s" % path]}, 404)
+
+    def do_PUT(self):
+        url = self.start()
+        body = self.read_body()
+        match = re.match(r".*/rest/api/2/issue/([^/]+)$", url.path)
+        if not match or self.fake.get_issue(match.group(1), self.base_url) is None:
+            return self.send({"errorMessages": ["Not found: %s" % url.path]}, 404)
+        if self.throttled():
+            return
+        self.fake.edit(match.group(1), body.get("fields", {}))
+        self.fake.count("updates")
+        self.send(None, 204)
+
+    def do_POST(self):
+        url = self.start()
+        body = self.read_body()
+        if url.path == "/_stats/reset":
+            self.fake.reset_stats()
+            return self.send(self.fake.stats)
+        if not (self.fake.bulk and url.path.endswith("/rest/api/3/bulk/issues/fields")):
+            return self.send({"errorMessages": ["Not found: %s" % url.path]}, 404)
+        if self.throttled():
+            return
+        fields = body["editedFieldsInput"]["numberCustomFields"]
+        for key in body["selectedIssueIdsOrKeys"]:
+            self.fake.edit(key, {f["fieldId"]: f["value"] for f in fields})
+        self.fake.count("bulk_edits")
+        with self.fake.lock:
+            task_id = str(len(self.fake.tasks) + 1)
+            self.fake.tasks[task_id] = 0
+        self.send({"taskId": task_id}, 201)
+
+
+# Build a server for a fake Jira, call serve_forever() on it to start serving
+def make_server(fake, port=DEFAULT_PORT, host="127.0.0.1"):
+    handler = type("Handler", (FakeJiraHandler,), {"fake": fake})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    port = DEFAULT_PORT
+    num_issues = DEFAULT_ISSUES
+    num_epics = DEFAULT_EPICS
+    extra_fields = []
+    write_rate = 0
+    latency = 0
+    start_at_cost = 0
+    bulk = True
+
+    usage = (
+        "fake_jira.py --issues <count> --epics <count> --port <port> "
+        "--custom-fields <name,name> --write-rate <writes/s> --latency <seconds> "
+        "--start-at-cost <seconds per 1000> --no-bulk"
+    )
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "h",
+            [
+                "issues=",
+                "epics=",
+                "port=",
+                "custom-fields=",
+                "write-rate=",
+                "latency=",
+                "start-at-cost=",
+                "no-bulk",
+            ],
+        )
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(usage)
+            sys.exit()
+        elif opt == "--issues":
+            num_issues = int(arg)
+        elif opt == "--epics":
+            num_epics = int(arg)
+        elif opt == "--port":
+            port = int(arg)
+        elif opt == "--custom-fields":
+            extra_fields = [name for name in arg.split(",") if name]
+        elif opt == "--write-rate":
+            write_rate = float(arg)
+        elif opt == "--latency":
+            latency = float(arg)
+        elif opt == "--start-at-cost":
+            start_at_cost = float(arg)
+        elif opt == "--no-bulk":
+            bulk = False
+
+    fake = FakeJira(
+        Dataset(num_issues, num_epics, extra_fields),
+        write_rate,
+        latency,
+        bulk,
+        start_at_cost,
+    )
+    server = make_server(fake, port)
+    logger.info(
+        "Serving a fake Jira with %d issues and %d epics on port %d",
+        num_issues,
+        num_epics,
+        port,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
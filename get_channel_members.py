@@ -3,7 +3,7 @@
 from slack_helper import SlackHelper
 import sys
 
-from util import get_conf_or_env, read_config_file
+from util import METRICS, get_conf_or_env, read_config_file
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -26,3 +26,5 @@ if __name__ == "__main__":
             user["real_name"],
             user["profile"].get("email", None),
         )
+
+    METRICS.write("get_channel_members", config_data)
@@ -0,0 +1,216 @@
+#! /usr/bin/env python
+
+import logging
+
+from datetime import datetime
+
+from jira_helper import JQL_DATE_FORMAT, SHARD_MIN_SPAN, parse_jql_date
+from util import METRICS
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("issue-query")
+
+
+def format_jql_date(date):
+    if date.hour == 0 and date.minute == 0:
+        return date.strftime("%Y-%m-%d")
+    return date.strftime(JQL_DATE_FORMAT)
+
+
+def read_date(value):
+    date = parse_jql_date(value)
+    if date is None:
+        raise ValueError("Can't read the date %s" % value)
+    return date
+
+
+# Dates the way Jira shows them to us, in the same timezone JQL dates are read
+# in, so they compare directly with a query's bounds
+def local_minute(value):
+    return value[:16].replace("T", " ") if value else None
+
+
+# A search over a date range of the issues matching a base JQL query, optionally
+# narrowed to issues with an epic or to a single epic. It's the JQL string
+# itself so it can be used anywhere a query is, but keeps its parts around so
+# the cache can tell when one query's issues contain another's
+class IssueQuery(str):
+    def __new__(
+        cls,
+        base,
+        date_field,
+        start,
+        end=None,
+        end_inclusive=True,
+        epic=None,
+        epics_only=False,
+    ):
+        if isinstance(start, str):
+            start = read_date(start)
+        if isinstance(end, str):
+            end = read_date(end)
+        jql = '%s AND %s >= "%s"' % (base, date_field, format_jql_date(start))
+        if end is not None:
+            jql += ' AND %s %s "%s"' % (
+                date_field,
+                "<=" if end_inclusive else "<",
+                format_jql_date(end),
+            )
+        if epics_only:
+            jql += ' AND "Epic Link" is not empty'
+        if epic:
+            jql += ' AND "Epic Link" = "%s"' % epic
+
+        query = str.__new__(cls, jql)
+        query.base = base
+        query.date_field = date_field
+        query.start = start
+        query.end = end
+        query.end_inclusive = end_inclusive
+        query.epic = epic
+        query.epics_only = epics_only
+        return query
+
+    # The range as [start, end), JQL dates only go down to the minute
+    def interval(self):
+        if self.end is None:
+            return self.start, datetime.max
+        if self.end_inclusive:
+            return self.start, self.end + SHARD_MIN_SPAN
+        return self.start, self.end
+
+    # Whether other's issues, filtered by date, are a superset of ours
+    def shares_filters(self, other):
+        if self.base != other.base or self.date_field != other.date_field:
+            return False
+        if other.epic is not None and other.epic != self.epic:
+            return False
+        return not other.epics_only or self.epics_only or self.epic is not None
+
+    # The same query limited to [start, end)
+    def narrow(self, start, end):
+        return IssueQuery(
+            self.base,
+            self.date_field,
+            start,
+            None if end == datetime.max else end,
+            False,
+            self.epic,
+            self.epics_only,
+        )
+
+    # Check a fetched issue against the query locally
+    def matches(self, issue):
+        if self.epics_only and not issue.epic:
+            return False
+        if self.epic is not None and issue.epic != self.epic:
+            return False
+        value = local_minute(getattr(issue, self.date_field))
+        if value is None:
+            return False
+        start, end = self.interval()
+        if value < start.strftime(JQL_DATE_FORMAT):
+            return False
+        return end == datetime.max or value < end.strftime(JQL_DATE_FORMAT)
+
+    # The parts of our range that none of the intervals cover
+    def uncovered(self, intervals):
+        start, end = self.interval()
+        gaps = []
+        for covered_start, covered_end in sorted(intervals):
+            if covered_start > start:
+                gaps.append((start, min(covered_start, end)))
+            start = max(start, covered_end)
+            if start >= end:
+                break
+        if start < end:
+            gaps.append((start, end))
+        return [
+            (gap_start, gap_end) for gap_start, gap_end in gaps if gap_start < gap_end
+        ]
+
+
+def issue_number(issue):
+    return int(str(issue.key).rsplit("-", 1)[-1])
+
+
+# Caches the issues of every query fetched in a session. A plain JQL string
+# only hits on the exact same query. An IssueQuery is answered from the issues
+# fetched for queries with the same base and looser filters as far as their
+# date ranges reach, and only the rest of its range is fetched
+class QueryCache:
+    def __init__(self):
+        self.entries = {}
+        self.fetched = {}
+
+    # The cached issues for a query if it can be answered without fetching
+    def lookup(self, query):
+        if query in self.entries:
+            return self.entries[query]
+        if not isinstance(query, IssueQuery):
+            return None
+        sources = self.get_sources(query)
+        if query.uncovered([source.interval() for source in sources]):
+            return None
+        self.entries[query] = self.combine(query, sources)
+        return self.entries[query]
+
+    # The issues for a query, calling fetch(query) for whatever isn't cached
+    def get(self, query, fetch):
+        issues = self.lookup(query)
+        if issues is not None:
+            logger.info("Answered query from cached issues")
+            METRICS.incr("query_cache_hits")
+            return issues
+        METRICS.incr("query_cache_misses")
+        if not isinstance(query, IssueQuery):
+            self.entries[query] = fetch(query)
+            return self.entries[query]
+
+        sources = self.get_sources(query)
+        gaps = query.uncovered([source.interval() for source in sources])
+        if sources:
+            logger.info(
+                "Answering query from %d cached queries, fetching %d missing ranges",
+                len(sources),
+                len(gaps),
+            )
+        if gaps == [query.interval()]:
+            self.fetched[query] = self.entries[query] = fetch(query)
+            return self.entries[query]
+        for gap_start, gap_end in gaps:
+            gap_query = query.narrow(gap_start, gap_end)
+            self.fetched[gap_query] = fetch(gap_query)
+            sources.append(gap_query)
+        self.entries[query] = self.combine(query, sources)
+        return self.entries[query]
+
+    # Fetched queries holding some of the query's issues
+    def get_sources(self, query):
+        start, end = query.interval()
+        sources = []
+        for fetched in self.fetched:
+            fetched_start, fetched_end = fetched.interval()
+            if (
+                fetched_start < end
+                and start < fetched_end
+                and query.shares_filters(fetched)
+            ):
+                sources.append(fetched)
+        return sources
+
+    def combine(self, query, sources):
+        seen = set()
+        issues = []
+        for source in sources:
+            for issue in self.fetched[source]:
+                if issue.key not in seen and query.matches(issue):
+                    seen.add(issue.key)
+                    issues.append(issue)
+        issues.sort(key=issue_number, reverse=True)
+        return issues
+
+    def clear(self):
+        self.entries = {}
+        self.fetched = {}
@@ -1,277 +1,508 @@
 #! /usr/bin/env python
 
 import sys
+import getopt
 import logging
-import csv
 
-from collections import Counter, defaultdict
-from jira import JIRA
-from math import ceil
-
-from util import print_dict, get_or_float_zero, get_conf_or_env, read_config_file
+from jira_helper import (
+    FIELD_CACHE_TTL,
+    CachedFieldsJIRA,
+    compact_issue,
+    get_csv_row,
+    get_field_index,
+    iter_all_issues,
+    iter_pages,
+    iter_sharded_issues,
+    iter_synced_issues,
+    parse_jql_date,
+)
+from changelogs import (
+    DONE_STATUSES,
+    START_STATUSES,
+    get_cycle_times,
+    get_team_cycle_stats,
+    report_cycle_stats,
+    sync_changelogs,
+)
+from issue_query import IssueQuery, QueryCache, format_jql_date, local_minute
+from label_rules import LabelClassifier, get_default_rules, load_label_rules
+from periods import get_rolling_periods, load_calendar
+from text_terms import TermStore, get_months, get_next_month, tokenize
+from trends import TrendCube, get_week_range
+from jira_store import ChangelogStore, IssueStore
+from analysis_pipeline import (
+    ACCUMULATORS,
+    CsvAccumulator,
+    TermAccumulator,
+    export_csv_pages,
+    resume_page,
+    run_period_pipeline,
+    run_pipeline,
+)
+from util import (
+    METRICS,
+    configure_logging,
+    get_conf_or_env,
+    read_config_file,
+)
 
 FORMAT = "%(asctime)-15s %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.DEBUG)
 logger = logging.getLogger("post-schedule")
 
+CSV_HEADER = [
+    "ticket",
+    "summary",
+    "team",
+    "priority",
+    "story_points",
+    "assignee",
+    "created_date",
+    "resolved_date",
+    "type",
+    "investment_area",
+    "epic",
+]
+
+# Issue fields each analysis reads. Custom fields are referenced by the
+# JiraAnalysis attribute that holds their key
+ANALYSIS_FIELDS = {
+    "write_issues": [
+        "summary",
+        "labels",
+        "assignee",
+        "created",
+        "resolutiondate",
+        "issuetype",
+        "story_point_field",
+        "investment_area_field",
+        "epic_link_field",
+    ],
+    "descriptions": ["description"],
+    "priorities": ["summary", "labels", "story_point_field"],
+    "sprint_lag": ["labels", "issuetype", "sprint_field", "story_point_field"],
+    "story_points": ["assignee", "issuetype", "story_point_field"],
+    "cycle_time": ["labels", "created", "resolutiondate"],
+    "terms": ["summary", "description"],
+    "trends": [
+        "labels",
+        "assignee",
+        "issuetype",
+        "sprint_field",
+        "story_point_field",
+        "investment_area_field",
+    ],
+}
+
+# Analyses the batch mode runs for every period
+PERIOD_ANALYSES = ["priorities", "sprint_lag", "story_points"]
+
 
 class JiraAnalysis:
-    def __init__(self, jira_url, jira_username, jira_token, jira_team_labels):
-        self.issue_cache = {}
-        self.jira = JIRA(jira_url, basic_auth=(jira_username, jira_token))
+    def __init__(
+        self,
+        jira_url,
+        jira_username,
+        jira_token,
+        jira_team_labels,
+        fetch_workers=1,
+        issue_store=None,
+        full_resync=False,
+        analyses=None,
+        field_cache_file=None,
+        field_cache_ttl=FIELD_CACHE_TTL,
+        raw_search=False,
+        label_rules=None,
+        shard_size=None,
+        changelog_store=None,
+        start_statuses=START_STATUSES,
+        done_statuses=DONE_STATUSES,
+        term_workers=1,
+        resume=False,
+    ):
+        self.query_cache = QueryCache()
+        self.resume = resume
+        self.term_workers = term_workers
+        self.changelog_store = changelog_store
+        self.start_statuses = start_statuses
+        self.done_statuses = done_statuses
+        self.fetch_workers = fetch_workers
+        self.issue_store = issue_store
+        self.full_resync = full_resync
+        self.raw_search = raw_search
+        self.shard_size = shard_size
+        self.jira = CachedFieldsJIRA(
+            jira_url,
+            basic_auth=(jira_username, jira_token),
+            field_cache_file=field_cache_file,
+            field_cache_ttl=field_cache_ttl,
+        )
         self.jira_team_labels = jira_team_labels
-        self.sprint_field = self.get_custom_field_key("Sprint")
-        self.story_point_field = self.get_custom_field_key("Story Points")
-        self.investment_area_field = self.get_custom_field_key("Investment Area")
-        self.epic_link_field = self.get_custom_field_key("Epic Link")
-
-        if self.sprint_field is None:
-            raise Exception("Failed to find Sprint field")
-
-        if self.story_point_field is None:
-            raise Exception("Failed to find Story Point field")
-
-        if self.investment_area_field is None:
-            raise Exception("Failed to find Investment Area field")
-
-        if self.epic_link_field is None:
-            raise Exception("Failed to find Epic Link field")
-
-    # Retrieve the custom field matching to a particular name since JIRA gives custom fields a random ID
-    def get_custom_field_key(self, name):
-        all_fields = self.jira.fields()
-        for field in all_fields:
-            if field["name"] == name:
-                return field["key"]
-        return None
-
-    # Retrieve the team for an issue - based on labels
-    def get_team(self, issue):
-        for label in issue.fields.labels:
-            for team_label in self.jira_team_labels:
-                if team_label.lower() == label.lower():
-                    return team_label
-        return None
-
-    # Retrieve the investment area
-    def get_investment_area(self, issue):
-        ia = getattr(issue.fields, self.investment_area_field)
-        if ia:
-            return ia
-        return []
-
-    # Retrieve the epic link
-    def get_epic_link(self, issue):
-        return getattr(issue.fields, self.epic_link_field, "")
-
-    # Get issue type, a bit weird since it's off of fields and needs to be converted to string
-    def get_issue_type(self, issue):
-        return issue.fields.issuetype.name.lower()
-
-    # Get description from an issue
-    def get_description(self, issue):
-        return issue.fields.description
-
-    # Get story points from an issue
-    def get_story_points(self, issue):
-        return get_or_float_zero(issue.fields, self.story_point_field)
-
-    # Get the priority of an issue
-    def get_priority(self, issue):
-        for label in issue.fields.labels:
-            # TODO: Update this for other formats
-            # Take the first label found to avoid double counting
-            if "2018:q1:" in label.lower() or "2018:q2" in label.lower():
-                try:
-                    return int(label.split(":")[-1])
-                except:
-                    return 100
-        # The Misc priority
-        return 100
-
-    # For a set of issues get stats by priority
-    def get_priority_stats(self, issues):
-        priority_count = Counter()
-        priority_story_points = defaultdict(float)
-        no_priority_stories = []
-        for issue in issues:
-            priority = self.get_priority(issue)
-            if priority is not None:
-                story_points = self.get_story_points(issue)
-                priority_count.update([priority])
-                priority_story_points[priority] += float(story_points)
-            else:
-                no_priority_stories.append(issue)
-        return priority_count, priority_story_points, no_priority_stories
+        self.label_classifier = LabelClassifier(
+            label_rules or get_default_rules(jira_team_labels)
+        )
+        self.field_index = get_field_index(self.jira.fields())
+        (
+            self.sprint_field,
+            self.story_point_field,
+            self.investment_area_field,
+            self.epic_link_field,
+        ) = self.get_custom_field_keys(
+            ["Sprint", "Story Points", "Investment Area", "Epic Link"]
+        )
+
+        self.compact_fields = {
+            "story_points": self.story_point_field,
+            "epic_link": self.epic_link_field,
+            "investment_area": self.investment_area_field,
+            "sprint": self.sprint_field,
+        }
+
+        self.search_fields = self.get_search_fields(analyses or ANALYSIS_FIELDS)
+
+    # Work out the smallest set of fields the analyses we're about to run read,
+    # plus the resolution date so cached issues can be sliced to a narrower range
+    def get_search_fields(self, analyses):
+        fields = {"updated", "resolutiondate"}
+        for analysis in analyses:
+            for field in ANALYSIS_FIELDS[analysis]:
+                # Custom fields are named by the attribute holding their key
+                if field.endswith("_field"):
+                    field = getattr(self, field)
+                fields.add(field)
+        return sorted(fields)
+
+    # Retrieve several custom fields at once and fail listing every one that's missing
+    def get_custom_field_keys(self, names):
+        missing = [name for name in names if name not in self.field_index]
+        if missing:
+            raise Exception("Failed to find fields: %s" % ", ".join(missing))
+        return [self.field_index[name] for name in names]
+
+    # Decode an issue once into a compact record for the analyses to read
+    def compact_issue(self, issue):
+        return compact_issue(issue, self.compact_fields, self.label_classifier)
+
+    # Stream the issues for a query page by page without holding on to them,
+    # unless the cache can answer it
+    def iter_issues(self, query):
+        cached = self.query_cache.lookup(query)
+        if cached is not None:
+            return iter(cached)
+        return self.fetch_issues(query)
+
+    # Stream the issues for a query from Jira or the issue store
+    def fetch_issues(self, query):
+        if self.issue_store is None and self.shard_size:
+            return iter_sharded_issues(
+                self.jira,
+                query,
+                self.fetch_workers,
+                self.search_fields,
+                self.raw_search,
+                lambda issues: [self.compact_issue(i) for i in issues],
+                self.shard_size,
+            )
+        if self.issue_store is None:
+            return iter_all_issues(
+                self.jira,
+                query,
+                self.fetch_workers,
+                self.search_fields,
+                raw=self.raw_search,
+                on_page=lambda issues: [self.compact_issue(i) for i in issues],
+            )
+        return iter_synced_issues(
+            self.jira,
+            self.issue_store,
+            query,
+            self.fetch_workers,
+            self.search_fields,
+            self.full_resync,
+            self.raw_search,
+            self.compact_issue,
+            self.shard_size,
+            self.resume,
+        )
 
     # Wrap the pagination code so user doesn't have to do it themselves
     def get_issues(self, query):
-        if query in self.issue_cache:
-            return self.issue_cache[query]
-
-        all_issues = []
-        MAX_RESULTS = 100
-        issues = self.jira.search_issues(query, maxResults=MAX_RESULTS)
-        total = issues.total
-        all_issues.extend(list(issues))
-        if total > MAX_RESULTS:  # Actually need to paginate
-            for page in range(1, int(ceil(1.0 * total / MAX_RESULTS))):
-                logger.info("Getting page %s", page)
-                issues = self.jira.search_issues(
-                    query, maxResults=MAX_RESULTS, startAt=page * MAX_RESULTS
+        with METRICS.span("fetch"):
+            return self.query_cache.get(query, lambda q: list(self.fetch_issues(q)))
+
+    # Clean up an issue for the CSV
+    def get_csv_row(self, issue):
+        return get_csv_row(issue, CSV_HEADER)
+
+    # Yield pages of compact issues straight from Jira, starting at start_page
+    def iter_issue_pages(self, query, start_page=0):
+        for issues in iter_pages(
+            self.jira,
+            query,
+            self.fetch_workers,
+            self.search_fields,
+            raw=self.raw_search,
+            start_page=start_page,
+        ):
+            yield [self.compact_issue(issue) for issue in issues]
+
+    # Stream issues from Jira while writing them to a CSV page by page. With
+    # resume an interrupted export continues after the last page it wrote
+    def export_issues(self, query, fn, resume=False):
+        start_page = resume_page(fn, query) if resume else 0
+        return export_csv_pages(
+            self.iter_issue_pages(query, start_page),
+            fn,
+            CSV_HEADER,
+            self.get_csv_row,
+            query,
+            start_page,
+        )
+
+    # Build the accumulator for an analysis
+    def get_accumulator(self, analysis, fn="issues.csv"):
+        if analysis == "write_issues":
+            return CsvAccumulator(fn, CSV_HEADER, self.get_csv_row)
+        if analysis == "terms":
+            return TermAccumulator(self.term_workers)
+        return ACCUMULATORS[analysis]()
+
+    # Run several analyses in a single pass over the issues. Without cache the
+    # issues are streamed page by page instead of being held in memory
+    def run_analyses(self, start_date, end_date, analyses, fn="issues.csv", cache=True):
+        query = self.get_issue_query(start_date, end_date)
+        return self.run_accumulators(
+            self.get_issues(query) if cache else self.iter_issues(query),
+            analyses,
+            fn,
+        )
+
+    # Feed issues through the accumulators for some analyses and log the reports
+    def run_accumulators(self, issues, analyses, fn="issues.csv"):
+        accumulators = run_pipeline(
+            issues, [self.get_accumulator(analysis, fn) for analysis in analyses]
+        )
+        for accumulator in accumulators:
+            for line in accumulator.report():
+                logger.info(line)
+        return accumulators
+
+    # Run the analyses for every period off a single fetch of their combined
+    # range, partitioning the issues by resolution date, and write each period's
+    # reports to one file
+    def run_period_analyses(self, periods, analyses, fn="report.txt", cache=True):
+        if "write_issues" in analyses:
+            raise Exception("write_issues can't be run per period")
+        periods = [
+            dict(
+                period,
+                start=format_jql_date(parse_jql_date(period["start"])),
+                end=format_jql_date(parse_jql_date(period["end"])),
+            )
+            for period in periods
+        ]
+        query = self.get_issue_query(
+            min(parse_jql_date(period["start"]) for period in periods),
+            max(parse_jql_date(period["end"]) for period in periods),
+            end_inclusive=False,
+        )
+        results = run_period_pipeline(
+            self.get_issues(query) if cache else self.iter_issues(query),
+            periods,
+            lambda issue: local_minute(issue.resolutiondate),
+            lambda: [self.get_accumulator(analysis) for analysis in analyses],
+        )
+
+        with open(fn, "w", encoding="utf-8") as f:
+            for period, accumulators in zip(periods, results):
+                f.write(
+                    "== %s (>= %s, < %s) ==\n"
+                    % (period["name"], period["start"], period["end"])
                 )
-                logger.info("Retrieved %s issues", len(issues))
-                all_issues.extend(list(issues))
-        logger.info("Total retrieved %s", len(all_issues))
-        self.issue_cache[query] = all_issues
-        return all_issues
+                for accumulator in accumulators:
+                    f.write("\n".join(str(line) for line in accumulator.report()))
+                    f.write("\n\n")
+        logger.info("Wrote reports for %d periods to %s", len(periods), fn)
+        return results
+
+    # Rebuild the trend cube for the whole weeks covering a date range. The
+    # issues stay cached so analyses over the range don't fetch them again
+    def build_trends(self, start_date, end_date, cube):
+        start_week, end_week = get_week_range(start_date, end_date)
+        query = self.get_issue_query(start_week, end_week, end_inclusive=False)
+        (trends,) = self.run_accumulators(self.get_issues(query), ["trends"])
+        cube.replace_weeks(start_week, end_week, trends.cells)
+        return trends
 
     # Clean up and write issues to a CSV
     def write_issues(self, start_date, end_date, fn):
-        issues = self.get_issues(self.get_issue_query(start_date, end_date))
-        with open(fn, "w") as f:
-            w = csv.writer(f)
-            w.writerow(
-                [
-                    "ticket",
-                    "summary",
-                    "team",
-                    "priority",
-                    "story_points",
-                    "assignee",
-                    "created_date",
-                    "resolved_date",
-                    "type",
-                    "investment_area",
-                    "epic",
-                ]
-            )
-            for issue in issues:
-                w.writerow(
-                    [
-                        issue,
-                        issue.fields.summary.encode("utf-8"),
-                        self.get_team(issue),
-                        self.get_priority(issue),
-                        self.get_story_points(issue),
-                        issue.fields.assignee if issue.fields.assignee else "None",
-                        issue.fields.created,
-                        issue.fields.resolutiondate,
-                        self.get_issue_type(issue),
-                        ",".join(self.get_investment_area(issue)),
-                        self.get_epic_link(issue),
-                    ]
-                )
+        self.run_analyses(start_date, end_date, ["write_issues"], fn)
 
     # Get all done stories and bugs between a date range
-    def get_issue_query(self, start_date, end_date):
-        return (
-            'project = "TL" and status = Done and resolutiondate >= "'
-            + start_date
-            + '" and resolutiondate <= "'
-            + end_date
-            + '" AND type in ("story", "bug", "task", "spike", "access")'
+    def get_issue_query(self, start_date, end_date, end_inclusive=True):
+        return IssueQuery(
+            'project = "TL" AND status = Done'
+            ' AND type in ("story", "bug", "task", "spike", "access")',
+            "resolutiondate",
+            start_date,
+            end_date,
+            end_inclusive,
         )
 
-    # Just get the list of words
+    # The status and type filters of get_issue_query checked on a fetched issue,
+    # for issues that came from a broader search
+    def in_issue_query(self, issue):
+        return (issue.status or "").lower() == "done" and issue.issue_type in (
+            "story",
+            "bug",
+            "task",
+            "spike",
+            "access",
+        )
+
+    # Stream the words of every description
     def get_descriptions_words(self, start_date, end_date):
-        issues = self.get_issues(self.get_issue_query(start_date, end_date))
-        words = []
-        for issue in issues:
-            desc = self.get_description(issue)
-            if desc is not None:
-                words.extend(desc.split(" "))
-        return words
+        for issue in self.iter_issues(self.get_issue_query(start_date, end_date)):
+            yield from tokenize(issue.description)
+
+    # Count the terms of every month the date range touches and replace those
+    # months in the term store. The issues stay cached for other analyses
+    def build_terms(self, start_date, end_date, store):
+        months = get_months(start_date, end_date)
+        query = self.get_issue_query(
+            months[0] + "-01", get_next_month(months[-1]) + "-01", False
+        )
+        (terms,) = self.run_accumulators(self.get_issues(query), ["terms"])
+        store.replace_periods({month: terms.counts.get(month, {}) for month in months})
+        return terms
 
     # Measure analytics per priority
     def analyze_priorities(self, start_date, end_date):
-        issues = self.get_issues(self.get_issue_query(start_date, end_date))
-        (
-            priority_count,
-            priority_story_points,
-            no_priority_stories,
-        ) = self.get_priority_stats(issues)
-
-        logger.info("Priority counts")
-        logger.info(print_dict(priority_count, "\n"))
-
-        logger.info("Priority story points")
-        logger.info(print_dict(priority_story_points, "\n"))
-
-        logger.info("No priorities")
-        for issue in no_priority_stories:
-            logger.info("\t %s %s", issue, issue.fields.summary)
+        self.run_analyses(start_date, end_date, ["priorities"])
 
     # Measrure # of sprints to do a story
     def analyze_sprint_lag(self, start_date, end_date):
-        team_sprint_counts = defaultdict(list)
-        team_sprint_story_point_sum = defaultdict(float)
-        team_story_point_sum = defaultdict(float)
-        team_bugs = defaultdict(int)
+        self.run_analyses(start_date, end_date, ["sprint_lag"])
+
+    # Measure cycle time (first start to done) and lead time (created to done)
+    # per team from the issues' status transitions
+    def analyze_cycle_time(self, start_date, end_date):
         issues = self.get_issues(self.get_issue_query(start_date, end_date))
-        for issue in issues:
-            team = self.get_team(issue)
-            try:
-                num_sprints = len(getattr(issue.fields, self.sprint_field))
-            except:
-                num_sprints = 0
-            story_points = get_or_float_zero(issue.fields, self.story_point_field)
-            issue_type = self.get_issue_type(issue)
-
-            # Has a team and was actually done via sprint process
-            if team and num_sprints > 0 and issue_type == "story":
-                team_sprint_counts[team].append(num_sprints)
-
-                if story_points > 0:
-                    team_sprint_story_point_sum[team] += num_sprints * story_points
-                    team_story_point_sum[team] += story_points
-
-            if issue_type == "bug":
-                team_bugs[team] += 1
-
-        logger.info("Team\tSprint Lag\tSP Sprint Lag\tBugs")
-        for team, counts in team_sprint_counts.items():
-            if team_sprint_story_point_sum[team] > 0:
-                logger.info(
-                    "%s\t%s\t%s\t%s",
-                    team,
-                    sum(counts) * 1.0 / len(counts),
-                    team_sprint_story_point_sum[team] / team_story_point_sum[team],
-                    team_bugs[team],
-                )
-            else:
-                logger.info("%s\tNA\t%NA\t%s", team, team_bugs[team])
+        transitions = sync_changelogs(
+            self.jira, self.changelog_store, issues, self.fetch_workers
+        )
+        cycle, lead = get_cycle_times(
+            issues, transitions, self.start_statuses, self.done_statuses
+        )
+        stats = get_team_cycle_stats([issue.team for issue in issues], cycle, lead)
+        for line in report_cycle_stats(stats):
+            logger.info(line)
+        return stats
 
     # Measure # of story points done per assignee
     def analyze_story_points(self, start_date, end_date):
-        user_story_point_sum = Counter()
-        user_data = {}
-        issues = self.get_issues(self.get_issue_query(start_date, end_date))
-        for issue in issues:
-            story_points = get_or_float_zero(issue.fields, self.story_point_field)
-            assignee = str(issue.fields.assignee) if issue.fields.assignee else "None"
-            user_story_point_sum.update({assignee: int(story_points)})
-            if assignee not in user_data:
-                user_data[assignee] = defaultdict(int)
-            issue_type = self.get_issue_type(issue)
-            user_data[assignee][issue_type + "_cnt"] += 1
-            user_data[assignee][issue_type + "_story_points"] += int(story_points)
-
-        logger.info("User\tSP\tStories\tBugs")
-        for user, story_points in user_story_point_sum.most_common(100):
-            logger.info("%s\t%s\t%s", user, story_points, user_data[user])
+        self.run_analyses(start_date, end_date, ["story_points"])
 
 
 if __name__ == "__main__":
-    start_date = sys.argv[1]
-    end_date = sys.argv[2]
+    full_resync = False
+    stream = False
+    resume = False
+    periods_file = None
+    rolling = None
+    report_file = "report.txt"
+    trends = False
+    cycle_time = False
+    terms = False
+
+    usage = (
+        "jira_analysis.py [options] <start-date> <end-date>\n"
+        "jira_analysis.py [options] --periods <periods-file>\n"
+        "jira_analysis.py [options] --rolling <count>x<days>[/<step-days>] "
+        "<end-date>\n"
+        "Options: --full-resync --trends --cycle-time --terms --report <file> "
+        "--stream --resume"
+    )
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "",
+            [
+                "full-resync",
+                "stream",
+                "resume",
+                "periods=",
+                "rolling=",
+                "report=",
+                "trends",
+                "cycle-time",
+                "terms",
+            ],
+        )
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ("--full-resync",):
+            full_resync = True
+        elif opt in ("--stream",):
+            stream = True
+        elif opt in ("--resume",):
+            resume = True
+        elif opt in ("--periods",):
+            periods_file = arg
+        elif opt in ("--rolling",):
+            rolling = arg
+        elif opt in ("--report",):
+            report_file = arg
+        elif opt in ("--trends",):
+            trends = True
+        elif opt in ("--cycle-time",):
+            cycle_time = True
+        elif opt in ("--terms",):
+            terms = True
+
+    if periods_file and not args:
+        periods = load_calendar(periods_file)
+    elif rolling and len(args) == 1:
+        periods = get_rolling_periods(rolling, args[0])
+    elif not periods_file and not rolling and len(args) == 2:
+        periods = None
+        start_date, end_date = args
+    else:
+        print(usage)
+        sys.exit(2)
+    if periods:
+        start_date = min(period["start"] for period in periods)[:10]
+        end_date = max(period["end"] for period in periods)[:10]
 
     config_data = read_config_file("config.env")
+    configure_logging(config_data)
 
     JIRA_URL = get_conf_or_env("JIRA_URL", config_data)
     JIRA_USERNAME = get_conf_or_env("JIRA_USERNAME", config_data)
     JIRA_TOKEN = get_conf_or_env("JIRA_TOKEN", config_data)
     JIRA_TEAM_LABELS = get_conf_or_env("JIRA_TEAM_LABELS", config_data)
+    JIRA_FETCH_WORKERS = int(get_conf_or_env("JIRA_FETCH_WORKERS", config_data) or 1)
+    JIRA_ISSUE_STORE = get_conf_or_env(
+        "JIRA_ISSUE_STORE", config_data, "jira_issues.db"
+    )
+    JIRA_FIELD_CACHE = (
+        get_conf_or_env("JIRA_FIELD_CACHE", config_data) or "jira_fields.json"
+    )
+    JIRA_FIELD_CACHE_TTL = int(
+        get_conf_or_env("JIRA_FIELD_CACHE_TTL", config_data) or FIELD_CACHE_TTL
+    )
+    JIRA_RAW_SEARCH = get_conf_or_env("JIRA_RAW_SEARCH", config_data) == "1"
+    JIRA_LABEL_RULES = get_conf_or_env("JIRA_LABEL_RULES", config_data)
+    JIRA_SHARD_SIZE = int(get_conf_or_env("JIRA_SHARD_SIZE", config_data) or 0)
+    JIRA_TREND_CUBE = (
+        get_conf_or_env("JIRA_TREND_CUBE", config_data) or "jira_trends.db"
+    )
+    JIRA_TERM_STORE = get_conf_or_env("JIRA_TERM_STORE", config_data) or "jira_terms.db"
+    JIRA_TERM_WORKERS = int(get_conf_or_env("JIRA_TERM_WORKERS", config_data) or 1)
+    JIRA_START_STATUSES = get_conf_or_env("JIRA_START_STATUSES", config_data)
+    JIRA_DONE_STATUSES = get_conf_or_env("JIRA_DONE_STATUSES", config_data)
 
     required_variables = "JIRA_URL JIRA_USERNAME JIRA_TOKEN JIRA_TEAM_LABELS".split(" ")
 
@@ -282,20 +513,93 @@ if __name__ == "__main__":
 
     JIRA_TEAM_LABELS = JIRA_TEAM_LABELS.split(",")
 
-    ja = JiraAnalysis(JIRA_URL, JIRA_USERNAME, JIRA_TOKEN, JIRA_TEAM_LABELS)
+    issue_store = IssueStore(JIRA_ISSUE_STORE) if JIRA_ISSUE_STORE else None
+
+    ja = JiraAnalysis(
+        JIRA_URL,
+        JIRA_USERNAME,
+        JIRA_TOKEN,
+        JIRA_TEAM_LABELS,
+        JIRA_FETCH_WORKERS,
+        issue_store,
+        full_resync,
+        (PERIOD_ANALYSES if periods else ["write_issues"] + PERIOD_ANALYSES)
+        + (["trends"] if trends else [])
+        + (["cycle_time"] if cycle_time else [])
+        + (["terms"] if terms else []),
+        field_cache_file=JIRA_FIELD_CACHE,
+        field_cache_ttl=JIRA_FIELD_CACHE_TTL,
+        raw_search=JIRA_RAW_SEARCH,
+        label_rules=load_label_rules(JIRA_LABEL_RULES, JIRA_TEAM_LABELS),
+        shard_size=JIRA_SHARD_SIZE,
+        changelog_store=ChangelogStore(JIRA_ISSUE_STORE) if JIRA_ISSUE_STORE else None,
+        start_statuses=(
+            JIRA_START_STATUSES.split(",") if JIRA_START_STATUSES else START_STATUSES
+        ),
+        done_statuses=(
+            JIRA_DONE_STATUSES.split(",") if JIRA_DONE_STATUSES else DONE_STATUSES
+        ),
+        term_workers=JIRA_TERM_WORKERS,
+        resume=resume,
+    )
+    if resume and not stream and issue_store is None:
+        logger.warning("Nothing to resume from without JIRA_ISSUE_STORE")
+    # Analyses after building the trend cube, cycle times or term counts reuse
+    # their issues
+    cache = trends or cycle_time or terms
 
     # logger.info('Get description')
     # words = ja.get_descriptions_words(start_date, end_date)
     # print u' '.join(words).encode('utf-8')
 
-    logger.info("Writing stories to issues.csv")
-    ja.write_issues(start_date, end_date, "issues.csv")
+    if trends:
+        logger.info("Updating the trend cube in %s", JIRA_TREND_CUBE)
+        ja.build_trends(start_date, end_date, TrendCube(JIRA_TREND_CUBE))
+
+    if cycle_time:
+        logger.info("Running cycle and lead time analysis")
+        ja.analyze_cycle_time(start_date, end_date)
 
-    logger.info("Priority analysis")
-    ja.analyze_priorities(start_date, end_date)
+    if terms:
+        logger.info("Updating term counts in %s", JIRA_TERM_STORE)
+        ja.build_terms(start_date, end_date, TermStore(JIRA_TERM_STORE))
 
-    logger.info("Sprints per story")
-    ja.analyze_sprint_lag(start_date, end_date)
+    if periods:
+        logger.info(
+            "Running priority, sprints per story and story point analysis for %d "
+            "periods into %s",
+            len(periods),
+            report_file,
+        )
+        ja.run_period_analyses(
+            periods,
+            PERIOD_ANALYSES,
+            report_file,
+            cache=cache,
+        )
+    elif stream:
+        logger.info("Streaming stories to issues.csv")
+        issues = ja.export_issues(
+            ja.get_issue_query(start_date, end_date), "issues.csv", resume
+        )
+        analyses = ["priorities", "sprint_lag", "story_points"]
+        if resume:
+            # Pages written before the interruption aren't fetched again so the
+            # analyses would only see part of the issues
+            logger.warning("Resuming the export only, skipping the analyses")
+            analyses = []
+        ja.run_accumulators(issues, analyses)
+    else:
+        logger.info(
+            "Writing stories to issues.csv and running priority, sprints per "
+            "story and story point analysis"
+        )
+        ja.run_analyses(
+            start_date,
+            end_date,
+            ["write_issues", "priorities", "sprint_lag", "story_points"],
+            "issues.csv",
+            cache=cache,
+        )
 
-    logger.info("Story point analysis")
-    ja.analyze_story_points(start_date, end_date)
+    METRICS.write("jira_analysis", config_data)
@@ -0,0 +1,220 @@
+#! /usr/bin/env python
+
+import sys
+import time
+import getopt
+import logging
+
+import jira_analysis
+import jira_epic_stories
+
+from analysis_pipeline import CsvAccumulator, run_pipeline
+from epic_updates import MAX_WRITE_WORKERS
+from jira_helper import FIELD_CACHE_TTL, fetch_all_pages, sync_issues
+from jira_store import EpicRollupStore, IssueStore
+from label_rules import load_label_rules
+from periods import load_calendar
+from util import METRICS, configure_logging, get_conf_or_env, read_config_file
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("jira-combined")
+
+ANALYSES = ["write_issues", "priorities", "sprint_lag", "story_points"]
+
+
+# Fetch the issues of both queries with one search of their union, each issue
+# compacted for both scripts. Returns the analysis and epic issues, split
+# locally with each query's date range, epic and status/type filters
+def fetch_shared_issues(analysis, epic_analysis, query, epic_query):
+    union = "(%s) OR (%s)" % (query, epic_query)
+    # The status and type are what tells the two queries' issues apart
+    fields = sorted(
+        set(analysis.search_fields)
+        | set(epic_analysis.search_fields)
+        | {"status", "issuetype"}
+    )
+
+    def compact(issue):
+        return analysis.compact_issue(issue), epic_analysis.compact_issue(issue)
+
+    with METRICS.span("fetch"):
+        # The union isn't bounded by a single date field so it's never sharded
+        if analysis.issue_store is None:
+            pairs = fetch_all_pages(
+                analysis.jira,
+                union,
+                analysis.fetch_workers,
+                fields,
+                raw=analysis.raw_search,
+                on_page=lambda issues: [compact(issue) for issue in issues],
+            )
+        else:
+            pairs = sync_issues(
+                analysis.jira,
+                analysis.issue_store,
+                union,
+                analysis.fetch_workers,
+                fields,
+                analysis.full_resync,
+                analysis.raw_search,
+                compact,
+                None,
+                analysis.resume,
+            )
+
+    issues = [
+        issue
+        for issue, _ in pairs
+        if query.matches(issue) and analysis.in_issue_query(issue)
+    ]
+    epic_issues = [
+        issue
+        for _, issue in pairs
+        if epic_query.matches(issue) and epic_analysis.in_issue_query(issue)
+    ]
+    METRICS.incr("shared_issues_fetched", len(pairs))
+    logger.info(
+        "Fetched %d issues once for %d analysis and %d epic issues",
+        len(pairs),
+        len(issues),
+        len(epic_issues),
+    )
+    return issues, epic_issues
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+
+    epics_only = False
+    epic = None
+    full_resync = False
+    resume = False
+
+    usage = (
+        "jira_combined.py [--epics] [--epic <epic-id>] [--full-resync] [--resume] "
+        "<start-date> <end-date>"
+    )
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:], "h", ["epics", "epic=", "full-resync", "resume"]
+        )
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(usage)
+            sys.exit()
+        elif opt == "--epics":
+            epics_only = True
+        elif opt == "--epic":
+            epic = arg
+        elif opt == "--full-resync":
+            full_resync = True
+        elif opt == "--resume":
+            resume = True
+    if len(args) != 2:
+        print(usage)
+        sys.exit(2)
+    start_date, end_date = args
+
+    config_data = read_config_file("config.env")
+    configure_logging(config_data)
+
+    JIRA_URL = get_conf_or_env("JIRA_URL", config_data)
+    JIRA_USERNAME = get_conf_or_env("JIRA_USERNAME", config_data)
+    JIRA_TOKEN = get_conf_or_env("JIRA_TOKEN", config_data)
+    JIRA_TEAM_LABELS = get_conf_or_env("JIRA_TEAM_LABELS", config_data)
+    JIRA_FETCH_WORKERS = int(get_conf_or_env("JIRA_FETCH_WORKERS", config_data) or 1)
+    JIRA_ISSUE_STORE = get_conf_or_env(
+        "JIRA_ISSUE_STORE", config_data, "jira_issues.db"
+    )
+    JIRA_FIELD_CACHE = (
+        get_conf_or_env("JIRA_FIELD_CACHE", config_data) or "jira_fields.json"
+    )
+    JIRA_FIELD_CACHE_TTL = int(
+        get_conf_or_env("JIRA_FIELD_CACHE_TTL", config_data) or FIELD_CACHE_TTL
+    )
+    JIRA_RAW_SEARCH = get_conf_or_env("JIRA_RAW_SEARCH", config_data) == "1"
+    JIRA_LABEL_RULES = get_conf_or_env("JIRA_LABEL_RULES", config_data)
+    JIRA_PERIODS_FILE = get_conf_or_env("JIRA_PERIODS_FILE", config_data)
+    JIRA_WRITE_WORKERS = int(
+        get_conf_or_env("JIRA_WRITE_WORKERS", config_data) or MAX_WRITE_WORKERS
+    )
+    JIRA_BULK_EDIT = get_conf_or_env("JIRA_BULK_EDIT", config_data) != "0"
+
+    required_variables = "JIRA_URL JIRA_USERNAME JIRA_TOKEN JIRA_TEAM_LABELS".split(" ")
+
+    for variable in required_variables:
+        if eval(variable) is None:
+            logger.error("Missing %s", variable)
+            sys.exit(1)
+
+    JIRA_TEAM_LABELS = JIRA_TEAM_LABELS.split(",")
+    label_rules = load_label_rules(JIRA_LABEL_RULES, JIRA_TEAM_LABELS)
+
+    issue_store = IssueStore(JIRA_ISSUE_STORE) if JIRA_ISSUE_STORE else None
+    epic_rollups = EpicRollupStore(JIRA_ISSUE_STORE) if JIRA_ISSUE_STORE else None
+
+    ja = jira_analysis.JiraAnalysis(
+        JIRA_URL,
+        JIRA_USERNAME,
+        JIRA_TOKEN,
+        JIRA_TEAM_LABELS,
+        JIRA_FETCH_WORKERS,
+        issue_store,
+        full_resync,
+        ANALYSES,
+        field_cache_file=JIRA_FIELD_CACHE,
+        field_cache_ttl=JIRA_FIELD_CACHE_TTL,
+        raw_search=JIRA_RAW_SEARCH,
+        label_rules=label_rules,
+        resume=resume,
+    )
+    je = jira_epic_stories.JiraAnalysis(
+        JIRA_URL,
+        JIRA_USERNAME,
+        JIRA_TOKEN,
+        JIRA_TEAM_LABELS,
+        JIRA_FETCH_WORKERS,
+        None,
+        full_resync,
+        field_cache_file=JIRA_FIELD_CACHE,
+        field_cache_ttl=JIRA_FIELD_CACHE_TTL,
+        raw_search=JIRA_RAW_SEARCH,
+        calendar=load_calendar(JIRA_PERIODS_FILE),
+        write_workers=JIRA_WRITE_WORKERS,
+        bulk_edit=JIRA_BULK_EDIT,
+        epic_rollups=epic_rollups,
+        label_rules=label_rules,
+        resume=resume,
+    )
+    if resume and issue_store is None:
+        logger.warning("Nothing to resume from without JIRA_ISSUE_STORE")
+    if get_conf_or_env("JIRA_SHARD_SIZE", config_data):
+        logger.info("Fetching the combined search in pages, JIRA_SHARD_SIZE is unused")
+
+    query = ja.get_issue_query(start_date, end_date)
+    epic_query = je.get_issue_query(start_date, end_date, epics_only, epic)
+    issues, epic_issues = fetch_shared_issues(ja, je, query, epic_query)
+
+    logger.info(
+        "Writing stories to issues.csv and running priority, sprints per story "
+        "and story point analysis"
+    )
+    ja.run_accumulators(issues, ANALYSES, "issues.csv")
+
+    logger.info("Writing epic stories to epic_issues.csv")
+    run_pipeline(
+        epic_issues,
+        [
+            CsvAccumulator(
+                "epic_issues.csv", jira_epic_stories.CSV_HEADER, je.get_csv_row
+            )
+        ],
+    )
+    je.summarize_by_epic(epic_issues, epic_query)
+
+    logger.info("Program runtime: %.2f seconds", time.time() - start_time)
+    METRICS.write("jira_combined", config_data)
@@ -1,155 +1,232 @@
 #! /usr/bin/env python
 
 import sys
+import json
 import getopt
 import logging
-import csv
-
-from jira import JIRA
-from math import ceil
 
 import time
-from datetime import datetime
-import pytz
-
-from concurrent.futures import ThreadPoolExecutor
-
-from util import get_or_float_zero, get_conf_or_env, read_config_file
+import numpy as np
+
+from jira_helper import (
+    FIELD_CACHE_TTL,
+    CachedFieldsJIRA,
+    compact_issue,
+    fetch_all_pages,
+    get_csv_row,
+    get_field_index,
+    iter_pages,
+    iter_sharded_issues,
+    sync_issues,
+)
+from periods import bucket_dates, load_calendar, parse_jira_dates, sum_by_period
+from analysis_pipeline import (
+    CsvAccumulator,
+    export_csv_pages,
+    resume_page,
+    run_pipeline,
+)
+from issue_query import IssueQuery, QueryCache
+from label_rules import LabelClassifier, get_default_rules, load_label_rules
+from jira_store import EpicRollupStore, IssueStore
+from epic_updates import MAX_WRITE_WORKERS, plan_epic_updates, write_epic_updates
+from util import (
+    METRICS,
+    configure_logging,
+    get_conf_or_env,
+    read_config_file,
+)
 
 FORMAT = "%(asctime)-15s %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.DEBUG)
 logger = logging.getLogger("post-schedule")
 
-MAX_WORKERS = 4
-
-QUARTER_MAP = {
-    # This will be >=, < (inclusive of start, exclusive of end)
-    "2022-Q1": ("2022-01-10", "2022-04-04"),
-    "2022-Q2": ("2022-04-04", "2022-07-11"),
-    "2022-Q3": ("2022-07-11", "2022-10-01"),
-    "2022-Q4": ("2022-10-01", "2023-01-01"),
+CSV_HEADER = [
+    "ticket",
+    "summary",
+    "team",
+    "story_points",
+    "assignee",
+    "created_date",
+    "resolved_date",
+    "type",
+    "investment_area",
+    "status",
+    "epic",
+    "sprints",
+]
+
+# Issue fields each analysis reads. Custom fields are referenced by the
+# JiraAnalysis attribute that holds their key
+ANALYSIS_FIELDS = {
+    "write_issues": [
+        "summary",
+        "labels",
+        "assignee",
+        "created",
+        "resolutiondate",
+        "issuetype",
+        "status",
+        "story_point_field",
+        "investment_area_field",
+        "epic_link_field",
+        "sprint_field",
+    ],
+    "summarize_by_epic": [
+        "status",
+        "resolutiondate",
+        "story_point_field",
+        "epic_link_field",
+    ],
 }
 
 
-def update_in_jira(jira, epic_id, fields):
-    logger.info("Updating %s", epic_id)
-    epic = jira.issue(epic_id)
-    try:
-        epic.update(notify=False, fields=fields)
-    except Exception as e:
-        print("Failed updating", epic_id, e)
-
-
 class JiraAnalysis:
-    def __init__(self, jira_url, jira_username, jira_token, jira_team_labels):
-        self.issue_cache = {}
-        self.jira = JIRA(jira_url, basic_auth=(jira_username, jira_token))
-        self.jira_team_labels = jira_team_labels
-        self.sprint_field = self.get_custom_field_key("Sprint")
-        self.story_point_field = self.get_custom_field_key("Story Points")
-        self.story_point_done_field = self.get_custom_field_key("Story Points (Done)")
-        self.investment_area_field = self.get_custom_field_key("Investment Area")
-        self.epic_link_field = self.get_custom_field_key("Epic Link")
-        self.num_tickets_field = self.get_custom_field_key("Num Tickets")
-        self.non_pointed_tickets_field = self.get_custom_field_key(
-            "Non-pointed Tickets"
-        )
-        self.story_point_done_q1_field = self.get_custom_field_key(
-            "Story Points (Done 2022Q1)"
+    def __init__(
+        self,
+        jira_url,
+        jira_username,
+        jira_token,
+        jira_team_labels,
+        fetch_workers=1,
+        issue_store=None,
+        full_resync=False,
+        analyses=None,
+        field_cache_file=None,
+        field_cache_ttl=FIELD_CACHE_TTL,
+        raw_search=False,
+        calendar=None,
+        write_workers=MAX_WRITE_WORKERS,
+        bulk_edit=True,
+        epic_rollups=None,
+        label_rules=None,
+        shard_size=None,
+        resume=False,
+    ):
+        self.query_cache = QueryCache()
+        self.resume = resume
+        self.fetch_workers = fetch_workers
+        self.write_workers = write_workers
+        self.bulk_edit = bulk_edit
+        self.epic_rollups = epic_rollups
+        self.issue_store = issue_store
+        self.full_resync = full_resync
+        self.raw_search = raw_search
+        self.shard_size = shard_size
+        self.jira = CachedFieldsJIRA(
+            jira_url,
+            basic_auth=(jira_username, jira_token),
+            field_cache_file=field_cache_file,
+            field_cache_ttl=field_cache_ttl,
         )
-        self.story_point_done_q2_field = self.get_custom_field_key(
-            "Story Points (Done 2022Q2)"
+        self.jira_team_labels = jira_team_labels
+        self.label_classifier = LabelClassifier(
+            label_rules or get_default_rules(jira_team_labels)
         )
-        self.story_point_done_q3_field = self.get_custom_field_key(
-            "Story Points (Done 2022Q3)"
+        self.field_index = get_field_index(self.jira.fields())
+        (
+            self.sprint_field,
+            self.story_point_field,
+            self.story_point_done_field,
+            self.investment_area_field,
+            self.epic_link_field,
+            self.num_tickets_field,
+            self.non_pointed_tickets_field,
+        ) = self.get_custom_field_keys(
+            [
+                "Sprint",
+                "Story Points",
+                "Story Points (Done)",
+                "Investment Area",
+                "Epic Link",
+                "Num Tickets",
+                "Non-pointed Tickets",
+            ]
         )
-        self.story_point_done_q4_field = self.get_custom_field_key(
-            "Story Points (Done 2022Q4)"
+        self.calendar = calendar or load_calendar()
+        self.period_fields = self.get_custom_field_keys(
+            [period["field"] for period in self.calendar]
         )
 
-        if self.sprint_field is None:
-            raise Exception("Failed to find Sprint field")
-
-        if self.story_point_field is None:
-            raise Exception("Failed to find Story Point field")
-
-        if self.investment_area_field is None:
-            raise Exception("Failed to find Investment Area field")
-
-        if self.epic_link_field is None:
-            raise Exception("Failed to find Epic Link field")
-
-    # Retrieve the custom field matching to a particular name since JIRA gives custom fields a random ID
-    def get_custom_field_key(self, name):
-        all_fields = self.jira.fields()
-        for field in all_fields:
-            if field["name"] == name:
-                print(name, field["key"])
-                return field["key"]
-        return None
-
-    # Retrieve the team for an issue - based on labels
-    def get_team(self, issue):
-        for label in issue.fields.labels:
-            for team_label in self.jira_team_labels:
-                if team_label.lower() == label.lower():
-                    return team_label
-        return None
-
-    # Retrieve the investment area
-    def get_investment_area(self, issue):
-        try:
-            ia = getattr(issue.fields, self.investment_area_field)
-            if ia:
-                return ia
-        finally:
-            return []
-
-    # Retrieve the epic link
-    def get_epic_link(self, issue):
-        return getattr(issue.fields, self.epic_link_field, "")
-
-    # Get issue type, a bit weird since it's off of fields and needs to be converted to string
-    def get_issue_type(self, issue):
-        return issue.fields.issuetype.name.lower()
-
-    # Get description from an issue
-    def get_description(self, issue):
-        return issue.fields.description
-
-    # Get story points from an issue
-    def get_story_points(self, issue):
-        return get_or_float_zero(issue.fields, self.story_point_field)
-
-    # Get sprints for an issue
-    def get_sprints(self, issue):
-        sprints = getattr(issue.fields, self.sprint_field)
-        if sprints is None:
-            sprints = []
-        return [s.name for s in sprints]
+        self.compact_fields = {
+            "story_points": self.story_point_field,
+            "epic_link": self.epic_link_field,
+            "investment_area": self.investment_area_field,
+            "sprint": self.sprint_field,
+        }
+
+        self.search_fields = self.get_search_fields(analyses or ANALYSIS_FIELDS)
+
+    # Work out the smallest set of fields the analyses we're about to run read,
+    # plus what the cache needs to slice cached issues to a narrower query
+    def get_search_fields(self, analyses):
+        fields = {"updated", "created", self.epic_link_field}
+        for analysis in analyses:
+            for field in ANALYSIS_FIELDS[analysis]:
+                # Custom fields are named by the attribute holding their key
+                if field.endswith("_field"):
+                    field = getattr(self, field)
+                fields.add(field)
+        return sorted(fields)
+
+    # Retrieve several custom fields at once and fail listing every one that's missing
+    def get_custom_field_keys(self, names):
+        missing = [name for name in names if name not in self.field_index]
+        if missing:
+            raise Exception("Failed to find fields: %s" % ", ".join(missing))
+        return [self.field_index[name] for name in names]
+
+    # Decode an issue once into a compact record for the analyses to read
+    def compact_issue(self, issue):
+        return compact_issue(issue, self.compact_fields, self.label_classifier)
 
     # Wrap the pagination code so user doesn't have to do it themselves
     def get_issues(self, query):
-        if query in self.issue_cache:
-            return self.issue_cache[query]
-
-        all_issues = []
-        MAX_RESULTS = 100
-        issues = self.jira.search_issues(query, maxResults=MAX_RESULTS)
-        total = issues.total
-        all_issues.extend(list(issues))
-        if total > MAX_RESULTS:  # Actually need to paginate
-            for page in range(1, int(ceil(1.0 * total / MAX_RESULTS))):
-                logger.info("Getting page %s", page)
-                issues = self.jira.search_issues(
-                    query, maxResults=MAX_RESULTS, startAt=page * MAX_RESULTS
+        with METRICS.span("fetch"):
+            return self.query_cache.get(query, self.fetch_issues)
+
+    # Fetch the issues for a query from Jira or the issue store
+    def fetch_issues(self, query):
+        if self.issue_store is None and self.shard_size:
+            all_issues = list(
+                iter_sharded_issues(
+                    self.jira,
+                    query,
+                    self.fetch_workers,
+                    self.search_fields,
+                    self.raw_search,
+                    lambda issues: [self.compact_issue(i) for i in issues],
+                    self.shard_size,
                 )
-                logger.info("Retrieved %s issues", len(issues))
-                all_issues.extend(list(issues))
-        logger.info("Total retrieved %s", len(all_issues))
-        self.issue_cache[query] = all_issues
+            )
+        elif self.issue_store is None:
+            all_issues = fetch_all_pages(
+                self.jira,
+                query,
+                self.fetch_workers,
+                self.search_fields,
+                raw=self.raw_search,
+                on_page=lambda issues: [self.compact_issue(i) for i in issues],
+            )
+        else:
+            all_issues = sync_issues(
+                self.jira,
+                self.issue_store,
+                query,
+                self.fetch_workers,
+                self.search_fields,
+                self.full_resync,
+                self.raw_search,
+                self.compact_issue,
+                self.shard_size,
+                self.resume,
+            )
         return all_issues
 
+    # Clean up an issue for the CSV
+    def get_csv_row(self, issue):
+        return get_csv_row(issue, CSV_HEADER)
+
     # Clean up and write issues to a CSV
     def write_issues(
         self, fn, start_date, end_date=None, with_epics_only=False, epic=None
@@ -157,152 +234,233 @@ class JiraAnalysis:
         issues = self.get_issues(
             self.get_issue_query(start_date, end_date, with_epics_only, epic)
         )
-        with open(fn, "w") as f:
-            w = csv.writer(f)
-            w.writerow(
-                [
-                    "ticket",
-                    "summary",
-                    "team",
-                    "story_points",
-                    "assignee",
-                    "created_date",
-                    "resolved_date",
-                    "type",
-                    "investment_area",
-                    "status",
-                    "epic",
-                    "sprints",
-                ]
-            )
-            for issue in issues:
-                w.writerow(
-                    [
-                        issue,
-                        issue.fields.summary.encode("utf-8"),
-                        self.get_team(issue),
-                        self.get_story_points(issue),
-                        issue.fields.assignee if issue.fields.assignee else "None",
-                        issue.fields.created,
-                        issue.fields.resolutiondate,
-                        self.get_issue_type(issue),
-                        ",".join(self.get_investment_area(issue)),
-                        issue.fields.status,
-                        self.get_epic_link(issue),
-                        ",".join(self.get_sprints(issue)),
-                    ]
-                )
+        run_pipeline(issues, [CsvAccumulator(fn, CSV_HEADER, self.get_csv_row)])
         return issues
 
-    def summarize_by_epic(self, issues):
-        # Covert to python date times
-        qm = {}
-        for quarter, date_range in QUARTER_MAP.items():
-            s, e = date_range
-            sd = datetime.strptime(s, "%Y-%m-%d")
-            sd = sd.replace(tzinfo=pytz.UTC)
-            ed = datetime.strptime(e, "%Y-%m-%d")
-            ed = ed.replace(tzinfo=pytz.UTC)
-            qm[quarter] = (sd, ed)
+    # Yield pages of compact issues straight from Jira, starting at start_page
+    def iter_issue_pages(self, query, start_page=0):
+        for issues in iter_pages(
+            self.jira,
+            query,
+            self.fetch_workers,
+            self.search_fields,
+            raw=self.raw_search,
+            start_page=start_page,
+        ):
+            yield [self.compact_issue(issue) for issue in issues]
+
+    # Stream issues from Jira while writing them to a CSV page by page. With
+    # resume an interrupted export continues after the last page it wrote
+    def export_issues(self, query, fn, resume=False):
+        start_page = resume_page(fn, query) if resume else 0
+        return export_csv_pages(
+            self.iter_issue_pages(query, start_page),
+            fn,
+            CSV_HEADER,
+            self.get_csv_row,
+            query,
+            start_page,
+        )
 
-        epic_map = {}
+    # Roll issues up per epic: count, total and done story points, non-pointed
+    # tickets and story points done in each calendar period. Everything is
+    # computed as one grouped aggregation over arrays of the issue values
+    def get_epic_rollups(self, issues):
+        epics = []
+        story_points = []
+        done = []
+        resolution_dates = []
         for issue in issues:
-            epic = self.get_epic_link(issue)
-            story_points = self.get_story_points(issue)
-            status = str(issue.fields.status).strip()
-
-            if story_points is None:
-                story_points = 0
-
-            if epic:
-                if epic in epic_map:
-                    l = epic_map[epic]
-                else:
-                    # Count, Total SP, Done SP, Non Pointed Tickets
-                    l = {
-                        "count": 0,
-                        "total_sp": 0,
-                        "done_sp": 0,
-                        "non_pointed_tickets": 0,
-                        "2022-Q1": 0,
-                        "2022-Q2": 0,
-                        "2022-Q3": 0,
-                        "2022-Q4": 0,
-                    }
-
-                done_quarter = None
-                for q, dr in qm.items():
-                    s, e = dr
-                    if issue.fields.resolutiondate:
-                        print(issue.fields.resolutiondate)
-                        rd = datetime.strptime(
-                            issue.fields.resolutiondate, "%Y-%m-%dT%H:%M:%S.%f%z"
-                        )
-                        if rd >= s and rd < e:
-                            done_quarter = q
-                            break
-
-                l["count"] += 1
-                l["total_sp"] += story_points
-                if status == "Done":
-                    l["done_sp"] += story_points
-                if story_points == 0:
-                    l["non_pointed_tickets"] += 1
-                if done_quarter:
-                    l[done_quarter] += story_points
-                epic_map[epic] = l
-
-        logger.info("Updating %d epics", len(epic_map))
-        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
-        futures = []
-        for epic_id, vals in epic_map.items():
-            future = executor.submit(
-                update_in_jira,
-                self.jira,
-                epic_id,
-                {
-                    self.num_tickets_field: vals["count"],
-                    self.story_point_field: vals["total_sp"],
-                    self.story_point_done_field: vals["done_sp"],
-                    self.non_pointed_tickets_field: vals["non_pointed_tickets"],
-                    self.story_point_done_q1_field: vals["2022-Q1"],
-                    self.story_point_done_q2_field: vals["2022-Q2"],
-                    self.story_point_done_q3_field: vals["2022-Q3"],
-                    self.story_point_done_q4_field: vals["2022-Q4"],
+            if issue.epic:
+                epics.append(issue.epic)
+                story_points.append(issue.story_points or 0)
+                done.append(issue.status.strip() == "Done")
+                resolution_dates.append(issue.resolutiondate)
+        if not epics:
+            return {}
+
+        epic_ids, groups = np.unique(np.array(epics), return_inverse=True)
+        story_points = np.array(story_points, dtype=float)
+        done = np.array(done)
+        num_epics = len(epic_ids)
+
+        counts = np.bincount(groups, minlength=num_epics)
+        total_sp = np.bincount(groups, weights=story_points, minlength=num_epics)
+        done_sp = np.bincount(groups, weights=story_points * done, minlength=num_epics)
+        non_pointed = np.bincount(
+            groups, weights=story_points == 0, minlength=num_epics
+        )
+        periods = bucket_dates(parse_jira_dates(resolution_dates), self.calendar)
+        period_sp = sum_by_period(
+            groups, num_epics, periods, len(self.calendar), story_points
+        )
+
+        epic_map = {}
+        for i, epic_id in enumerate(epic_ids):
+            epic_map[str(epic_id)] = {
+                "count": int(counts[i]),
+                "total_sp": float(total_sp[i]),
+                "done_sp": float(done_sp[i]),
+                "non_pointed_tickets": int(non_pointed[i]),
+                "periods": {
+                    period["name"]: float(period_sp[i, j])
+                    for j, period in enumerate(self.calendar)
                 },
+            }
+        return epic_map
+
+    # What each issue adds to its epic's rollup as (key, updated, epic,
+    # story_points, done, period) with the periods bucketed in one go
+    def get_contributions(self, issues):
+        periods = bucket_dates(
+            parse_jira_dates([issue.resolutiondate for issue in issues]),
+            self.calendar,
+        )
+        return [
+            (
+                issue.key,
+                issue.updated,
+                issue.epic,
+                float(issue.story_points or 0),
+                int(issue.status.strip() == "Done"),
+                self.calendar[period]["name"] if period >= 0 else None,
             )
-            futures.append(future)
+            for issue, period in zip(issues, periods)
+        ]
+
+    # Rollups bucketed with a different calendar can't be reused so the calendar
+    # is part of what they're stored under
+    def get_rollup_key(self, query):
+        return query + "\nperiods=" + json.dumps(self.calendar, sort_keys=True)
+
+    # Bring the stored rollups up to date with the issues a query returns now.
+    # Only issues whose updated time changed since the last run, and issues that
+    # no longer match the query, are applied so the work scales with churn.
+    # Returns the rollups of the epics that changed, along with any whose
+    # earlier write didn't make it to Jira
+    def update_epic_rollups(self, query, issues):
+        key = self.get_rollup_key(query)
+        if self.full_resync:
+            self.epic_rollups.clear(key)
+
+        known = self.epic_rollups.get_updated(key)
+        issues = list(issues)
+        changed = [
+            issue
+            for issue in issues
+            if issue.key not in known or known[issue.key] != issue.updated
+        ]
+        removed = set(known) - {issue.key for issue in issues}
+        epics = self.epic_rollups.apply(key, self.get_contributions(changed), removed)
+        logger.info(
+            "%d of %d issues changed and %d were removed, touching %d epics",
+            len(changed),
+            len(issues),
+            len(removed),
+            len(epics),
+        )
+        return self.epic_rollups.load(
+            key,
+            self.epic_rollups.get_pending(key),
+            [period["name"] for period in self.calendar],
+        )
 
-        for future in futures:
-            logger.info(future.result())
-            future.result()
+    # The epic fields to write for a rollup
+    def get_rollup_fields(self, vals):
+        fields = {
+            self.num_tickets_field: vals["count"],
+            self.story_point_field: vals["total_sp"],
+            self.story_point_done_field: vals["done_sp"],
+            self.non_pointed_tickets_field: vals["non_pointed_tickets"],
+        }
+        for period, field in zip(self.calendar, self.period_fields):
+            fields[field] = vals["periods"][period["name"]]
+        return fields
+
+    # Only the epics and fields whose rollup changed since the last run are
+    # written. With a rollup store and the issues' query only the epics whose
+    # issues changed are looked at, and the planned writes are checkpointed as
+    # they're applied so with resume an interrupted run only reads and writes
+    # the epics it hadn't got to
+    def summarize_by_epic(self, issues, query=None):
+        if self.epic_rollups is not None and query is not None:
+            key = self.get_rollup_key(query)
+            epic_map = self.update_epic_rollups(query, issues)
+        else:
+            key = None
+            epic_map = self.get_epic_rollups(issues)
+        targets = {
+            epic_id: self.get_rollup_fields(vals) for epic_id, vals in epic_map.items()
+        }
+
+        written, unwritten = set(), {}
+        if key is not None and self.resume:
+            written, unwritten = self.epic_rollups.get_write_plan(key, targets)
+            logger.info(
+                "Resuming epic updates, %d already written and %d still to write",
+                len(written),
+                len(unwritten),
+            )
+        elif key is not None:
+            self.epic_rollups.clear_write_plan(key)
+        to_plan = {
+            epic_id: fields
+            for epic_id, fields in targets.items()
+            if epic_id not in written and epic_id not in unwritten
+        }
+        updates, skipped = plan_epic_updates(self.jira, to_plan, self.fetch_workers)
+        if key is not None:
+            self.epic_rollups.save_write_plan(key, to_plan, updates)
+        updates.update(unwritten)
+
+        logger.info("Updating %d epics", len(updates))
+        failed = []
+        summary = write_epic_updates(
+            self.jira,
+            updates,
+            self.write_workers,
+            self.bulk_edit,
+            failed,
+            (lambda epics: self.epic_rollups.mark_written(key, epics)) if key else None,
+        )
+        summary["skipped"] = skipped + len(written)
+        if key is not None:
+            self.epic_rollups.clear_pending(key, set(epic_map) - set(failed))
+            self.epic_rollups.clear_write_plan(key)
+        logger.info("Epic updates %s", summary)
+        return summary
 
     # Get all done stories and bugs within a date range
     def get_issue_query(
         self, start_date, end_date=None, with_epics_only=False, epic=None
     ):
-        query = (
-            """project = "TL"
-            AND type in ("story", "bug", "task", "spike", "access", "incident")
-            AND status != closed
-            AND created >= "%s"
-            """
-            % start_date
+        query = IssueQuery(
+            'project = "TL"'
+            ' AND type in ("story", "bug", "task", "spike", "access", "incident")'
+            " AND status != closed",
+            "created",
+            start_date,
+            end_date,
+            epic=epic,
+            epics_only=with_epics_only,
         )
 
-        if end_date:
-            query += ' AND created <= "%s"' % end_date
-
-        if with_epics_only:
-            query += ' AND "Epic Link" is not empty'
-
-        if epic:
-            query += ' AND "Epic Link" = "%s"' % epic
-
-        print(query)
+        logger.debug("Issue query %s", query)
 
         return query
 
+    # The status and type filters of get_issue_query checked on a fetched issue,
+    # for issues that came from a broader search
+    def in_issue_query(self, issue):
+        return (issue.status or "").lower() != "closed" and issue.issue_type in (
+            "story",
+            "bug",
+            "task",
+            "spike",
+            "access",
+            "incident",
+        )
+
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -310,21 +468,25 @@ if __name__ == "__main__":
     start_date = end_date = None
     epics_only = False
     epic = None
+    full_resync = False
+    stream = False
+    resume = False
 
     try:
         opts, args = getopt.getopt(
-            sys.argv[1:], "se:", ["start=", "end=", "epics", "epic="]
+            sys.argv[1:],
+            "se:",
+            ["start=", "end=", "epics", "epic=", "full-resync", "stream", "resume"],
         )
     except getopt.GetoptError as e:
         print(
-            "jira_epic_stories.py -s <start-date> -e <end-date> --epics --epic=<epic-id>"
+            "jira_epic_stories.py -s <start-date> -e <end-date> --epics --epic=<epic-id> --full-resync --stream --resume"
         )
         sys.exit(2)
     for opt, arg in opts:
-        print(opt, arg)
         if opt == "-h":
             print(
-                "jira_epic_stories.py -s <start-date> -e <end-date> --epics --epic=<epic-id>"
+                "jira_epic_stories.py -s <start-date> -e <end-date> --epics --epic=<epic-id> --full-resync --stream --resume"
             )
             sys.exit()
         elif opt in ("-s", "--start"):
@@ -335,13 +497,38 @@ if __name__ == "__main__":
             epics_only = True
         elif opt in ("--epic",):
             epic = arg
+        elif opt in ("--full-resync",):
+            full_resync = True
+        elif opt in ("--stream",):
+            stream = True
+        elif opt in ("--resume",):
+            resume = True
 
     config_data = read_config_file("config.env")
+    configure_logging(config_data)
 
     JIRA_URL = get_conf_or_env("JIRA_URL", config_data)
     JIRA_USERNAME = get_conf_or_env("JIRA_USERNAME", config_data)
     JIRA_TOKEN = get_conf_or_env("JIRA_TOKEN", config_data)
     JIRA_TEAM_LABELS = get_conf_or_env("JIRA_TEAM_LABELS", config_data)
+    JIRA_FETCH_WORKERS = int(get_conf_or_env("JIRA_FETCH_WORKERS", config_data) or 1)
+    JIRA_ISSUE_STORE = get_conf_or_env(
+        "JIRA_ISSUE_STORE", config_data, "jira_issues.db"
+    )
+    JIRA_FIELD_CACHE = (
+        get_conf_or_env("JIRA_FIELD_CACHE", config_data) or "jira_fields.json"
+    )
+    JIRA_FIELD_CACHE_TTL = int(
+        get_conf_or_env("JIRA_FIELD_CACHE_TTL", config_data) or FIELD_CACHE_TTL
+    )
+    JIRA_RAW_SEARCH = get_conf_or_env("JIRA_RAW_SEARCH", config_data) == "1"
+    JIRA_LABEL_RULES = get_conf_or_env("JIRA_LABEL_RULES", config_data)
+    JIRA_SHARD_SIZE = int(get_conf_or_env("JIRA_SHARD_SIZE", config_data) or 0)
+    JIRA_PERIODS_FILE = get_conf_or_env("JIRA_PERIODS_FILE", config_data)
+    JIRA_WRITE_WORKERS = int(
+        get_conf_or_env("JIRA_WRITE_WORKERS", config_data) or MAX_WRITE_WORKERS
+    )
+    JIRA_BULK_EDIT = get_conf_or_env("JIRA_BULK_EDIT", config_data) != "0"
 
     required_variables = "JIRA_URL JIRA_USERNAME JIRA_TOKEN JIRA_TEAM_LABELS".split(" ")
 
@@ -352,10 +539,46 @@ if __name__ == "__main__":
 
     JIRA_TEAM_LABELS = JIRA_TEAM_LABELS.split(",")
 
-    ja = JiraAnalysis(JIRA_URL, JIRA_USERNAME, JIRA_TOKEN, JIRA_TEAM_LABELS)
-
-    logger.info("Writing stories to issues.csv")
-    issues = ja.write_issues("issues.csv", start_date, end_date, epics_only, epic)
-    ja.summarize_by_epic(issues)
+    issue_store = IssueStore(JIRA_ISSUE_STORE) if JIRA_ISSUE_STORE else None
+    epic_rollups = EpicRollupStore(JIRA_ISSUE_STORE) if JIRA_ISSUE_STORE else None
+
+    ja = JiraAnalysis(
+        JIRA_URL,
+        JIRA_USERNAME,
+        JIRA_TOKEN,
+        JIRA_TEAM_LABELS,
+        JIRA_FETCH_WORKERS,
+        issue_store,
+        full_resync,
+        field_cache_file=JIRA_FIELD_CACHE,
+        field_cache_ttl=JIRA_FIELD_CACHE_TTL,
+        raw_search=JIRA_RAW_SEARCH,
+        label_rules=load_label_rules(JIRA_LABEL_RULES, JIRA_TEAM_LABELS),
+        shard_size=JIRA_SHARD_SIZE,
+        calendar=load_calendar(JIRA_PERIODS_FILE),
+        write_workers=JIRA_WRITE_WORKERS,
+        bulk_edit=JIRA_BULK_EDIT,
+        epic_rollups=epic_rollups,
+        resume=resume,
+    )
+    if resume and not stream and issue_store is None:
+        logger.warning("Nothing to resume from without JIRA_ISSUE_STORE")
+    query = ja.get_issue_query(start_date, end_date, epics_only, epic)
+
+    if stream:
+        logger.info("Streaming stories to issues.csv")
+        issues = ja.export_issues(query, "issues.csv", resume)
+        if resume:
+            # Pages written before the interruption aren't fetched again so the
+            # epic rollups would only count part of the issues
+            logger.warning("Resuming the export only, skipping the epic updates")
+            run_pipeline(issues, [])
+        else:
+            ja.summarize_by_epic(issues, query)
+    else:
+        logger.info("Writing stories to issues.csv")
+        issues = ja.write_issues("issues.csv", start_date, end_date, epics_only, epic)
+        ja.summarize_by_epic(issues, query)
 
     logger.info("Program runtime: %.2f seconds", time.time() - start_time)
+    METRICS.write("jira_epic_stories", config_data)
@@ -0,0 +1,814 @@
+#! /usr/bin/env python
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from math import ceil
+
+from jira import JIRA
+from jira.client import ResultList
+from jira.resources import Issue
+
+from util import METRICS, get_or_float_zero, instrument_session
+
+# orjson parses search responses several times faster, fall back to json if it's missing
+try:
+    import orjson as fast_json
+except ImportError:
+    fast_json = json
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("jira-helper")
+
+MAX_RESULTS = 100
+
+SYNC_TIME_FORMAT = "%Y-%m-%d %H:%M"
+# JQL dates are read in the Jira user's timezone which we don't know here so
+# look back far enough to cover any offset from UTC
+SYNC_OVERLAP = timedelta(days=1)
+
+FIELD_CACHE_TTL = 24 * 60 * 60
+
+# Sharded fetches split a query's date range into shards of at most SHARD_SIZE
+# issues so no search pages deep into startAt. JQL dates go down to the minute
+SHARD_SIZE = 2000
+SHARD_MIN_SPAN = timedelta(minutes=1)
+# Shards aren't split below SHARD_MIN_WIDTH and planning stops after
+# SHARD_MAX_COUNTS count searches, shards still too big are paged through
+SHARD_MIN_WIDTH = timedelta(hours=1)
+SHARD_MAX_COUNTS = 200
+JQL_DATE_FORMAT = "%Y-%m-%d %H:%M"
+JQL_DATE_FORMATS = (JQL_DATE_FORMAT, "%Y-%m-%d", "%Y/%m/%d %H:%M", "%Y/%m/%d")
+
+# Same order jira's Resource uses to pick a human readable name
+READABLE_IDS = (
+    "displayName",
+    "key",
+    "name",
+    "filename",
+    "value",
+    "scope",
+    "votes",
+    "id",
+    "mimeType",
+    "closed",
+)
+
+
+# Lightweight stand in for jira's Resource objects. Attributes are read straight
+# from the parsed JSON when accessed so nothing is built up front
+class RawResource:
+    __slots__ = ("raw",)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __getattr__(self, name):
+        try:
+            return wrap_raw(self.raw[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __str__(self):
+        for name in READABLE_IDS:
+            if name in self.raw:
+                return str(self.raw[name])
+        return repr(self.raw)
+
+    def __repr__(self):
+        return "<RawResource %s>" % self
+
+
+# Give nested JSON objects the same attribute access as the top level
+def wrap_raw(value):
+    if isinstance(value, dict):
+        return RawResource(value)
+    if isinstance(value, list):
+        return [wrap_raw(v) for v in value]
+    return value
+
+
+# Call the search endpoint directly and skip building jira Resource objects
+def search_raw_issues(jira, query, start_at, max_results, fields=None, expand=None):
+    params = {"jql": query, "startAt": start_at, "maxResults": max_results}
+    if fields:
+        params["fields"] = ",".join(fields)
+    if expand:
+        params["expand"] = expand
+    response = jira._session.get(jira._get_url("search"), params=params)
+    data = fast_json.loads(response.content)
+    return ResultList(
+        [RawResource(raw) for raw in data["issues"]],
+        data["startAt"],
+        data["maxResults"],
+        data["total"],
+    )
+
+
+# Turn stored JSON back into issues
+def load_issues(jira, raw_issues, raw=False):
+    for issue in raw_issues:
+        if raw:
+            yield RawResource(issue)
+        else:
+            yield Issue(jira._options, jira._session, raw=issue)
+
+
+# Intern strings that repeat across issues so every issue shares one copy
+def intern_or_none(value):
+    if value is None:
+        return None
+    return sys.intern(str(value))
+
+
+# Compact, already decoded view of an issue that the analyses read from instead
+# of holding on to the full jira objects. Fields the search didn't ask for are None
+class IssueRecord:
+    __slots__ = (
+        "key",
+        "summary",
+        "description",
+        "labels",
+        "team",
+        "priority",
+        "period",
+        "story_points",
+        "assignee",
+        "created",
+        "resolutiondate",
+        "updated",
+        "issue_type",
+        "status",
+        "investment_area",
+        "epic",
+        "sprints",
+    )
+
+    def __init__(self, key, **values):
+        self.key = key
+        for name in self.__slots__[1:]:
+            setattr(self, name, values.get(name))
+
+    def __str__(self):
+        return self.key
+
+    def __repr__(self):
+        return "<IssueRecord %s>" % self.key
+
+
+# Decode an issue once into a compact record for the analyses to read, anything
+# the search didn't return is left as None. field_keys maps story_points,
+# epic_link, investment_area and sprint to their custom field keys and the
+# classifier reads the team, priority and period from the labels
+def compact_issue(issue, field_keys, classifier):
+    fields = issue.fields
+    record = IssueRecord(
+        intern_or_none(issue),
+        summary=getattr(fields, "summary", None),
+        description=getattr(fields, "description", None),
+        created=getattr(fields, "created", None),
+        resolutiondate=getattr(fields, "resolutiondate", None),
+        updated=getattr(fields, "updated", None),
+        story_points=get_or_float_zero(fields, field_keys["story_points"]),
+        epic=intern_or_none(getattr(fields, field_keys["epic_link"], "")),
+    )
+    if hasattr(fields, "labels"):
+        record.labels = tuple(intern_or_none(label) for label in fields.labels)
+        classes = classifier.classify(fields.labels)
+        record.team = classes["team"]
+        record.priority = classes["priority"]
+        record.period = classes["period"]
+    if hasattr(fields, "assignee"):
+        record.assignee = intern_or_none(fields.assignee or "None")
+    if hasattr(fields, "issuetype"):
+        record.issue_type = intern_or_none(fields.issuetype.name.lower())
+    if hasattr(fields, "status"):
+        record.status = intern_or_none(fields.status)
+    if hasattr(fields, field_keys["investment_area"]):
+        record.investment_area = tuple(
+            getattr(fields, field_keys["investment_area"]) or []
+        )
+    if hasattr(fields, field_keys["sprint"]):
+        sprints = getattr(fields, field_keys["sprint"]) or []
+        # Sprints come back as objects or, from some servers, plain names
+        record.sprints = tuple(
+            intern_or_none(getattr(sprint, "name", sprint)) for sprint in sprints
+        )
+    return record
+
+
+# How each CSV column is read from an issue record
+CSV_COLUMNS = {
+    "ticket": lambda issue: issue,
+    "summary": lambda issue: issue.summary,
+    "team": lambda issue: issue.team,
+    "priority": lambda issue: issue.priority,
+    "story_points": lambda issue: issue.story_points,
+    "assignee": lambda issue: issue.assignee,
+    "created_date": lambda issue: issue.created,
+    "resolved_date": lambda issue: issue.resolutiondate,
+    "type": lambda issue: issue.issue_type,
+    "investment_area": lambda issue: ",".join(issue.investment_area),
+    "status": lambda issue: issue.status,
+    "epic": lambda issue: issue.epic,
+    "sprints": lambda issue: ",".join(issue.sprints),
+}
+
+
+# Clean up an issue for a CSV with the given header
+def get_csv_row(issue, header):
+    return [CSV_COLUMNS[column](issue) for column in header]
+
+
+# Read the field catalog for a server from a JSON file, only calling fetch when
+# the cached copy is missing or older than ttl seconds
+def get_field_catalog(server, fetch, cache_file, ttl=FIELD_CACHE_TTL):
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+
+    entry = cache.get(server)
+    if entry and time.time() - entry["fetched_at"] < ttl:
+        logger.info("Using field catalog cached in %s", cache_file)
+        METRICS.incr("field_catalog_cache_hits")
+        return entry["fields"]
+
+    METRICS.incr("field_catalog_cache_misses")
+    fields = fetch()
+    if cache_file:
+        cache[server] = {"fetched_at": time.time(), "fields": fields}
+        with open(cache_file, "w") as f:
+            json.dump(cache, f)
+    return fields
+
+
+# Map field names to keys, the first field wins if a name is used twice
+def get_field_index(fields):
+    index = {}
+    for field in fields:
+        index.setdefault(field["name"], field["key"])
+    return index
+
+
+# JIRA client that only downloads the field catalog once per process and shares
+# it across runs through the cache file. The client asks for the catalog while
+# it's being constructed so this covers that call too. Every call made through
+# the client's session afterwards is counted in the run's metrics
+class CachedFieldsJIRA(JIRA):
+    def __init__(
+        self, *args, field_cache_file=None, field_cache_ttl=FIELD_CACHE_TTL, **kwargs
+    ):
+        self.field_cache_file = field_cache_file
+        self.field_cache_ttl = field_cache_ttl
+        self.field_catalog = None
+        with METRICS.span("jira_connect"):
+            JIRA.__init__(self, *args, **kwargs)
+        instrument_session(self._session, "jira")
+
+    def fields(self):
+        if self.field_catalog is None:
+            with METRICS.span("field_lookup"):
+                self.field_catalog = get_field_catalog(
+                    self._options["server"],
+                    super().fields,
+                    self.field_cache_file,
+                    self.field_cache_ttl,
+                )
+        return self.field_catalog
+
+
+# Fetch a single page of search results and time how long it took
+def fetch_page(
+    jira, query, page, fields=None, max_results=MAX_RESULTS, raw=False, expand=None
+):
+    start = time.time()
+    if raw:
+        issues = search_raw_issues(
+            jira, query, page * max_results, max_results, fields, expand
+        )
+    else:
+        issues = jira.search_issues(
+            query,
+            maxResults=max_results,
+            startAt=page * max_results,
+            fields=fields,
+            expand=expand,
+        )
+    latency = time.time() - start
+    METRICS.record("fetch_page", latency)
+    METRICS.incr("issues_fetched", len(issues))
+    logger.info("Retrieved page %s with %s issues in %.2fs", page, len(issues), latency)
+    return issues, latency
+
+
+# Yield every page of a search in order, starting at start_page. The first page
+# tells us the total and the remaining pages are fetched by up to max_workers
+# threads at a time
+def iter_pages(
+    jira,
+    query,
+    max_workers=1,
+    fields=None,
+    max_results=MAX_RESULTS,
+    latencies=None,
+    raw=False,
+    start_page=0,
+    expand=None,
+):
+    issues, latency = fetch_page(
+        jira, query, start_page, fields, max_results, raw, expand
+    )
+    if latencies is not None:
+        latencies.append(latency)
+    yield issues
+
+    num_pages = int(ceil(1.0 * issues.total / max_results))
+    if num_pages <= start_page + 1:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    next_page = start_page + 1
+    try:
+        while next_page < num_pages or pending:
+            # Keep a bounded window in flight so memory doesn't grow with the result size
+            while next_page < num_pages and len(pending) < 2 * max_workers:
+                future = executor.submit(
+                    fetch_page,
+                    jira,
+                    query,
+                    next_page,
+                    fields,
+                    max_results,
+                    raw,
+                    expand,
+                )
+                pending.append((next_page, future))
+                next_page += 1
+
+            page, future = pending.popleft()
+            try:
+                issues, latency = future.result()
+            except Exception as e:
+                raise Exception(
+                    "Failed fetching page %s of %s: %s" % (page, num_pages, e)
+                )
+            if latencies is not None:
+                latencies.append(latency)
+            yield issues
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+# Yield the issues from every page of a search in order, starting at
+# start_page. on_page is given each page as it arrives and returns what to yield
+# from it, on_progress is then told the number of the page it handled
+def iter_all_issues(
+    jira,
+    query,
+    max_workers=1,
+    fields=None,
+    max_results=MAX_RESULTS,
+    raw=False,
+    on_page=list,
+    expand=None,
+    start_page=0,
+    on_progress=None,
+):
+    start = time.time()
+    latencies = []
+    count = 0
+    for page, issues in enumerate(
+        iter_pages(
+            jira,
+            query,
+            max_workers,
+            fields,
+            max_results,
+            latencies,
+            raw,
+            start_page,
+            expand,
+        ),
+        start_page,
+    ):
+        kept = on_page(issues)
+        if on_progress is not None:
+            on_progress(page)
+        count += len(kept)
+        yield from kept
+    logger.info(
+        "Total retrieved %s in %d pages with %d workers in %.2fs "
+        "(page latency min %.2fs avg %.2fs max %.2fs)",
+        count,
+        len(latencies),
+        max_workers,
+        time.time() - start,
+        min(latencies),
+        sum(latencies) / len(latencies),
+        max(latencies),
+    )
+
+
+# Fetch every page of a search and return all the issues in order
+def fetch_all_pages(
+    jira,
+    query,
+    max_workers=1,
+    fields=None,
+    max_results=MAX_RESULTS,
+    raw=False,
+    on_page=list,
+    expand=None,
+):
+    return list(
+        iter_all_issues(
+            jira, query, max_workers, fields, max_results, raw, on_page, expand
+        )
+    )
+
+
+# Number of issues a query matches without fetching any of them
+def count_issues(jira, query):
+    response = jira._session.get(
+        jira._get_url("search"),
+        params={"jql": query, "startAt": 0, "maxResults": 0, "fields": "key"},
+    )
+    return fast_json.loads(response.content)["total"]
+
+
+def parse_jql_date(value):
+    for date_format in JQL_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    return None
+
+
+# The date field a query is bounded by and its range as (field, start, end),
+# None if there's no lower bound to shard from. Without an upper bound the range
+# runs until tomorrow to cover any timezone
+def get_date_range(query):
+    for field, value in re.findall(r'\b(\w+)\s*>=\s*"([^"]+)"', query):
+        start = parse_jql_date(value)
+        if start is None:
+            continue
+        upper = re.search(r'\b%s\s*<=?\s*"([^"]+)"' % field, query)
+        end = parse_jql_date(upper.group(1)) if upper else None
+        if end is None:
+            end = datetime.now() + timedelta(days=1)
+        return field, start, end + SHARD_MIN_SPAN
+    return None
+
+
+# Limit a query to issues with field in [start, end)
+def shard_query(query, field, start, end):
+    return '(%s) AND %s >= "%s" AND %s < "%s"' % (
+        query,
+        field,
+        start.strftime(JQL_DATE_FORMAT),
+        field,
+        end.strftime(JQL_DATE_FORMAT),
+    )
+
+
+def floor_minute(date):
+    return date.replace(second=0, microsecond=0)
+
+
+# Split [start, end) into shards that each match at most shard_size issues.
+# The range starts out in equal slices by the total count and any slice that's
+# still too big is halved until it fits. Slices narrower than twice min_width
+# aren't split and once max_counts searches have been counted the remaining
+# slices are kept as they are, so a burst of issues in one moment or a range
+# that's dense throughout costs a bounded number of counts and the shards that
+# are still too big get paged through
+def plan_shards(
+    jira,
+    query,
+    field,
+    start,
+    end,
+    shard_size,
+    executor,
+    min_width=SHARD_MIN_WIDTH,
+    max_counts=SHARD_MAX_COUNTS,
+):
+    total = count_issues(jira, query)
+    counts_left = max_counts - 1
+    num_shards = max(1, int(ceil(1.0 * total / shard_size)))
+    num_shards = max(1, min(num_shards, int((end - start) / min_width)))
+    step = (end - start) / num_shards
+    bounds = sorted(
+        {start, end} | {floor_minute(start + step * i) for i in range(1, num_shards)}
+    )
+    pending = list(zip(bounds, bounds[1:]))
+
+    shards = []
+    oversized = 0
+    while pending:
+        if len(pending) > counts_left:
+            logger.warning(
+                "Stopped splitting %s after %d counts, paging through %d shards",
+                field,
+                max_counts - counts_left,
+                len(pending),
+            )
+            shards.extend(pending)
+            break
+        counts_left -= len(pending)
+        counts = executor.map(
+            lambda shard: count_issues(jira, shard_query(query, field, *shard)),
+            pending,
+        )
+        to_split = []
+        for (shard_start, shard_end), count in zip(pending, counts):
+            middle = floor_minute(shard_start + (shard_end - shard_start) / 2)
+            if count > shard_size and shard_end - shard_start >= 2 * min_width:
+                to_split.extend([(shard_start, middle), (middle, shard_end)])
+            elif count:
+                shards.append((shard_start, shard_end))
+                if count > shard_size:
+                    oversized += 1
+        pending = to_split
+    shards.sort(reverse=True)
+    METRICS.incr("shard_counts", max_counts - counts_left)
+    logger.info(
+        "Split %d issues by %s into %d shards of up to %d with %d counts, "
+        "%d shards still bigger are paged through",
+        total,
+        field,
+        len(shards),
+        shard_size,
+        max_counts - counts_left,
+        oversized,
+    )
+    return shards
+
+
+# Fetch a search as concurrent date shards instead of one deep pagination and
+# yield what on_page keeps of each shard's issues, newest shard first. Issues
+# seen in an earlier shard (their date moved during the fetch) are dropped.
+# on_progress is told the start of each shard once it's handled and before
+# limits the fetch to dates before that to carry on from it. Queries without a
+# date range are paginated, from start_page, and report page numbers instead
+def iter_sharded_issues(
+    jira,
+    query,
+    max_workers=1,
+    fields=None,
+    raw=False,
+    on_page=list,
+    shard_size=SHARD_SIZE,
+    before=None,
+    start_page=0,
+    on_progress=None,
+):
+    date_range = get_date_range(query)
+    if date_range is None:
+        logger.info("Query has no date range to shard, paginating it instead")
+        yield from iter_all_issues(
+            jira,
+            query,
+            max_workers,
+            fields,
+            raw=raw,
+            on_page=on_page,
+            start_page=start_page,
+            on_progress=on_progress,
+        )
+        return
+
+    start = time.time()
+    field, range_start, range_end = date_range
+    if before is not None:
+        range_end = min(range_end, before)
+        if range_end <= range_start:
+            return
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    seen = set()
+    duplicates = 0
+    try:
+        shards = deque(
+            plan_shards(
+                jira, query, field, range_start, range_end, shard_size, executor
+            )
+        )
+        while shards or pending:
+            while shards and len(pending) < 2 * max_workers:
+                shard = shards.popleft()
+                future = executor.submit(
+                    fetch_all_pages,
+                    jira,
+                    shard_query(query, field, *shard),
+                    1,
+                    fields,
+                    raw=raw,
+                )
+                pending.append((shard, future))
+
+            shard, future = pending.popleft()
+            try:
+                issues = future.result()
+            except Exception as e:
+                raise Exception(
+                    "Failed fetching shard %s to %s: %s" % (shard[0], shard[1], e)
+                )
+            unique = []
+            for issue in issues:
+                if issue.key in seen:
+                    duplicates += 1
+                else:
+                    seen.add(issue.key)
+                    unique.append(issue)
+            kept = on_page(unique)
+            if on_progress is not None:
+                on_progress(shard[0])
+            yield from kept
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+    logger.info(
+        "Total retrieved %d in shards with %d workers in %.2fs (%d duplicates dropped)",
+        len(seen),
+        max_workers,
+        time.time() - start,
+        duplicates,
+    )
+
+
+# Keys of every issue a query matches, without any of their fields
+def fetch_keys(jira, query, max_workers=1):
+    return set(
+        iter_all_issues(
+            jira,
+            query,
+            max_workers,
+            ["key"],
+            raw=True,
+            on_page=lambda issues: [issue.raw["key"] for issue in issues],
+        )
+    )
+
+
+# Fetch only the issues updated since the query was last synced, merge them into
+# the store and yield everything the query returns now, passed through compact
+# if given. Issues that left the query since (closed, moved, relabelled) only
+# show up as missing so a key-only search of the whole query prunes them. The
+# sync is only recorded once the stream is exhausted. Every stored page (or
+# date shard) is checkpointed so with resume a fetch that was interrupted
+# carries on where it stopped instead of starting over
+def iter_synced_issues(
+    jira,
+    store,
+    query,
+    max_workers=1,
+    fields=None,
+    full_resync=False,
+    raw=False,
+    compact=None,
+    shard_size=None,
+    resume=False,
+):
+    sync_time = datetime.now(timezone.utc).strftime(SYNC_TIME_FORMAT)
+    # Issues stored from a narrower field list can't answer this one so each
+    # field list is synced on its own
+    sync_key = query
+    if fields:
+        sync_key += "\nfields=" + ",".join(fields)
+    if full_resync:
+        store.clear(sync_key)
+
+    compact = compact or (lambda issue: issue)
+
+    last_sync = store.get_last_sync(sync_key)
+    if last_sync is None:
+        jql = query
+    else:
+        since = datetime.strptime(last_sync, SYNC_TIME_FORMAT) - SYNC_OVERLAP
+        jql = '(%s) AND updated >= "%s"' % (query, since.strftime(SYNC_TIME_FORMAT))
+
+    position = None
+    checkpoint = store.get_checkpoint(sync_key)
+    if checkpoint is not None and resume and checkpoint[0] == jql:
+        # Keep the interrupted fetch's sync time so the next sync looks back
+        # far enough to pick up anything that changed while it was stopped
+        _, sync_time, position = checkpoint
+        logger.info("Resuming the fetch after %s", position)
+    elif checkpoint is not None:
+        logger.info("Starting over an interrupted fetch, pass --resume to continue it")
+
+    def record(progress):
+        if isinstance(progress, datetime):
+            progress = progress.strftime(JQL_DATE_FORMAT)
+        store.set_checkpoint(sync_key, jql, sync_time, progress)
+
+    # Store each page as it arrives so only the compact issues are held on to
+    def save_page(issues):
+        store.save(sync_key, [issue.raw for issue in issues], fields)
+        return [compact(issue) for issue in issues]
+
+    # Only store what changed, everything is read back from the store below
+    def store_page(issues):
+        store.save(sync_key, [issue.raw for issue in issues], fields)
+        return []
+
+    if last_sync is None:
+        logger.info("No previous sync, fetching all issues")
+    else:
+        logger.info("Fetching issues updated since %s", since)
+    # A fresh fetch of everything yields issues as they arrive, otherwise the
+    # issues come from the store once the fetch is done
+    stream = last_sync is None and position is None
+    on_page = save_page if stream else store_page
+    # Pages are offsets into the search so a resumed pagination fetches its
+    # last page again in case issues that left the query shifted the rest
+    start_page = 0
+    before = None
+    if position is not None and position.isdigit():
+        start_page = int(position)
+    elif position is not None:
+        before = parse_jql_date(position)
+    # Only the first fetch is sharded, updates since the last sync are small
+    if shard_size and last_sync is None:
+        issues = iter_sharded_issues(
+            jira,
+            jql,
+            max_workers,
+            fields,
+            raw,
+            on_page,
+            shard_size,
+            before,
+            start_page,
+            record,
+        )
+    else:
+        issues = iter_all_issues(
+            jira,
+            jql,
+            max_workers,
+            fields,
+            raw=raw,
+            on_page=on_page,
+            start_page=start_page,
+            on_progress=record,
+        )
+    if stream:
+        yield from issues
+    else:
+        for _ in issues:
+            pass
+    # A fresh fetch already returned exactly what matches
+    if not stream:
+        removed = store.prune(sync_key, fetch_keys(jira, query, max_workers))
+        METRICS.incr("sync_issues_pruned", removed)
+        logger.info("%d stored issues no longer match the query", removed)
+    store.set_last_sync(sync_key, sync_time)
+    store.clear_checkpoint(sync_key)
+    if not stream:
+        for issue in load_issues(jira, store.load(sync_key), raw):
+            yield compact(issue)
+
+
+# Sync a query through the store and return all of its issues
+def sync_issues(
+    jira,
+    store,
+    query,
+    max_workers=1,
+    fields=None,
+    full_resync=False,
+    raw=False,
+    compact=None,
+    shard_size=None,
+    resume=False,
+):
+    return list(
+        iter_synced_issues(
+            jira,
+            store,
+            query,
+            max_workers,
+            fields,
+            full_resync,
+            raw,
+            compact,
+            shard_size,
+            resume,
+        )
+    )
@@ -0,0 +1,359 @@
+#! /usr/bin/env python
+
+import sys
+import json
+import time
+import getopt
+import logging
+import threading
+
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import jira_analysis
+import jira_epic_stories
+
+from analysis_pipeline import run_pipeline
+from issue_query import QueryCache
+from jira_helper import FIELD_CACHE_TTL, parse_jql_date
+from jira_store import IssueStore
+from label_rules import load_label_rules
+from periods import load_calendar
+from util import METRICS, configure_logging, get_conf_or_env, read_config_file
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("jira-service")
+
+DEFAULT_PORT = 8820
+# Seconds between background refreshes of the warm issues
+REFRESH_INTERVAL = 300
+# Days of issues kept warm when JIRA_SERVICE_START isn't set
+WINDOW_DAYS = 365
+ANALYSES = ["priorities", "sprint_lag", "story_points"]
+
+
+# A query cache holding a query's issues, fetched the way the script would
+def warm_cache(analysis, query):
+    cache = QueryCache()
+    cache.get(query, lambda q: list(analysis.fetch_issues(q)))
+    return cache
+
+
+# Keeps both scripts' JiraAnalysis instances, with their clients and field
+# indexes, and the issues from start_date on warm in memory. A background
+# thread refreshes the issues every refresh_interval seconds (incrementally
+# through the issue store when there is one) and swaps them in once they're
+# ready, so requests never wait on Jira. Answers are kept until the next
+# refresh
+class AnalysisService:
+    def __init__(
+        self, analysis, epic_analysis, start_date, refresh_interval, store_path=None
+    ):
+        self.analysis = analysis
+        self.epic_analysis = epic_analysis
+        self.start_date = start_date
+        self.refresh_interval = refresh_interval
+        self.store_path = store_path
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.version = 0
+        self.refreshed_at = None
+        self.answers = {}
+
+    def refresh(self):
+        with self.refresh_lock:
+            start = time.time()
+            # SQLite connections can't be shared across threads and refreshes
+            # run in the background, so each one opens its own
+            if self.store_path:
+                self.analysis.issue_store = IssueStore(self.store_path)
+                self.epic_analysis.issue_store = IssueStore(self.store_path)
+            with METRICS.span("service_refresh"):
+                analysis_cache = warm_cache(
+                    self.analysis, self.analysis.get_issue_query(self.start_date, None)
+                )
+                epic_cache = warm_cache(
+                    self.epic_analysis,
+                    self.epic_analysis.get_issue_query(self.start_date, None),
+                )
+            with self.lock:
+                self.analysis.query_cache = analysis_cache
+                self.epic_analysis.query_cache = epic_cache
+                self.version += 1
+                self.refreshed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.answers = {}
+            logger.info(
+                "Refreshed issues since %s in %.2fs",
+                self.start_date,
+                time.time() - start,
+            )
+
+    def refresh_forever(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refresh failed, serving the previous issues")
+
+    def start_refreshing(self):
+        thread = threading.Thread(target=self.refresh_forever, daemon=True)
+        thread.start()
+        return thread
+
+    # Compute an answer once per refresh. Answers are futures so requests for
+    # the same key wait on the one computing it while other keys and the
+    # refresh swap go ahead, the lock is only held to look up and add answers.
+    # get_range keeps requests inside the warm issues so computing never
+    # fetches. An answer computed across a refresh goes to the requests already
+    # waiting on it but isn't kept, since the refresh replaced the answers
+    def answer(self, key, compute):
+        with self.lock:
+            future = self.answers.get(key)
+            computing = future is None
+            if computing:
+                METRICS.incr("service_answer_misses")
+                future = self.answers[key] = Future()
+            else:
+                METRICS.incr("service_answer_hits")
+        if computing:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                # Let the next request try again rather than keep the error
+                with self.lock:
+                    if self.answers.get(key) is future:
+                        del self.answers[key]
+                future.set_exception(e)
+        return future.result()
+
+    def get_status(self):
+        return {
+            "version": self.version,
+            "refreshed_at": self.refreshed_at,
+            "start": self.start_date,
+            "answers": len(self.answers),
+        }
+
+    # The report lines of an analysis over the issues resolved in the range
+    def get_analysis(self, analysis, start_date, end_date):
+        def compute():
+            issues = self.analysis.get_issues(
+                self.analysis.get_issue_query(start_date, end_date)
+            )
+            (accumulator,) = run_pipeline(
+                issues, [self.analysis.get_accumulator(analysis)]
+            )
+            return accumulator.report()
+
+        return self.answer(("analysis", analysis, start_date, end_date), compute)
+
+    # Rollups per epic of the issues created in the range, optionally of one epic
+    def get_epic_rollups(self, start_date, end_date, epic=None):
+        def compute():
+            issues = self.epic_analysis.get_issues(
+                self.epic_analysis.get_issue_query(start_date, end_date, True, epic)
+            )
+            return self.epic_analysis.get_epic_rollups(issues)
+
+        return self.answer(("epics", start_date, end_date, epic), compute)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Dates default to the start of the window and no end. Ranges starting
+    # before the window would need a fetch so they're turned away
+    def get_range(self, params):
+        start_date = params.get("start", [self.service.start_date])[0]
+        end_date = params.get("end", [None])[0]
+        for date in (start_date, end_date):
+            if date is not None and parse_jql_date(date) is None:
+                raise ValueError("Can't read the date %s" % date)
+        if parse_jql_date(start_date) < parse_jql_date(self.service.start_date):
+            raise ValueError(
+                "Issues are kept from %s on, start the service with an earlier --start"
+                % self.service.start_date
+            )
+        return start_date, end_date
+
+    def do_GET(self):
+        start = time.time()
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        path = url.path.rstrip("/")
+        try:
+            if path == "/health":
+                return self.send(self.service.get_status())
+            if path.startswith("/analyses/"):
+                analysis = path[len("/analyses/") :]
+                if analysis not in ANALYSES:
+                    return self.send(
+                        {
+                            "error": "Unknown analysis, pick from %s"
+                            % ", ".join(ANALYSES)
+                        },
+                        404,
+                    )
+                start_date, end_date = self.get_range(params)
+                data = {
+                    "analysis": analysis,
+                    "lines": self.service.get_analysis(analysis, start_date, end_date),
+                }
+            elif path == "/epics":
+                start_date, end_date = self.get_range(params)
+                data = {
+                    "epics": self.service.get_epic_rollups(
+                        start_date, end_date, params.get("epic", [None])[0]
+                    )
+                }
+            else:
+                return self.send({"error": "Not found: %s" % path}, 404)
+        except ValueError as e:
+            return self.send({"error": str(e)}, 400)
+        except Exception as e:
+            logger.exception("Failed answering %s", self.path)
+            return self.send({"error": str(e)}, 500)
+
+        data.update(
+            start=start_date,
+            end=end_date,
+            version=self.service.version,
+            elapsed_ms=round((time.time() - start) * 1000, 2),
+        )
+        self.send(data)
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path != "/refresh":
+            return self.send({"error": "Not found: %s" % path}, 404)
+        threading.Thread(target=self.service.refresh, daemon=True).start()
+        self.send({"refreshing": True}, 202)
+
+
+# Build a server for the service, call serve_forever() on it to start serving
+def make_server(service, port=DEFAULT_PORT, host="127.0.0.1"):
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    config_data = read_config_file("config.env")
+    configure_logging(config_data)
+
+    port = int(get_conf_or_env("JIRA_SERVICE_PORT", config_data) or DEFAULT_PORT)
+    start_date = get_conf_or_env("JIRA_SERVICE_START", config_data) or None
+    refresh_interval = int(
+        get_conf_or_env("JIRA_SERVICE_REFRESH", config_data) or REFRESH_INTERVAL
+    )
+
+    usage = "jira_service.py [--port <port>] [--start <date>] [--refresh <seconds>]"
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h", ["port=", "start=", "refresh="])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(usage)
+            sys.exit()
+        elif opt == "--port":
+            port = int(arg)
+        elif opt == "--start":
+            start_date = arg
+        elif opt == "--refresh":
+            refresh_interval = int(arg)
+    if start_date is None:
+        start_date = (datetime.now() - timedelta(days=WINDOW_DAYS)).strftime("%Y-%m-%d")
+
+    JIRA_URL = get_conf_or_env("JIRA_URL", config_data)
+    JIRA_USERNAME = get_conf_or_env("JIRA_USERNAME", config_data)
+    JIRA_TOKEN = get_conf_or_env("JIRA_TOKEN", config_data)
+    JIRA_TEAM_LABELS = get_conf_or_env("JIRA_TEAM_LABELS", config_data)
+    JIRA_FETCH_WORKERS = int(get_conf_or_env("JIRA_FETCH_WORKERS", config_data) or 1)
+    JIRA_ISSUE_STORE = get_conf_or_env(
+        "JIRA_ISSUE_STORE", config_data, "jira_issues.db"
+    )
+    JIRA_FIELD_CACHE = (
+        get_conf_or_env("JIRA_FIELD_CACHE", config_data) or "jira_fields.json"
+    )
+    JIRA_FIELD_CACHE_TTL = int(
+        get_conf_or_env("JIRA_FIELD_CACHE_TTL", config_data) or FIELD_CACHE_TTL
+    )
+    JIRA_RAW_SEARCH = get_conf_or_env("JIRA_RAW_SEARCH", config_data) == "1"
+    JIRA_LABEL_RULES = get_conf_or_env("JIRA_LABEL_RULES", config_data)
+    JIRA_SHARD_SIZE = int(get_conf_or_env("JIRA_SHARD_SIZE", config_data) or 0)
+    JIRA_PERIODS_FILE = get_conf_or_env("JIRA_PERIODS_FILE", config_data)
+
+    required_variables = "JIRA_URL JIRA_USERNAME JIRA_TOKEN JIRA_TEAM_LABELS".split(" ")
+
+    for variable in required_variables:
+        if eval(variable) is None:
+            logger.error("Missing %s", variable)
+            sys.exit(1)
+
+    JIRA_TEAM_LABELS = JIRA_TEAM_LABELS.split(",")
+    label_rules = load_label_rules(JIRA_LABEL_RULES, JIRA_TEAM_LABELS)
+
+    service = AnalysisService(
+        jira_analysis.JiraAnalysis(
+            JIRA_URL,
+            JIRA_USERNAME,
+            JIRA_TOKEN,
+            JIRA_TEAM_LABELS,
+            JIRA_FETCH_WORKERS,
+            None,
+            False,
+            ANALYSES,
+            field_cache_file=JIRA_FIELD_CACHE,
+            field_cache_ttl=JIRA_FIELD_CACHE_TTL,
+            raw_search=JIRA_RAW_SEARCH,
+            label_rules=label_rules,
+            shard_size=JIRA_SHARD_SIZE,
+        ),
+        jira_epic_stories.JiraAnalysis(
+            JIRA_URL,
+            JIRA_USERNAME,
+            JIRA_TOKEN,
+            JIRA_TEAM_LABELS,
+            JIRA_FETCH_WORKERS,
+            None,
+            False,
+            field_cache_file=JIRA_FIELD_CACHE,
+            field_cache_ttl=JIRA_FIELD_CACHE_TTL,
+            raw_search=JIRA_RAW_SEARCH,
+            calendar=load_calendar(JIRA_PERIODS_FILE),
+            label_rules=label_rules,
+            shard_size=JIRA_SHARD_SIZE,
+        ),
+        start_date,
+        refresh_interval,
+        JIRA_ISSUE_STORE,
+    )
+    service.refresh()
+    service.start_refreshing()
+
+    server = make_server(service, port)
+    logger.info("Serving analyses on http://127.0.0.1:%d", port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        METRICS.write("jira_service", config_data)
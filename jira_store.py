@@ -0,0 +1,464 @@
+#! /usr/bin/env python
+
+import json
+import logging
+import sqlite3
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("jira-store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    key TEXT PRIMARY KEY,
+    updated TEXT,
+    raw TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_issues (
+    query TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (query, key)
+);
+CREATE TABLE IF NOT EXISTS syncs (
+    query TEXT PRIMARY KEY,
+    last_sync TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fetch_checkpoints (
+    query TEXT PRIMARY KEY,
+    jql TEXT NOT NULL,
+    sync_time TEXT NOT NULL,
+    position TEXT NOT NULL
+);
+"""
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS epic_contributions (
+    query TEXT NOT NULL,
+    key TEXT NOT NULL,
+    updated TEXT,
+    epic TEXT,
+    story_points REAL NOT NULL,
+    done INTEGER NOT NULL,
+    period TEXT,
+    PRIMARY KEY (query, key)
+);
+CREATE TABLE IF NOT EXISTS epic_rollups (
+    query TEXT NOT NULL,
+    epic TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    total_sp REAL NOT NULL DEFAULT 0,
+    done_sp REAL NOT NULL DEFAULT 0,
+    non_pointed_tickets INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (query, epic)
+);
+CREATE TABLE IF NOT EXISTS epic_pending (
+    query TEXT NOT NULL,
+    epic TEXT NOT NULL,
+    PRIMARY KEY (query, epic)
+);
+CREATE TABLE IF NOT EXISTS epic_period_rollups (
+    query TEXT NOT NULL,
+    epic TEXT NOT NULL,
+    period TEXT NOT NULL,
+    done_sp REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (query, epic, period)
+);
+CREATE TABLE IF NOT EXISTS epic_writes (
+    query TEXT NOT NULL,
+    epic TEXT NOT NULL,
+    target TEXT NOT NULL,
+    changes TEXT NOT NULL,
+    written INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (query, epic)
+);
+"""
+
+CHANGELOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changelogs (
+    key TEXT PRIMARY KEY,
+    updated TEXT,
+    transitions TEXT NOT NULL
+);
+"""
+
+
+# Keeps the raw JSON of every issue we've fetched along with which queries
+# returned it so later runs only need to ask Jira for what changed
+class IssueStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    # When the query was last synced, None if never
+    def get_last_sync(self, query):
+        row = self.conn.execute(
+            "SELECT last_sync FROM syncs WHERE query = ?", (query,)
+        ).fetchone()
+        return row[0] if row else None
+
+    # Record when a query was last synced
+    def set_last_sync(self, query, sync_time):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO syncs (query, last_sync) VALUES (?, ?)",
+                (query, sync_time),
+            )
+
+    # Upsert the raw issues returned by a query fetched with the given fields
+    # (None for all of them)
+    def save(self, query, raw_issues, fields=None):
+        raw_issues = self.merge_fields(raw_issues, fields)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO issues (key, updated, raw) VALUES (?, ?, ?)",
+                [
+                    (raw["key"], raw.get("fields", {}).get("updated"), json.dumps(raw))
+                    for raw in raw_issues
+                ],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO query_issues (query, key) VALUES (?, ?)",
+                [(query, raw["key"]) for raw in raw_issues],
+            )
+        logger.debug("Stored %d issues", len(raw_issues))
+
+    # Searches only return the fields that were asked for so keep any fields
+    # we already have for an issue that this fetch didn't ask for. A field it
+    # asked for is never carried over, even when Jira left it out, so stored
+    # values from an older fetch can't come back over newer ones
+    def merge_fields(self, raw_issues, fields=None):
+        if fields is None:
+            return raw_issues
+        requested = set(fields)
+        by_key = {raw["key"]: raw for raw in raw_issues}
+        keys = list(by_key)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self.conn.execute(
+                "SELECT key, raw FROM issues WHERE key IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            )
+            for key, stored in rows:
+                merged = {
+                    field: value
+                    for field, value in json.loads(stored).get("fields", {}).items()
+                    if field not in requested
+                }
+                merged.update(by_key[key].get("fields", {}))
+                by_key[key]["fields"] = merged
+        return raw_issues
+
+    # Drop the issues a query no longer returns, keys is everything it returns
+    # now. Returns how many were dropped
+    def prune(self, query, keys):
+        keys = set(keys)
+        stored = [
+            key
+            for (key,) in self.conn.execute(
+                "SELECT key FROM query_issues WHERE query = ?", (query,)
+            )
+        ]
+        removed = [key for key in stored if key not in keys]
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM query_issues WHERE query = ? AND key = ?",
+                [(query, key) for key in removed],
+            )
+        return len(removed)
+
+    # Raw issues previously returned by a query, newest key first
+    def load(self, query):
+        rows = self.conn.execute(
+            """SELECT i.raw FROM query_issues q JOIN issues i ON i.key = q.key
+            WHERE q.query = ?
+            ORDER BY CAST(substr(i.key, instr(i.key, '-') + 1) AS INTEGER) DESC""",
+            (query,),
+        )
+        for (raw,) in rows:
+            yield json.loads(raw)
+
+    # How far an interrupted fetch of a query got as (jql, sync_time, position),
+    # None if the last fetch finished. The position is the last page stored or
+    # the start of the last date shard stored
+    def get_checkpoint(self, query):
+        return self.conn.execute(
+            "SELECT jql, sync_time, position FROM fetch_checkpoints WHERE query = ?",
+            (query,),
+        ).fetchone()
+
+    def set_checkpoint(self, query, jql, sync_time, position):
+        with self.conn:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO fetch_checkpoints
+                (query, jql, sync_time, position) VALUES (?, ?, ?, ?)""",
+                (query, jql, sync_time, str(position)),
+            )
+
+    def clear_checkpoint(self, query):
+        with self.conn:
+            self.conn.execute("DELETE FROM fetch_checkpoints WHERE query = ?", (query,))
+
+    # Forget what a query returned so the next sync fetches it from scratch
+    def clear(self, query):
+        with self.conn:
+            self.conn.execute("DELETE FROM query_issues WHERE query = ?", (query,))
+            self.conn.execute("DELETE FROM syncs WHERE query = ?", (query,))
+            self.conn.execute("DELETE FROM fetch_checkpoints WHERE query = ?", (query,))
+
+
+# Per-epic rollups kept up to date from the issues that changed. Each issue's
+# contribution (epic, story points, done, period) is remembered so when it
+# changes, moves epic or drops out of the query its old contribution can be
+# taken back out before the new one is added
+class EpicRollupStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(ROLLUP_SCHEMA)
+
+    # When each issue counted in the rollups was last updated, keyed by issue
+    def get_updated(self, query):
+        rows = self.conn.execute(
+            "SELECT key, updated FROM epic_contributions WHERE query = ?", (query,)
+        )
+        return dict(rows)
+
+    # Swap in the new contributions of changed issues and take out the ones for
+    # removed issues. A contribution is (key, updated, epic, story_points, done,
+    # period), epic and period can be None. The epics that changed are marked
+    # pending until written and returned
+    def apply(self, query, contributions, removed_keys):
+        touched = set()
+        with self.conn:
+            keys = [c[0] for c in contributions] + list(removed_keys)
+            for key in keys:
+                old = self.conn.execute(
+                    """SELECT epic, story_points, done, period FROM epic_contributions
+                    WHERE query = ? AND key = ?""",
+                    (query, key),
+                ).fetchone()
+                if old:
+                    self.adjust(query, -1, *old)
+                    touched.add(old[0])
+                    self.conn.execute(
+                        "DELETE FROM epic_contributions WHERE query = ? AND key = ?",
+                        (query, key),
+                    )
+            for contribution in contributions:
+                key, updated, epic, story_points, done, period = contribution
+                self.adjust(query, 1, epic, story_points, done, period)
+                touched.add(epic)
+                self.conn.execute(
+                    """INSERT INTO epic_contributions
+                    (query, key, updated, epic, story_points, done, period)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (query,) + tuple(contribution),
+                )
+            touched.discard(None)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO epic_pending (query, epic) VALUES (?, ?)",
+                [(query, epic) for epic in touched],
+            )
+        logger.debug(
+            "Applied %d changed and %d removed issues to %d epics",
+            len(contributions),
+            len(removed_keys),
+            len(touched),
+        )
+        return touched
+
+    # Add (sign=1) or subtract (sign=-1) one issue's contribution
+    def adjust(self, query, sign, epic, story_points, done, period):
+        if epic is None:
+            return
+        self.conn.execute(
+            "INSERT OR IGNORE INTO epic_rollups (query, epic) VALUES (?, ?)",
+            (query, epic),
+        )
+        self.conn.execute(
+            """UPDATE epic_rollups SET count = count + ?, total_sp = total_sp + ?,
+            done_sp = done_sp + ?, non_pointed_tickets = non_pointed_tickets + ?
+            WHERE query = ? AND epic = ?""",
+            (
+                sign,
+                sign * story_points,
+                sign * story_points * done,
+                sign * (story_points == 0),
+                query,
+                epic,
+            ),
+        )
+        if period is not None:
+            self.conn.execute(
+                """INSERT OR IGNORE INTO epic_period_rollups (query, epic, period)
+                VALUES (?, ?, ?)""",
+                (query, epic, period),
+            )
+            self.conn.execute(
+                """UPDATE epic_period_rollups SET done_sp = done_sp + ?
+                WHERE query = ? AND epic = ? AND period = ?""",
+                (sign * story_points, query, epic, period),
+            )
+
+    # Epics whose rollups changed but haven't been written to Jira yet
+    def get_pending(self, query):
+        rows = self.conn.execute(
+            "SELECT epic FROM epic_pending WHERE query = ?", (query,)
+        )
+        return {epic for (epic,) in rows}
+
+    # Record that the rollups of these epics made it to Jira
+    def clear_pending(self, query, epics):
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM epic_pending WHERE query = ? AND epic = ?",
+                [(query, epic) for epic in epics],
+            )
+
+    # Rollups for the given epics in the same shape get_epic_rollups returns.
+    # Sums are rounded so adding and subtracting floats doesn't leave noise
+    def load(self, query, epics, periods):
+        epic_map = {}
+        epics = sorted(epics)
+        for i in range(0, len(epics), 500):
+            chunk = epics[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                """SELECT epic, count, total_sp, done_sp, non_pointed_tickets
+                FROM epic_rollups WHERE query = ? AND epic IN (%s)""" % placeholders,
+                [query] + chunk,
+            )
+            for epic, count, total_sp, done_sp, non_pointed in rows:
+                epic_map[epic] = {
+                    "count": count,
+                    "total_sp": round(total_sp, 6),
+                    "done_sp": round(done_sp, 6),
+                    "non_pointed_tickets": non_pointed,
+                    "periods": {period: 0.0 for period in periods},
+                }
+            rows = self.conn.execute(
+                """SELECT epic, period, done_sp FROM epic_period_rollups
+                WHERE query = ? AND epic IN (%s)""" % placeholders,
+                [query] + chunk,
+            )
+            for epic, period, done_sp in rows:
+                if period in epic_map[epic]["periods"]:
+                    epic_map[epic]["periods"][period] = round(done_sp, 6)
+        return epic_map
+
+    # Record the epic writes planned for a run: the fields each epic should end
+    # up with (targets) and the ones that differ from Jira (changes). Epics
+    # without changes count as written. Plans for other epics are kept so a
+    # resumed run can add to the plan it's resuming
+    def save_write_plan(self, query, targets, changes):
+        with self.conn:
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO epic_writes
+                (query, epic, target, changes, written) VALUES (?, ?, ?, ?, ?)""",
+                [
+                    (
+                        query,
+                        epic,
+                        json.dumps(target, sort_keys=True),
+                        json.dumps(changes.get(epic, {}), sort_keys=True),
+                        int(epic not in changes),
+                    )
+                    for epic, target in targets.items()
+                ],
+            )
+
+    # The planned writes still matching the targets as (written epics, {epic:
+    # changes} not written yet). Epics whose target moved since are left out
+    # and need planning again
+    def get_write_plan(self, query, targets):
+        written = set()
+        unwritten = {}
+        rows = self.conn.execute(
+            "SELECT epic, target, changes, written FROM epic_writes WHERE query = ?",
+            (query,),
+        )
+        for epic, target, changes, done in rows:
+            if epic not in targets or json.loads(target) != targets[epic]:
+                continue
+            if done:
+                written.add(epic)
+            else:
+                unwritten[epic] = json.loads(changes)
+        return written, unwritten
+
+    # Record that writes made it to Jira as soon as they do
+    def mark_written(self, query, epics):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE epic_writes SET written = 1 WHERE query = ? AND epic = ?",
+                [(query, epic) for epic in epics],
+            )
+
+    def clear_write_plan(self, query):
+        with self.conn:
+            self.conn.execute("DELETE FROM epic_writes WHERE query = ?", (query,))
+
+    # Forget the rollups for a query so the next run rebuilds them
+    def clear(self, query):
+        with self.conn:
+            for table in (
+                "epic_contributions",
+                "epic_rollups",
+                "epic_pending",
+                "epic_period_rollups",
+                "epic_writes",
+            ):
+                self.conn.execute("DELETE FROM %s WHERE query = ?" % table, (query,))
+
+
+# The status transitions of each issue as of when it was last updated, so an
+# issue's changelog is only fetched again once the issue changes
+class ChangelogStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(CHANGELOG_SCHEMA)
+
+    # When the stored changelog of each of the issues was current, keyed by issue
+    def get_updated(self, keys):
+        updated = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self.conn.execute(
+                "SELECT key, updated FROM changelogs WHERE key IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            )
+            updated.update(rows)
+        return updated
+
+    # Store transitions as {key: (updated, transitions)}
+    def save(self, changelogs):
+        with self.conn:
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO changelogs (key, updated, transitions)
+                VALUES (?, ?, ?)""",
+                [
+                    (key, updated, json.dumps(transitions))
+                    for key, (updated, transitions) in changelogs.items()
+                ],
+            )
+        logger.debug("Stored %d changelogs", len(changelogs))
+
+    # Transitions of the issues, keyed by issue
+    def load(self, keys):
+        transitions = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self.conn.execute(
+                "SELECT key, transitions FROM changelogs WHERE key IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            )
+            for key, stored in rows:
+                transitions[key] = json.loads(stored)
+        return transitions
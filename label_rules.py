@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+
+import os
+import re
+import json
+import logging
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("label-rules")
+
+# Priorities come from labels like 2018:q1:2, anything else is the Misc priority
+DEFAULT_PRIORITY_RULES = {
+    "default": 100,
+    "rules": [
+        {"prefix": "2018:q1:", "cast": "int", "fallback": 100},
+        {"prefix": "2018:q2:", "cast": "int", "fallback": 100},
+        {"label": "2018:q2", "value": 100},
+    ],
+}
+
+# The planning period a label like 2018:q1:2 belongs to
+DEFAULT_PERIOD_RULES = {
+    "default": None,
+    "rules": [{"regex": r"^(\d{4}):(q[1-4])\b", "value": r"\1-\2"}],
+}
+
+
+# Rules used when there's no rules file: a team per configured team label plus
+# the priority and period labels we've always used
+def get_default_rules(team_labels):
+    return {
+        "team": {
+            "default": None,
+            "rules": [{"label": team_label} for team_label in team_labels],
+        },
+        "priority": DEFAULT_PRIORITY_RULES,
+        "period": DEFAULT_PERIOD_RULES,
+    }
+
+
+# Load label rules from a JSON file, falling back to the defaults
+def load_label_rules(filepath=None, team_labels=()):
+    if not filepath:
+        return get_default_rules(team_labels)
+    if not os.path.exists(filepath):
+        raise Exception("Unable to find label rules file at %s" % filepath)
+
+    logger.info("Found label rules file at %s", filepath)
+    with open(filepath, "r") as f:
+        return json.load(f)
+
+
+# Classifies issues by their labels. Each category (team, priority, period) has
+# an ordered list of rules, each matching a label exactly, by prefix or by regex,
+# ignoring case. The first of an issue's labels that matches a rule decides the
+# category and the earliest rule wins if a label matches several.
+#
+# The rules are compiled once into a hash of exact labels and a hash per prefix
+# length, and what each distinct label matched is remembered, so classifying an
+# issue is a dictionary lookup per label
+class LabelClassifier:
+    def __init__(self, rules):
+        self.categories = list(rules)
+        self.defaults = {
+            category: rules[category].get("default") for category in self.categories
+        }
+        self.exact = {}
+        self.prefixes = {}
+        self.regexes = []
+        for category in self.categories:
+            for order, rule in enumerate(rules[category]["rules"]):
+                self.compile_rule(category, order, rule)
+        self.prefix_lengths = sorted(self.prefixes)
+        self.label_cache = {}
+
+    def compile_rule(self, category, order, rule):
+        entry = (category, order, rule)
+        if "label" in rule:
+            matches = self.exact.setdefault(rule["label"].lower(), [])
+            matches.append(entry)
+        elif "prefix" in rule:
+            prefix = rule["prefix"].lower()
+            matches = self.prefixes.setdefault(len(prefix), {}).setdefault(prefix, [])
+            matches.append(entry)
+        elif "regex" in rule:
+            self.regexes.append((re.compile(rule["regex"]), entry))
+        else:
+            raise Exception("Label rule needs a label, prefix or regex: %s" % rule)
+
+    # The value a rule gives a label it matched
+    def get_value(self, rule, label, rest=None, match=None):
+        if "value" in rule:
+            value = match.expand(rule["value"]) if match else rule["value"]
+        elif "label" in rule:
+            value = rule["label"]
+        elif match:
+            value = match.group(1) if match.groups() else match.group(0)
+        else:
+            value = rest
+
+        if rule.get("cast") == "int":
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return rule.get("fallback")
+        return value
+
+    # What a single label classifies as, a tuple of (category, value) with the
+    # earliest matching rule for each category
+    def match_label(self, label):
+        lowered = label.lower()
+        candidates = []
+        for category, order, rule in self.exact.get(lowered, ()):
+            candidates.append((category, order, self.get_value(rule, label)))
+        for length in self.prefix_lengths:
+            if length > len(lowered):
+                break
+            for category, order, rule in self.prefixes[length].get(
+                lowered[:length], ()
+            ):
+                value = self.get_value(rule, label, rest=label[length:])
+                candidates.append((category, order, value))
+        for regex, (category, order, rule) in self.regexes:
+            match = regex.search(lowered)
+            if match:
+                candidates.append(
+                    (category, order, self.get_value(rule, label, match=match))
+                )
+
+        best = {}
+        for category, order, value in candidates:
+            if category not in best or order < best[category][0]:
+                best[category] = (order, value)
+        return tuple((category, value) for category, (_, value) in best.items())
+
+    # Classify an issue's labels into a value for every category
+    def classify(self, labels):
+        result = dict(self.defaults)
+        found = set()
+        for label in labels or ():
+            matches = self.label_cache.get(label)
+            if matches is None:
+                matches = self.label_cache[label] = self.match_label(label)
+            for category, value in matches:
+                if category not in found:
+                    found.add(category)
+                    result[category] = value
+        return result
@@ -0,0 +1,127 @@
+#! /usr/bin/env python
+
+import os
+import re
+import json
+import logging
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("periods")
+
+# Each period is >= start and < end (inclusive of start, exclusive of end). The
+# field is the epic field that the story points done in the period roll up to
+DEFAULT_CALENDAR = [
+    {
+        "name": "2022-Q1",
+        "start": "2022-01-10",
+        "end": "2022-04-04",
+        "field": "Story Points (Done 2022Q1)",
+    },
+    {
+        "name": "2022-Q2",
+        "start": "2022-04-04",
+        "end": "2022-07-11",
+        "field": "Story Points (Done 2022Q2)",
+    },
+    {
+        "name": "2022-Q3",
+        "start": "2022-07-11",
+        "end": "2022-10-01",
+        "field": "Story Points (Done 2022Q3)",
+    },
+    {
+        "name": "2022-Q4",
+        "start": "2022-10-01",
+        "end": "2023-01-01",
+        "field": "Story Points (Done 2022Q4)",
+    },
+]
+
+
+# Load a fiscal calendar from a JSON list of periods, falling back to the default
+def load_calendar(filepath=None):
+    if not filepath:
+        return DEFAULT_CALENDAR
+    if not os.path.exists(filepath):
+        raise Exception("Unable to find periods file at %s" % filepath)
+
+    logger.info("Found periods file at %s", filepath)
+    with open(filepath, "r") as f:
+        calendar = sorted(json.load(f), key=lambda period: period["start"])
+    for prev, period in zip(calendar, calendar[1:]):
+        if period["start"] < prev["end"]:
+            raise Exception(
+                "Periods %s and %s overlap" % (prev["name"], period["name"])
+            )
+    return calendar
+
+
+# Parse Jira timestamps like 2022-08-20T10:00:00.000-0500 into UTC datetime64s
+# in one go, missing dates become NaT
+def parse_jira_dates(values):
+    stamps = np.array(
+        [value[:23] if value else "NaT" for value in values], dtype="datetime64[ms]"
+    )
+    # "-0500" parses as -500, split that back into hours and minutes
+    offsets = np.array([value[23:] if value else "0" for value in values], dtype="U5")
+    offsets = offsets.astype(np.int64)
+    minutes = np.sign(offsets) * (np.abs(offsets) // 100 * 60 + np.abs(offsets) % 100)
+    return stamps - minutes.astype("timedelta64[m]")
+
+
+# Index of the calendar period each date falls in, -1 if it's in none of them
+def bucket_dates(dates, calendar):
+    starts = np.array([period["start"] for period in calendar], dtype="datetime64[ms]")
+    ends = np.array([period["end"] for period in calendar], dtype="datetime64[ms]")
+    if not len(dates):
+        return np.zeros(0, dtype=np.int64)
+
+    idx = np.searchsorted(starts, dates, side="right") - 1
+    found = (idx >= 0) & ~np.isnat(dates)
+    found[found] &= dates[found] < ends[idx[found]]
+    return np.where(found, idx, -1)
+
+
+# Sum values per (group, period) in one grouped aggregation, dates outside every
+# period are skipped. Returns a groups x periods array
+def sum_by_period(groups, num_groups, periods, num_periods, values):
+    sums = np.zeros((num_groups, num_periods))
+    found = periods >= 0
+    np.add.at(sums, (groups[found], periods[found]), values[found])
+    return sums
+
+
+# Rolling windows as periods from a spec like 6x14 (six back to back 14 day
+# windows) or 12x90/30 (twelve 90 day windows starting 30 days apart), the last
+# window ending at end_date (exclusive)
+def get_rolling_periods(spec, end_date):
+    match = re.match(r"^(\d+)x(\d+)(?:/(\d+))?$", spec)
+    if not match:
+        raise Exception("Can't parse rolling window spec %s" % spec)
+    count, length = int(match.group(1)), int(match.group(2))
+    step = int(match.group(3) or length)
+    if not count or not length or not step:
+        raise Exception("Rolling windows need a positive count, length and step")
+
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    periods = []
+    for i in range(count - 1, -1, -1):
+        period_end = end - timedelta(days=step * i)
+        period_start = period_end - timedelta(days=length)
+        periods.append(
+            {
+                "name": "%s to %s"
+                % (
+                    period_start.strftime("%Y-%m-%d"),
+                    (period_end - timedelta(days=1)).strftime("%Y-%m-%d"),
+                ),
+                "start": period_start.strftime("%Y-%m-%d"),
+                "end": period_end.strftime("%Y-%m-%d"),
+            }
+        )
+    return periods
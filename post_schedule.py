@@ -9,7 +9,7 @@ from datetime import datetime
 from slack_helper import SlackHelper
 from sheet_helper import GSheetHelper
 
-from util import get_conf_or_env, read_config_file
+from util import METRICS, configure_logging, get_conf_or_env, read_config_file
 
 FORMAT = "%(asctime)-15s %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.DEBUG)
@@ -39,6 +39,7 @@ if __name__ == "__main__":
         testing_slack_channel = sys.argv[1]
 
     config_data = read_config_file("config.env")
+    configure_logging(config_data)
 
     CREDENTIALS = get_conf_or_env("CREDENTIALS", config_data)
     CREDENTIALS_FILE = get_conf_or_env(
@@ -74,7 +75,7 @@ if __name__ == "__main__":
 
     meta_rows = get_meta_rows(WORKBOOK, WORKSHEET_META_TAB)
 
-    print(meta_rows)
+    logger.debug("Meta rows %s", meta_rows)
 
     for row in meta_rows:
         (
@@ -187,3 +188,5 @@ if __name__ == "__main__":
                 )
         else:
             print("No message for ", tab, message)
+
+    METRICS.write("post_schedule", config_data)
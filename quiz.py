@@ -6,7 +6,7 @@ import random
 from slack_helper import SlackHelper
 from sheet_helper import GSheetHelper
 
-from util import get_conf_or_env, read_config_file
+from util import METRICS, configure_logging, get_conf_or_env, read_config_file
 
 FORMAT = "%(asctime)-15s %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.INFO)
@@ -14,6 +14,7 @@ logger = logging.getLogger("quiz")
 
 if __name__ == "__main__":
     config_data = read_config_file("config.env")
+    configure_logging(config_data)
 
     CREDENTIALS_FILE = get_conf_or_env(
         "CREDENTIALS_FILE", config_data, "credentials.json"
@@ -46,3 +47,5 @@ if __name__ == "__main__":
     # sh.execute_command(
     #     msg, "TEST TEST", "#tmp-slack-api", "http://dan.triplelift.net/q.png"
     # )
+
+    METRICS.write("quiz", config_data)
@@ -3,6 +3,8 @@
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 
+from util import METRICS, instrument_session
+
 
 class GSheetHelper:
     def __init__(self, credentials_file, credentials):
@@ -20,10 +22,12 @@ class GSheetHelper:
                 credentials_file, scope
             )
         self.gc = gspread.authorize(credentials_to_use)
+        instrument_session(self.gc.session, "sheets")
 
     def get_rows(self, workbook, worksheet):
-        wkbook = self.gc.open(workbook)
-        wks = wkbook.worksheet(worksheet)
-        rows = wks.get_all_values()
+        with METRICS.span("sheets_read"):
+            wkbook = self.gc.open(workbook)
+            wks = wkbook.worksheet(worksheet)
+            rows = wks.get_all_values()
         header = rows[0]
         return [dict(zip(header, row)) for row in rows[1:]]
@@ -3,12 +3,22 @@
 from slack import WebClient
 import logging
 
+from util import METRICS
+
 logging.basicConfig(level=logging.INFO)
 
 
+# Counts every Slack API call for the run's metrics, the named methods like
+# chat_postMessage all go through api_call
+class CountingWebClient(WebClient):
+    def api_call(self, api_method, *args, **kwargs):
+        METRICS.incr("slack_api_calls")
+        return super().api_call(api_method, *args, **kwargs)
+
+
 class SlackHelper:
     def __init__(self, token):
-        self.sc = WebClient(token)
+        self.sc = CountingWebClient(token)
         self.user_map = self.get_users_as_map()
         self.user_id_map = self.get_user_ids_as_map()
 
@@ -39,15 +49,16 @@ class SlackHelper:
         ]
 
     def send_message(self, msg, username, channel, icon_url, as_user=False):
-        return self.sc.chat_postMessage(
-            username=username,
-            as_user=as_user,
-            channel=channel,
-            icon_url=icon_url,
-            text=msg,
-            link_names=1,
-            parse="full",
-        )
+        with METRICS.span("slack_post"):
+            return self.sc.chat_postMessage(
+                username=username,
+                as_user=as_user,
+                channel=channel,
+                icon_url=icon_url,
+                text=msg,
+                link_names=1,
+                parse="full",
+            )
 
     def get_messages(self, channel):
         channel_id = self.get_channel_id(channel)
@@ -0,0 +1,118 @@
+#! /usr/bin/env python
+
+import re
+import json
+import itertools
+import threading
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import fake_jira
+
+# Stand-ins for a Jira client shared by the tests
+
+QUERY = 'project = "TL" AND status != closed'
+FIELD_KEYS = {
+    "story_points": "customfield_1",
+    "epic_link": "customfield_2",
+    "investment_area": "customfield_3",
+    "sprint": "customfield_4",
+}
+# Every edit gets a later updated time, like Jira does
+EDITS = itertools.count()
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.content = json.dumps(data).encode("utf-8")
+
+
+# Just enough of a Jira client for raw searches of QUERY, optionally narrowed to
+# issues updated since a date. Issues are {key: fields} and only the fields a
+# search asks for are returned
+class StubJira:
+    def __init__(self, issues):
+        self.issues = issues
+        self._session = self
+
+    def _get_url(self, path):
+        return path
+
+    def get(self, url, params):
+        jql = params["jql"]
+        since = re.search(r'updated >= "([^"]+)"', jql)
+        requested = params.get("fields")
+        matching = [
+            {
+                "key": key,
+                "fields": {
+                    field: value
+                    for field, value in fields.items()
+                    if requested is None or field in requested.split(",")
+                },
+            }
+            for key, fields in sorted(self.issues.items(), reverse=True)
+            if fields["project"] == "TL"
+            and fields["status"] != "Closed"
+            and (
+                since is None
+                or fields["updated"][:16].replace("T", " ") >= since.group(1)
+            )
+        ]
+        start = params["startAt"]
+        return StubResponse(
+            {
+                "startAt": start,
+                "maxResults": params["maxResults"],
+                "total": len(matching),
+                "issues": matching[start : start + params["maxResults"]],
+            }
+        )
+
+
+def make_issue(status, project="TL", epic=None, story_points=None):
+    return {
+        "project": project,
+        "status": status,
+        "updated": (datetime.now() + timedelta(seconds=next(EDITS))).strftime(
+            "%Y-%m-%dT%H:%M:%S.000+0000"
+        ),
+        "resolutiondate": None,
+        FIELD_KEYS["epic_link"]: epic,
+        FIELD_KEYS["story_points"]: story_points,
+    }
+
+
+# A Jira client searching a fake_jira dataset without going through HTTP
+class FakeJiraClient:
+    def __init__(self, fake):
+        self.fake = fake
+        self._session = self
+
+    def _get_url(self, path):
+        return path
+
+    def get(self, url, params):
+        return StubResponse(
+            self.fake.search(
+                params["jql"],
+                params["startAt"],
+                params["maxResults"],
+                set(params["fields"].split(",")),
+                "http://fake",
+            )
+        )
+
+
+# Serve a fake_jira FakeJira on a free port while the block runs, yields its URL
+@contextmanager
+def serve_fake_jira(fake):
+    server = fake_jira.make_server(fake, 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:%d" % server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
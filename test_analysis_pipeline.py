@@ -0,0 +1,91 @@
+import csv
+
+from math import ceil
+
+import fake_jira
+import jira_analysis
+
+from analysis_pipeline import ACCUMULATORS, run_pipeline
+from jira_helper import IssueRecord
+from stub_jira import serve_fake_jira
+
+
+def make_records():
+    return [
+        IssueRecord(
+            "TL-1",
+            summary="Login",
+            team="Backend",
+            priority=1,
+            story_points=3.0,
+            assignee="Ann",
+            issue_type="story",
+            sprints=("Sprint 1", "Sprint 2"),
+        ),
+        IssueRecord(
+            "TL-2",
+            summary="Export",
+            team="Backend",
+            priority=None,
+            story_points=1.0,
+            assignee="Ann",
+            issue_type="bug",
+            sprints=("Sprint 2",),
+        ),
+        IssueRecord(
+            "TL-3",
+            summary="Search",
+            team="Frontend",
+            priority=1,
+            story_points=0.0,
+            assignee="Bo",
+            issue_type="story",
+            sprints=("Sprint 1",),
+        ),
+    ]
+
+
+def test_one_pass_feeds_every_accumulator():
+    names = ["priorities", "sprint_lag", "story_points"]
+    read = []
+
+    def stream():
+        for record in make_records():
+            read.append(record.key)
+            yield record
+
+    fused = run_pipeline(stream(), [ACCUMULATORS[name]() for name in names])
+
+    assert read == ["TL-1", "TL-2", "TL-3"]
+    for name, accumulator in zip(names, fused):
+        (alone,) = run_pipeline(make_records(), [ACCUMULATORS[name]()])
+        assert accumulator.report() == alone.report()
+    priorities, sprint_lag, story_points = fused
+    assert priorities.priority_count == {1: 2}
+    assert [str(issue) for issue in priorities.no_priority_stories] == ["TL-2"]
+    assert sprint_lag.report()[1:] == ["Backend\t2.0\t2.0\t1", "Frontend\tNA\tNA\t0"]
+    assert story_points.user_story_point_sum == {"Ann": 4, "Bo": 0}
+
+
+def test_analyses_share_one_fetch(tmp_path):
+    fake = fake_jira.FakeJira(fake_jira.Dataset(300, 5))
+    fn = str(tmp_path / "issues.csv")
+    with serve_fake_jira(fake) as url:
+        analysis = jira_analysis.JiraAnalysis(url, "user", "token", ["Backend"])
+        fake.reset_stats()
+        accumulators = analysis.run_analyses(
+            "2022-01-01",
+            "2022-12-31",
+            ["priorities", "story_points", "write_issues"],
+            fn,
+        )
+
+    with open(fn, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    issues = sum(accumulators[0].priority_count.values()) + len(
+        accumulators[0].no_priority_stories
+    )
+    assert issues > 100
+    assert fake.stats["searches"] == ceil(issues / 100)
+    assert rows[0] == jira_analysis.CSV_HEADER
+    assert len(rows) == issues + 1
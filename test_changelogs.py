@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import changelogs
+
+from changelogs import (
+    get_cycle_times,
+    get_status_transitions,
+    get_team_cycle_stats,
+    group_percentiles,
+    sync_changelogs,
+)
+from jira_store import ChangelogStore
+
+
+def make_issue(
+    key,
+    created="2022-03-01T09:00:00.000+0000",
+    resolutiondate=None,
+    updated="2022-03-10T09:00:00.000+0000",
+):
+    return SimpleNamespace(
+        key=key, created=created, resolutiondate=resolutiondate, updated=updated
+    )
+
+
+def test_status_transitions_skip_other_fields():
+    histories = [
+        {
+            "created": "2022-03-02T09:00:00.000+0000",
+            "items": [
+                {"field": "assignee", "fromString": None, "toString": "ann"},
+                {"field": "status", "fromString": "To Do", "toString": "In Progress"},
+            ],
+        },
+        {"created": "2022-03-03T09:00:00.000+0000"},
+    ]
+    assert get_status_transitions(histories) == [
+        ["2022-03-02T09:00:00.000+0000", "To Do", "In Progress"]
+    ]
+
+
+def test_cycle_runs_from_first_start_to_last_done():
+    issues = [
+        make_issue("TL-1"),
+        make_issue("TL-2", resolutiondate="2022-03-06T09:00:00.000+0000"),
+        make_issue("TL-3"),
+        make_issue("TL-4"),
+    ]
+    transitions = {
+        # Reopened after it was done, the last done counts
+        "TL-1": [
+            ["2022-03-03T09:00:00.000+0000", "To Do", "In Progress"],
+            ["2022-03-04T09:00:00.000+0000", "In Progress", "Done"],
+            ["2022-03-05T09:00:00.000+0000", "Done", "In Progress"],
+            ["2022-03-06T21:00:00.000+0000", "In Progress", "Done"],
+        ],
+        # Never moved to done, so it ends at its resolution date
+        "TL-2": [["2022-03-02T04:00:00.000-0500", "To Do", "In Progress"]],
+        # Done without being started
+        "TL-3": [["2022-03-05T09:00:00.000+0000", "To Do", "done"]],
+    }
+
+    cycle, lead = get_cycle_times(issues, transitions)
+
+    assert cycle[:2].tolist() == [3.5, 4.0]
+    assert np.isnan(cycle[2:]).all()
+    assert lead[:3].tolist() == [5.5, 5.0, 4.0]
+    assert np.isnan(lead[3])
+
+
+def test_group_percentiles_match_numpy():
+    rng = np.random.default_rng(7)
+    groups = rng.integers(0, 3, 200)
+    values = rng.exponential(5.0, 200)
+    values[::10] = np.nan
+
+    counts, percentiles = group_percentiles(groups, values, 4)
+
+    for group in range(3):
+        found = values[(groups == group) & ~np.isnan(values)]
+        assert counts[group] == len(found)
+        assert np.allclose(percentiles[group], np.percentile(found, [50, 85, 95]))
+    assert counts[3] == 0
+    assert np.isnan(percentiles[3]).all()
+
+
+def test_team_stats_group_issues_without_a_team():
+    stats = get_team_cycle_stats(
+        ["core", None, "core"],
+        np.array([1.0, 2.0, np.nan]),
+        np.array([2.0, 4.0, 6.0]),
+        percentiles=(50,),
+    )
+    assert stats == {
+        "None": {"cycle": (1, [2.0]), "lead": (1, [4.0])},
+        "core": {"cycle": (1, [1.0]), "lead": (2, [4.0])},
+    }
+
+
+def test_only_changed_issues_have_their_changelogs_fetched(tmp_path, monkeypatch):
+    issues = [make_issue("TL-1"), make_issue("TL-2")]
+    fetched = []
+
+    def fetch_changelogs(jira, keys, max_workers=1):
+        fetched.append(sorted(keys))
+        updated = {issue.key: issue.updated for issue in issues}
+        return {
+            key: (updated[key], [["2022-03-02T09:00:00.000+0000", None, key]])
+            for key in keys
+        }
+
+    monkeypatch.setattr(changelogs, "fetch_changelogs", fetch_changelogs)
+    store = ChangelogStore(str(tmp_path / "changelogs.db"))
+
+    assert sorted(sync_changelogs(None, store, issues)) == ["TL-1", "TL-2"]
+    issues[1].updated = "2022-03-11T09:00:00.000+0000"
+    issues.append(make_issue("TL-3"))
+    transitions = sync_changelogs(None, store, issues)
+
+    assert fetched == [["TL-1", "TL-2"], ["TL-2", "TL-3"]]
+    assert transitions["TL-1"] == [["2022-03-02T09:00:00.000+0000", None, "TL-1"]]
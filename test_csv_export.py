@@ -0,0 +1,48 @@
+import csv
+import os
+
+from analysis_pipeline import export_csv_pages, resume_page
+
+HEADER = ["Key", "Summary"]
+PAGES = [["TL-6", "TL-5"], ["TL-4", "TL-3"], ["TL-2", "TL-1"]]
+
+
+def get_row(key):
+    return [key, "Fix %s" % key]
+
+
+def read_keys(fn):
+    with open(fn, newline="", encoding="utf-8") as f:
+        return [row[0] for row in csv.reader(f)]
+
+
+def test_export_passes_issues_on_and_cleans_up(tmp_path):
+    fn = str(tmp_path / "issues.csv")
+    issues = list(export_csv_pages(iter(PAGES), fn, HEADER, get_row, "query"))
+
+    assert issues == ["TL-6", "TL-5", "TL-4", "TL-3", "TL-2", "TL-1"]
+    assert read_keys(fn) == ["Key"] + issues
+    assert not os.path.exists(fn + ".progress")
+    assert resume_page(fn, "query") == 0
+
+
+def test_interrupted_export_resumes_after_its_last_written_page(tmp_path):
+    fn = str(tmp_path / "issues.csv")
+    stream = export_csv_pages(iter(PAGES), fn, HEADER, get_row, "query")
+    # Stop partway through the second page, it's already written out
+    for _ in range(3):
+        next(stream)
+    stream.close()
+
+    assert resume_page(fn, "other query") == 0
+    start_page = resume_page(fn, "query")
+    assert start_page == 2
+    rest = list(
+        export_csv_pages(
+            iter(PAGES[start_page:]), fn, HEADER, get_row, "query", start_page
+        )
+    )
+
+    assert rest == ["TL-2", "TL-1"]
+    assert read_keys(fn) == ["Key", "TL-6", "TL-5", "TL-4", "TL-3", "TL-2", "TL-1"]
+    assert not os.path.exists(fn + ".progress")
@@ -0,0 +1,89 @@
+import jira_epic_stories
+
+from jira_helper import compact_issue, sync_issues
+from jira_store import EpicRollupStore, IssueStore
+from periods import load_calendar
+from stub_jira import FIELD_KEYS, QUERY, StubJira, make_issue
+
+
+# Just what update_epic_rollups needs, without connecting to Jira
+def make_epic_analysis(path):
+    analysis = jira_epic_stories.JiraAnalysis.__new__(jira_epic_stories.JiraAnalysis)
+    analysis.epic_rollups = EpicRollupStore(path)
+    analysis.full_resync = False
+    analysis.calendar = load_calendar()
+    return analysis
+
+
+def update_rollups(jira, store, analysis):
+    issues = sync_issues(
+        jira,
+        store,
+        QUERY,
+        raw=True,
+        compact=lambda issue: compact_issue(issue, FIELD_KEYS, None),
+    )
+    return {
+        epic: (vals["count"], vals["total_sp"])
+        for epic, vals in analysis.update_epic_rollups(QUERY, issues).items()
+    }
+
+
+def test_epic_rollups_drop_closed_and_moved_issues(tmp_path):
+    jira = StubJira(
+        {
+            "TL-1": make_issue("Done", epic="TL-E1", story_points=3.0),
+            "TL-2": make_issue("Open", epic="TL-E1", story_points=5.0),
+            "TL-3": make_issue("Open", epic="TL-E2", story_points=2.0),
+        }
+    )
+    store = IssueStore(str(tmp_path / "issues.db"))
+    analysis = make_epic_analysis(str(tmp_path / "issues.db"))
+    assert update_rollups(jira, store, analysis) == {
+        "TL-E1": (2, 8.0),
+        "TL-E2": (1, 2.0),
+    }
+
+    jira.issues["TL-2"] = make_issue("Closed", epic="TL-E1", story_points=5.0)
+    jira.issues["TL-3"] = make_issue("Open", epic="TL-E1", story_points=2.0)
+    assert update_rollups(jira, store, analysis) == {
+        "TL-E1": (2, 5.0),
+        "TL-E2": (0, 0.0),
+    }
+
+
+def test_incremental_rollups_match_a_full_rollup(tmp_path):
+    issues = {
+        "TL-%d"
+        % number: make_issue(
+            "Done" if number % 3 else "Open",
+            epic="TL-E%d" % (number % 4),
+            story_points=[None, 1.0, 2.0, 5.0][number % 4],
+        )
+        for number in range(1, 21)
+    }
+    for number, key in enumerate(sorted(issues)):
+        issues[key]["resolutiondate"] = "2022-%02d-15T10:00:00.000+0000" % (
+            number % 12 + 1
+        )
+    jira = StubJira(issues)
+    store = IssueStore(str(tmp_path / "issues.db"))
+    analysis = make_epic_analysis(str(tmp_path / "issues.db"))
+    update_rollups(jira, store, analysis)
+
+    jira.issues["TL-4"] = dict(jira.issues["TL-4"], status="Closed")
+    jira.issues["TL-5"] = make_issue("Done", epic="TL-E0", story_points=8.0)
+    jira.issues["TL-5"]["resolutiondate"] = "2022-11-01T10:00:00.000+0000"
+    jira.issues["TL-6"] = make_issue("Open", epic=None, story_points=1.0)
+    issues = sync_issues(
+        jira,
+        store,
+        QUERY,
+        raw=True,
+        compact=lambda issue: compact_issue(issue, FIELD_KEYS, None),
+    )
+    incremental = analysis.update_epic_rollups(QUERY, issues)
+    full = analysis.get_epic_rollups(issues)
+
+    # Nothing was written in between so every epic is still pending
+    assert incremental == full
@@ -0,0 +1,214 @@
+import time
+
+import pytest
+
+from jira import JIRA
+from jira.exceptions import JIRAError
+from jira.resilientsession import ResilientSession
+from requests import Response
+from requests.adapters import BaseAdapter
+
+import epic_updates
+import fake_jira
+
+from epic_updates import (
+    BULK_MAX_ISSUES,
+    KEY_CHUNK_SIZE,
+    WriteScheduler,
+    get_edit_rounds,
+    get_retry_after,
+    group_bulk_edits,
+    plan_bulk_groups,
+    plan_epic_updates,
+    put_issue_fields,
+    scheduler_retries_only,
+    values_equal,
+    write_epic_updates,
+)
+from stub_jira import serve_fake_jira
+
+
+class StubResponse:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+class StubError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__("HTTP %d" % status_code)
+        self.status_code = status_code
+        self.response = StubResponse(headers)
+
+
+# Fails each write with the given errors in turn, then succeeds
+class StubWrites:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self, issue_id, fields):
+        self.calls.append((issue_id, time.time()))
+        if self.errors:
+            raise self.errors.pop(0)
+        return StubResponse()
+
+
+def test_scheduler_ramps_up_while_writes_succeed():
+    scheduler = WriteScheduler(StubWrites(), max_workers=8, start_workers=2)
+    summary = scheduler.run({"TL-E%d" % i: {} for i in range(100)})
+    assert summary == {"applied": 100, "retried": 0, "failed": 0}
+    assert scheduler.limit == 8
+
+
+def test_scheduler_halves_and_waits_out_retry_after():
+    writes = StubWrites([StubError(429, {"Retry-After": "0.3"})])
+    scheduler = WriteScheduler(writes, start_workers=4, base_delay=0.01)
+    start = time.time()
+    summary = scheduler.run({"TL-E1": {}})
+    assert summary == {"applied": 1, "retried": 1, "failed": 0}
+    assert writes.calls[1][1] - start >= 0.3
+    assert scheduler.limit < 4
+
+
+def test_scheduler_fails_rejected_writes_without_retrying():
+    writes = StubWrites([StubError(400)])
+    scheduler = WriteScheduler(writes)
+    assert scheduler.run({"TL-E1": {}}) == {"applied": 0, "retried": 0, "failed": 1}
+    assert len(writes.calls) == 1
+
+
+def test_retry_after_reads_seconds_and_dates():
+    assert get_retry_after(StubResponse({"Retry-After": "2"})) == 2.0
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 < get_retry_after(StubResponse({"Retry-After": date})) <= 30
+    assert get_retry_after(StubResponse()) is None
+
+
+# Answers every request with a 503 without going over the network
+class ThrottlingAdapter(BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        response = Response()
+        response.status_code = 503
+        response.reason = "Service Unavailable"
+        response.url = request.url
+        response.request = request
+        response._content = b""
+        return response
+
+    def close(self):
+        pass
+
+
+class StubClient:
+    def __init__(self, session):
+        self._session = session
+
+    def _get_url(self, path):
+        return "http://jira/rest/api/2/" + path
+
+
+def test_throttled_writes_reach_the_scheduler():
+    session = ResilientSession()
+    adapter = ThrottlingAdapter()
+    session.mount("http://", adapter)
+    with scheduler_retries_only(session):
+        start = time.time()
+        with pytest.raises(JIRAError) as e:
+            put_issue_fields(StubClient(session), "TL-E1", {"q1": 1.0})
+        assert e.value.status_code == 503
+        assert adapter.sent == 1
+        assert time.time() - start < 1
+    assert session.max_retries == 3
+
+
+def test_bulk_groups_only_pay_for_shared_values():
+    updates = {"TL-E%d" % i: {"q1": 0.0, "q2": float(i % 2)} for i in range(20)}
+    # One epic with a value nobody shares still gets its PUT
+    updates["TL-E99"] = {"q1": 0.0, "q2": 7.0}
+    groups = plan_bulk_groups(updates)
+    assert sorted(groups) == [("q1", 0.0), ("q2", 0.0), ("q2", 1.0)]
+    assert "TL-E99" in groups[("q1", 0.0)]
+
+
+def test_bulk_groups_drop_values_that_save_no_puts():
+    # Everyone shares q1 but q2 is different per epic, so each epic needs a PUT
+    # either way and bulk editing q1 would only add requests
+    updates = {"TL-E%d" % i: {"q1": 0.0, "q2": float(i)} for i in range(50)}
+    assert plan_bulk_groups(updates) == {}
+
+
+def test_edit_rounds_never_share_an_issue():
+    updates = {"TL-E%d" % i: {"q1": 0.0, "q2": float(i % 3)} for i in range(2500)}
+    edits = group_bulk_edits(plan_bulk_groups(updates))
+    assert max(len(edit["issues"]) for edit in edits.values()) == BULK_MAX_ISSUES
+    rounds = get_edit_rounds(edits)
+    assert sum(len(round_edits) for round_edits in rounds) == len(edits)
+    for round_edits in rounds:
+        issue_ids = [i for edit in round_edits.values() for i in edit["issues"]]
+        assert len(issue_ids) == len(set(issue_ids))
+    assert len(rounds) == 2
+
+
+def test_numbers_compare_like_jira_returns_them():
+    assert values_equal(15.0, 15)
+    assert values_equal(0.1 + 0.2, 0.3)
+    assert not values_equal(None, 0)
+    assert not values_equal(2.0, 3)
+
+
+def test_only_changed_epic_fields_are_written():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(10, KEY_CHUNK_SIZE + 50))
+    count = fake.dataset.custom_fields["Num Tickets"]
+    points = fake.dataset.custom_fields["Story Points (Done)"]
+    updates = {}
+    for i in range(KEY_CHUNK_SIZE + 50):
+        fake.edit("TL-E%d" % i, {count: 5.0, points: 10.0})
+        updates["TL-E%d" % i] = {count: 5, points: 15.0 if i % 10 == 0 else 10}
+    # Never written before so it's written even though the value is a zero
+    updates["TL-E1"] = {count: 5, points: 10, "customfield_99": 0}
+
+    with serve_fake_jira(fake) as url:
+        jira = JIRA(url, basic_auth=("user", "token"))
+        fake.reset_stats()
+        planned, skipped = plan_epic_updates(jira, updates)
+        # The epics are read in pages of key in (...) searches, not a GET each
+        assert fake.stats["searches"] == 3
+        assert planned["TL-E0"] == {points: 15.0}
+        assert planned["TL-E1"] == {"customfield_99": 0}
+        assert (len(planned), skipped) == (26, len(updates) - 26)
+
+        write_epic_updates(jira, planned, bulk=False)
+        assert fake.stats["updates"] == 26
+        assert plan_epic_updates(jira, updates) == ({}, len(updates))
+
+
+def test_shared_values_are_bulk_edited_and_the_rest_put(monkeypatch):
+    monkeypatch.setattr(epic_updates, "BULK_POLL_INTERVAL", 0.01)
+    for bulk in (True, False):
+        fake = fake_jira.FakeJira(fake_jira.Dataset(10, 60), bulk=bulk)
+        q1 = fake.dataset.custom_fields["Story Points (Done 2022Q1)"]
+        q2 = fake.dataset.custom_fields["Story Points (Done 2022Q2)"]
+        updates = {"TL-E%d" % i: {q1: 0.0, q2: float(i % 2)} for i in range(59)}
+        updates["TL-E59"] = {q1: 0.0, q2: 7.0}
+        written = []
+        with serve_fake_jira(fake) as url:
+            jira = JIRA(url, basic_auth=("user", "token"))
+            summary = write_epic_updates(jira, updates, on_written=written.extend)
+
+        assert {
+            epic: {field: fake.edits[epic][field] for field in (q1, q2)}
+            for epic in updates
+        } == updates
+        assert sorted(written) == sorted(updates)
+        if bulk:
+            # q1 for everyone and both q2 values, the odd one out gets a PUT
+            assert (fake.stats["bulk_edits"], fake.stats["updates"]) == (3, 1)
+            assert summary["bulk_edits"] == 3
+        else:
+            assert (fake.stats["bulk_edits"], fake.stats["updates"]) == (0, 60)
+        assert summary["applied"] == 60
@@ -0,0 +1,84 @@
+import json
+import threading
+
+from datetime import datetime
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import pytest
+
+import fake_jira
+
+
+def test_searches_filter_like_jira_would():
+    dataset = fake_jira.Dataset(500, 5)
+    jql = (
+        'project = "TL" AND (created >= "2022-03-01" AND created < "2022-04-01"'
+        ' OR resolutiondate >= "2022-11-01 12:00") AND updated <= "2022-12-01"'
+    )
+    resolved_after = datetime(2022, 11, 1, 12, 0)
+
+    def matches(i):
+        resolved = dataset.resolved(i)
+        return (
+            datetime(2022, 3, 1) <= dataset.created(i) < datetime(2022, 4, 1)
+            or resolved is not None
+            and resolved >= resolved_after
+        ) and dataset.updated(i) <= datetime(2022, 12, 1)
+
+    expected = [i for i in range(500, 0, -1) if matches(i)]
+    assert expected
+    assert list(dataset.issue_numbers(jql)) == expected
+
+
+def test_fake_jira_rejects_date_clauses_it_cant_search():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(100, 5))
+    with pytest.raises(fake_jira.JqlError, match="duedate"):
+        fake.search('project = "TL" AND duedate >= "2022-01-01"', 0, 10, None, "")
+    with pytest.raises(fake_jira.JqlError, match="parentheses"):
+        fake.search('project = "TL" AND (created >= "2022-01-01"', 0, 10, None, "")
+
+
+def test_server_searches_and_throttles_writes():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(100, 5), write_rate=1)
+    server = fake_jira.make_server(fake, 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+
+    def request(path, method="GET", data=None):
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        req = Request(url + path, body, {"Content-Type": "application/json"})
+        req.method = method
+        try:
+            with urlopen(req) as response:
+                content = response.read()
+                return response.status, json.loads(content) if content else None
+        except HTTPError as e:
+            return e.code, dict(json.load(e), retry_after=e.headers["Retry-After"])
+
+    try:
+        status, page = request(
+            "/rest/api/2/search?"
+            + urlencode({"jql": 'project = "TL"', "maxResults": 10, "fields": "key"})
+        )
+        assert status == 200
+        assert page["total"] == 100
+        assert [issue["key"] for issue in page["issues"]][:2] == ["TL-100", "TL-99"]
+        assert page["issues"][0]["fields"] == {}
+
+        edit = {"fields": {"customfield_10005": 3}}
+        assert request("/rest/api/2/issue/TL-E1", "PUT", edit)[0] == 204
+        status, error = request("/rest/api/2/issue/TL-E2", "PUT", edit)
+        assert (status, error["retry_after"]) == (429, "1")
+        assert request("/rest/api/2/issue/TL-E1")[1]["fields"]["customfield_10005"] == 3
+
+        status, error = request(
+            "/rest/api/2/search?" + urlencode({"jql": 'duedate >= "2022-01-01"'})
+        )
+        assert status == 400
+        assert request("/_stats")[1]["throttled"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
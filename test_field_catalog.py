@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+import fake_jira
+import jira_analysis
+
+from jira_helper import get_field_catalog, get_field_index
+from stub_jira import serve_fake_jira
+from util import METRICS
+
+
+# Hands out a new catalog on every call
+class CountingFetch:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return [{"name": "Story Points", "key": "customfield_%d" % self.calls}]
+
+
+def test_catalog_is_cached_per_server_until_it_expires(tmp_path):
+    cache_file = str(tmp_path / "fields.json")
+    fetch = CountingFetch()
+
+    first = get_field_catalog("https://a", fetch, cache_file, ttl=60)
+    assert get_field_catalog("https://a", fetch, cache_file, ttl=60) == first
+    assert fetch.calls == 1
+    get_field_catalog("https://b", fetch, cache_file, ttl=60)
+    assert fetch.calls == 2
+    # Both servers share the file and each keeps its own catalog
+    assert get_field_catalog("https://a", fetch, cache_file, ttl=60) == first
+
+    time.sleep(0.01)
+    assert get_field_catalog("https://a", fetch, cache_file, ttl=0.005) != first
+    assert fetch.calls == 3
+    # Without a cache file every call fetches
+    get_field_catalog("https://a", fetch, None)
+    assert fetch.calls == 4
+
+
+def test_field_index_keeps_the_first_of_a_name():
+    assert get_field_index(
+        [
+            {"name": "Story Points", "key": "customfield_1"},
+            {"name": "Sprint", "key": "customfield_2"},
+            {"name": "Story Points", "key": "customfield_3"},
+        ]
+    ) == {"Story Points": "customfield_1", "Sprint": "customfield_2"}
+
+
+def test_clients_share_one_catalog_download(tmp_path):
+    cache_file = str(tmp_path / "fields.json")
+    fake = fake_jira.FakeJira(fake_jira.Dataset(10, 2))
+    misses = METRICS.counters["field_catalog_cache_misses"]
+    hits = METRICS.counters["field_catalog_cache_hits"]
+    with serve_fake_jira(fake) as url:
+        analysis = jira_analysis.JiraAnalysis(
+            url, "user", "token", [], field_cache_file=cache_file
+        )
+        # The client and the field index read the catalog once between them
+        assert METRICS.counters["field_catalog_cache_misses"] == misses + 1
+        jira_analysis.JiraAnalysis(
+            url, "user", "token", [], field_cache_file=cache_file
+        )
+
+    assert METRICS.counters["field_catalog_cache_misses"] == misses + 1
+    assert METRICS.counters["field_catalog_cache_hits"] == hits + 1
+    assert analysis.story_point_field == fake.dataset.custom_fields["Story Points"]
+    with pytest.raises(Exception, match="Failed to find fields: Team, Sprint Goal"):
+        analysis.get_custom_field_keys(["Story Points", "Team", "Sprint Goal"])
@@ -0,0 +1,61 @@
+import fake_jira
+import jira_analysis
+import jira_epic_stories
+
+from issue_query import IssueQuery
+from stub_jira import serve_fake_jira
+
+
+# Records the fields every search asked for
+class RecordingFakeJira(fake_jira.FakeJira):
+    def __init__(self, dataset):
+        super().__init__(dataset)
+        self.searched_fields = []
+
+    def search(self, jql, start_at, max_results, fields, base_url, expand=""):
+        self.searched_fields.append(fields)
+        return super().search(jql, start_at, max_results, fields, base_url, expand)
+
+
+def test_searches_only_ask_for_the_fields_the_analyses_read():
+    fake = RecordingFakeJira(fake_jira.Dataset(200, 5))
+    story_points = fake.dataset.custom_fields["Story Points"]
+    with serve_fake_jira(fake) as url:
+        analysis = jira_analysis.JiraAnalysis(
+            url, "user", "token", ["Backend"], analyses=["priorities"]
+        )
+        issues = analysis.get_issues(
+            analysis.get_issue_query("2022-01-01", "2022-12-31")
+        )
+
+    assert analysis.search_fields == sorted(
+        ["labels", "resolutiondate", "summary", story_points, "updated"]
+    )
+    assert len(fake.searched_fields) == 2
+    assert all(fields == set(analysis.search_fields) for fields in fake.searched_fields)
+    assert issues
+    assert all(issue.summary for issue in issues)
+    assert {issue.description for issue in issues} == {None}
+    assert {issue.assignee for issue in issues} == {None}
+
+
+def test_epic_searches_always_read_what_the_cache_slices_by():
+    fake = RecordingFakeJira(fake_jira.Dataset(200, 5))
+    epic_link = fake.dataset.custom_fields["Epic Link"]
+    with serve_fake_jira(fake) as url:
+        analysis = jira_epic_stories.JiraAnalysis(
+            url, "user", "token", ["Backend"], analyses=["write_issues"]
+        )
+        query = analysis.get_issue_query("2022-01-01", "2022-12-31")
+        issues = analysis.get_issues(query)
+        epic = next(issue.epic for issue in issues if issue.epic)
+        searches = len(fake.searched_fields)
+        narrower = analysis.get_issues(
+            IssueQuery(query.base, "created", "2022-02-01", "2022-03-01", epic=epic)
+        )
+
+    assert {"created", "updated", epic_link} <= set(analysis.search_fields)
+    # The narrower query is answered from the issues already fetched
+    assert len(fake.searched_fields) == searches
+    assert narrower
+    assert all(issue.epic == epic for issue in narrower)
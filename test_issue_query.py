@@ -0,0 +1,126 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from issue_query import IssueQuery, QueryCache
+from stub_jira import QUERY
+
+
+def make_issue(number, resolutiondate, epic=None):
+    return SimpleNamespace(
+        key="TL-%d" % number, resolutiondate=resolutiondate, epic=epic
+    )
+
+
+ISSUES = [
+    make_issue(1, "2022-01-05T10:00:00.000+0000", "TL-E1"),
+    make_issue(2, "2022-01-20T10:00:00.000+0000"),
+    make_issue(3, "2022-02-03T10:00:00.000+0000", "TL-E1"),
+    make_issue(4, "2022-02-03T23:59:00.000+0000", "TL-E2"),
+    make_issue(5, "2022-02-10T10:00:00.000+0000"),
+]
+
+
+# Answers like Jira would from ISSUES and records what was asked for
+class Fetches:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return sorted(
+            (issue for issue in ISSUES if query.matches(issue)),
+            key=lambda issue: issue.key,
+            reverse=True,
+        )
+
+
+def keys(issues):
+    return [issue.key for issue in issues]
+
+
+def test_issue_query_names_an_unreadable_date():
+    with pytest.raises(ValueError, match="2022-13-01"):
+        IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-13-01")
+    with pytest.raises(ValueError, match="yesterday"):
+        IssueQuery(QUERY, "resolutiondate", "yesterday")
+
+
+def test_issue_query_is_its_jql():
+    query = IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-02-03 12:30")
+    assert query == (
+        QUERY + ' AND resolutiondate >= "2022-01-01"'
+        ' AND resolutiondate <= "2022-02-03 12:30"'
+    )
+    assert query.interval() == (
+        datetime(2022, 1, 1),
+        datetime(2022, 2, 3, 12, 31),
+    )
+
+
+def test_uncovered_finds_the_gaps_between_intervals():
+    query = IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-03-01", False)
+    assert query.uncovered(
+        [
+            (datetime(2022, 1, 10), datetime(2022, 1, 20)),
+            (datetime(2021, 12, 1), datetime(2022, 1, 5)),
+            (datetime(2022, 2, 1), datetime(2022, 4, 1)),
+        ]
+    ) == [
+        (datetime(2022, 1, 5), datetime(2022, 1, 10)),
+        (datetime(2022, 1, 20), datetime(2022, 2, 1)),
+    ]
+
+
+def test_cache_narrows_a_fetched_range():
+    cache = QueryCache()
+    fetch = Fetches()
+    year = IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-12-31")
+    february = IssueQuery(QUERY, "resolutiondate", "2022-02-01", "2022-02-03 23:59")
+    epic = IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-12-31", epic="TL-E1")
+
+    assert keys(cache.get(year, fetch)) == ["TL-5", "TL-4", "TL-3", "TL-2", "TL-1"]
+    # The end is inclusive down to its minute
+    assert keys(cache.get(february, fetch)) == ["TL-4", "TL-3"]
+    assert keys(cache.get(epic, fetch)) == ["TL-3", "TL-1"]
+    assert fetch.queries == [year]
+
+
+def test_cache_combines_ranges_and_fetches_only_the_gaps():
+    cache = QueryCache()
+    fetch = Fetches()
+    january = IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-02-01", False)
+    epics = IssueQuery(
+        QUERY, "resolutiondate", "2022-02-05", "2022-03-01", False, epics_only=True
+    )
+    cache.get(january, fetch)
+    cache.get(epics, fetch)
+
+    first_quarter = IssueQuery(QUERY, "resolutiondate", "2022-01-01", "2022-04-01")
+    assert keys(cache.get(first_quarter, fetch)) == [
+        "TL-5",
+        "TL-4",
+        "TL-3",
+        "TL-2",
+        "TL-1",
+    ]
+    # The epics only range can't answer for issues without an epic
+    assert fetch.queries[2:] == [
+        IssueQuery(QUERY, "resolutiondate", "2022-02-01", "2022-04-01 00:01", False)
+    ]
+
+    assert cache.lookup(first_quarter) is not None
+    assert (
+        cache.lookup(IssueQuery(QUERY, "resolutiondate", "2022-01-15", "2022-02-15"))
+        is not None
+    )
+    assert cache.lookup(IssueQuery(QUERY, "created", "2022-01-15")) is None
+    assert (
+        cache.lookup(
+            IssueQuery(
+                'project = "OTHER"', "resolutiondate", "2022-01-15", "2022-02-15"
+            )
+        )
+        is None
+    )
@@ -0,0 +1,81 @@
+from jira_helper import RawResource, compact_issue, get_csv_row
+from label_rules import LabelClassifier, get_default_rules
+from stub_jira import FIELD_KEYS
+
+CLASSIFIER = LabelClassifier(get_default_rules(["Backend"]))
+
+
+def make_issue(key, **fields):
+    return RawResource({"key": key, "fields": fields})
+
+
+def test_issues_decode_into_records():
+    issue = make_issue(
+        "TL-1",
+        summary="Fix login",
+        labels=["backend", "2018:q1:2"],
+        assignee={"name": "ann", "displayName": "Ann"},
+        created="2022-03-01T10:00:00.000+0000",
+        resolutiondate="2022-03-04T10:00:00.000+0000",
+        issuetype={"name": "Story"},
+        status={"name": "Done"},
+        **{
+            FIELD_KEYS["story_points"]: 3,
+            FIELD_KEYS["epic_link"]: "TL-E1",
+            FIELD_KEYS["investment_area"]: ["Growth"],
+            FIELD_KEYS["sprint"]: [{"name": "Sprint 1"}, "Sprint 2"],
+        }
+    )
+    record = compact_issue(issue, FIELD_KEYS, CLASSIFIER)
+
+    assert (record.key, record.summary, record.story_points) == (
+        "TL-1",
+        "Fix login",
+        3.0,
+    )
+    assert (record.team, record.priority, record.period) == ("Backend", 2, "2018-q1")
+    assert (record.assignee, record.issue_type, record.status) == (
+        "Ann",
+        "story",
+        "Done",
+    )
+    assert (record.epic, record.investment_area) == ("TL-E1", ("Growth",))
+    # Sprints come back as objects or plain names
+    assert record.sprints == ("Sprint 1", "Sprint 2")
+    assert get_csv_row(record, ["ticket", "team", "sprints", "investment_area"]) == [
+        record,
+        "Backend",
+        "Sprint 1,Sprint 2",
+        "Growth",
+    ]
+
+
+def test_fields_the_search_skipped_stay_empty():
+    record = compact_issue(make_issue("TL-2", summary="Fix"), FIELD_KEYS, CLASSIFIER)
+    assert record.summary == "Fix"
+    for name in ("labels", "team", "assignee", "issue_type", "status", "sprints"):
+        assert getattr(record, name) is None
+    assert record.story_points == 0.0
+    # Unassigned issues are told apart from ones whose assignee wasn't fetched
+    unassigned = compact_issue(
+        make_issue("TL-3", assignee=None), FIELD_KEYS, CLASSIFIER
+    )
+    assert unassigned.assignee == "None"
+
+
+def test_records_share_repeated_strings():
+    records = [
+        compact_issue(
+            make_issue(
+                "TL-%d" % i,
+                labels=["".join(["back", "end"])],
+                **{FIELD_KEYS["epic_link"]: "".join(["TL-", "E1"])}
+            ),
+            FIELD_KEYS,
+            CLASSIFIER,
+        )
+        for i in range(2)
+    ]
+    assert records[0].labels[0] is records[1].labels[0]
+    assert records[0].epic is records[1].epic
+    assert not hasattr(records[0], "__dict__")
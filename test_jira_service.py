@@ -0,0 +1,88 @@
+import json
+import threading
+
+import pytest
+
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import jira_service
+
+
+def test_service_computes_answers_outside_the_lock():
+    service = jira_service.AnalysisService(None, None, "2022-01-01", 300)
+    slow_started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        slow_started.set()
+        release.wait(5)
+        return "slow"
+
+    answers = []
+    threads = [
+        threading.Thread(target=lambda: answers.append(service.answer("a", slow)))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    assert slow_started.wait(5)
+    # Another key and the refresh swap don't wait on the slow answer
+    fast = threading.Thread(target=lambda: service.answer("b", lambda: "fast"))
+    fast.start()
+    fast.join(1)
+    assert not fast.is_alive()
+    assert service.lock.acquire(timeout=1)
+    service.lock.release()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert answers == ["slow", "slow"]
+    assert calls == ["slow"]
+
+
+def test_failed_answers_are_computed_again():
+    service = jira_service.AnalysisService(None, None, "2022-01-01", 300)
+    calls = []
+
+    def flaky():
+        calls.append("flaky")
+        if len(calls) == 1:
+            raise Exception("Jira went away")
+        return "answer"
+
+    with pytest.raises(Exception, match="Jira went away"):
+        service.answer("a", flaky)
+    assert service.answer("a", flaky) == "answer"
+    assert service.answer("a", flaky) == "answer"
+    assert len(calls) == 2
+
+
+def test_requests_stay_inside_the_warm_issues():
+    service = jira_service.AnalysisService(None, None, "2022-01-01", 300)
+    server = jira_service.make_server(service, 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+
+    def get(path):
+        try:
+            with urlopen(url + path) as response:
+                return response.status, json.load(response)
+        except HTTPError as e:
+            return e.code, json.load(e)
+
+    try:
+        status, health = get("/health")
+        assert status == 200
+        assert health["start"] == "2022-01-01"
+        status, error = get("/analyses/priorities?start=2021-12-01")
+        assert status == 400
+        assert "--start" in error["error"]
+        assert get("/analyses/priorities?end=soon")[0] == 400
+        assert get("/analyses/velocity")[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,72 @@
+from jira_helper import sync_issues
+from jira_store import IssueStore
+from stub_jira import QUERY, StubJira, make_issue
+
+
+def sync(jira, store):
+    return {
+        issue.raw["key"]: issue.raw["fields"]["status"]
+        for issue in sync_issues(jira, store, QUERY, raw=True)
+    }
+
+
+def test_sync_drops_issues_that_left_the_query(tmp_path):
+    jira = StubJira(
+        {
+            "TL-1": make_issue("Open"),
+            "TL-2": make_issue("Open"),
+            "TL-3": make_issue("Open"),
+            "TL-4": make_issue("Open"),
+        }
+    )
+    store = IssueStore(str(tmp_path / "issues.db"))
+    assert sync(jira, store) == {
+        "TL-1": "Open",
+        "TL-2": "Open",
+        "TL-3": "Open",
+        "TL-4": "Open",
+    }
+
+    jira.issues["TL-1"] = make_issue("In Progress")
+    jira.issues["TL-2"] = make_issue("Closed")
+    jira.issues["TL-3"] = make_issue("Open", project="OPS")
+    assert sync(jira, store) == {"TL-1": "In Progress", "TL-4": "Open"}
+
+    # An issue coming back is picked up again by the updated search
+    jira.issues["TL-2"] = make_issue("Open")
+    assert sync(jira, store) == {"TL-1": "In Progress", "TL-2": "Open", "TL-4": "Open"}
+
+
+def test_incremental_sync_only_fetches_updated_issues(tmp_path):
+    jira = StubJira({"TL-1": make_issue("Open"), "TL-2": make_issue("Open")})
+    store = IssueStore(str(tmp_path / "issues.db"))
+    sync(jira, store)
+    jira.issues["TL-2"] = make_issue("Done")
+    # Issues the updated search doesn't return come from the store
+    assert sync(jira, store) == {"TL-1": "Open", "TL-2": "Done"}
+
+
+def test_save_only_carries_over_fields_the_fetch_didnt_ask_for(tmp_path):
+    store = IssueStore(str(tmp_path / "issues.db"))
+    store.save(
+        "a",
+        [
+            {
+                "key": "TL-1",
+                "fields": {"summary": "Old", "labels": ["x"], "updated": "1"},
+            }
+        ],
+        ["summary", "labels", "updated"],
+    )
+    # labels was asked for and left out, so the stored value isn't brought back
+    store.save(
+        "b",
+        [{"key": "TL-1", "fields": {"status": "Done", "updated": "2"}}],
+        ["status", "labels", "updated"],
+    )
+    assert list(store.load("b")) == [
+        {
+            "key": "TL-1",
+            "fields": {"summary": "Old", "status": "Done", "updated": "2"},
+        }
+    ]
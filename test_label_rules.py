@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from label_rules import LabelClassifier, get_default_rules, load_label_rules
+
+
+def test_default_rules_read_teams_priorities_and_periods():
+    classifier = LabelClassifier(get_default_rules(["Backend", "Frontend"]))
+
+    assert classifier.classify(["backend", "2018:Q1:2"]) == {
+        "team": "Backend",
+        "priority": 2,
+        "period": "2018-q1",
+    }
+    assert classifier.classify(["2018:q2", "2018:q1:soon"]) == {
+        "team": None,
+        "priority": 100,
+        "period": "2018-q2",
+    }
+    assert classifier.classify(None) == {
+        "team": None,
+        "priority": 100,
+        "period": None,
+    }
+
+
+def test_first_label_decides_and_earliest_rule_wins():
+    classifier = LabelClassifier(
+        {
+            "team": {
+                "default": "none",
+                "rules": [
+                    {"label": "team:core", "value": "Core"},
+                    {"prefix": "team:"},
+                    {"regex": r"^squad-(\w+)"},
+                ],
+            }
+        }
+    )
+
+    assert classifier.classify(["team:Core"]) == {"team": "Core"}
+    assert classifier.classify(["Team:Web", "team:core"]) == {"team": "Web"}
+    assert classifier.classify(["other", "squad-data"]) == {"team": "data"}
+    assert classifier.classify(["other"]) == {"team": "none"}
+    # Labels are matched once and remembered
+    assert set(classifier.label_cache) == {
+        "team:Core",
+        "Team:Web",
+        "team:core",
+        "other",
+        "squad-data",
+    }
+
+
+def test_rules_load_from_a_file(tmp_path):
+    rules = load_label_rules(
+        os.path.join(os.path.dirname(__file__), "SAMPLE_label_rules.json")
+    )
+    labels = ["team:payments", "2018:q2:7"]
+    assert LabelClassifier(rules).classify(labels) == {
+        "team": "payments",
+        "priority": 7,
+        "period": "2018-q2",
+    }
+    assert load_label_rules(None, ["Backend"]) == get_default_rules(["Backend"])
+    with pytest.raises(Exception, match="Unable to find"):
+        load_label_rules(str(tmp_path / "missing.json"))
+
+
+def test_rules_need_something_to_match():
+    with pytest.raises(Exception, match="needs a label, prefix or regex"):
+        LabelClassifier({"team": {"rules": [{"value": "Core"}]}})
@@ -0,0 +1,84 @@
+import json
+import logging
+
+import pytest
+import requests
+
+import fake_jira
+
+from stub_jira import serve_fake_jira
+from util import METRICS, Metrics, configure_logging, instrument_session
+
+
+def test_spans_and_counters_add_up():
+    metrics = Metrics()
+    for _ in range(2):
+        with metrics.span("fetch"):
+            pass
+    metrics.record("analysis", 1.5)
+    metrics.incr("jira_api_calls")
+    metrics.incr("jira_api_calls", 2)
+
+    summary = metrics.summary()
+    assert summary["spans"]["fetch"]["count"] == 2
+    assert summary["spans"]["analysis"] == {"count": 1, "seconds": 1.5}
+    assert summary["counters"] == {"jira_api_calls": 3}
+
+
+def test_metrics_are_written_as_json_and_prometheus(tmp_path):
+    metrics = Metrics()
+    metrics.record("fetch", 0.25)
+    metrics.incr("issues_analyzed", 7)
+    json_file = str(tmp_path / "metrics.json")
+    prom_file = str(tmp_path / "metrics.prom")
+
+    metrics.write(
+        "jira_analysis", {"METRICS_FILE": json_file, "METRICS_PROM_FILE": prom_file}
+    )
+
+    with open(json_file) as f:
+        written = json.load(f)
+    assert written["script"] == "jira_analysis"
+    assert written["counters"] == {"issues_analyzed": 7}
+    with open(prom_file) as f:
+        lines = f.read().splitlines()
+    assert (
+        'automating_management_span_seconds{script="jira_analysis",span="fetch"} 0.25'
+        in lines
+    )
+    assert (
+        'automating_management_count{script="jira_analysis",name="issues_analyzed"} 7'
+        in lines
+    )
+
+
+def test_sessions_count_calls_bytes_and_throttling():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(10, 2), write_rate=1)
+    session = instrument_session(requests.Session(), "test")
+    before = dict(METRICS.counters)
+    with serve_fake_jira(fake) as url:
+        response = session.get(url + "/rest/api/2/field")
+        for _ in range(2):
+            session.put(url + "/rest/api/2/issue/TL-E1", json={"fields": {}})
+
+    def counted(name):
+        return METRICS.counters[name] - before.get(name, 0)
+
+    assert counted("test_api_calls") == 3
+    assert counted("test_bytes_received") >= len(response.content)
+    assert counted("test_retryable_responses") == 1
+
+
+def test_log_level_comes_from_the_config(monkeypatch):
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    root = logging.getLogger()
+    level = root.level
+    try:
+        configure_logging({"LOG_LEVEL": " info "})
+        assert root.level == logging.INFO
+        configure_logging({"LOG_LEVEL": ""})
+        assert root.level == logging.DEBUG
+        with pytest.raises(Exception, match="Unknown LOG_LEVEL LOUD"):
+            configure_logging({"LOG_LEVEL": "loud"})
+    finally:
+        root.setLevel(level)
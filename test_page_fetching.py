@@ -0,0 +1,71 @@
+import time
+import threading
+
+import pytest
+
+from jira_helper import fetch_all_pages, iter_all_issues
+from stub_jira import QUERY, StubJira, make_issue
+
+
+# Serves later pages faster so they finish out of order, and records the pages
+# asked for and how many searches were in flight at once
+class SlowStubJira(StubJira):
+    def __init__(self, issues):
+        super().__init__(issues)
+        self.lock = threading.Lock()
+        self.pages = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url, params):
+        with self.lock:
+            self.pages.append(params["startAt"] // params["maxResults"])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02 / (1 + params["startAt"] // params["maxResults"]))
+        with self.lock:
+            self.in_flight -= 1
+        return super().get(url, params)
+
+
+def make_jira(num_issues=95):
+    return SlowStubJira(
+        {"TL-%03d" % number: make_issue("Open") for number in range(num_issues)}
+    )
+
+
+def test_concurrent_pages_keep_their_order():
+    jira = make_jira()
+    keys = [
+        issue.key for issue in fetch_all_pages(jira, QUERY, 4, max_results=10, raw=True)
+    ]
+    assert keys == sorted(jira.issues, reverse=True)
+    assert jira.max_in_flight > 1
+
+
+def test_pages_fetched_ahead_are_bounded():
+    jira = make_jira()
+    handled = []
+    issues = iter_all_issues(
+        jira, QUERY, 2, max_results=10, raw=True, on_progress=handled.append
+    )
+    # A slow reader doesn't let more than two pages per worker pile up
+    for issue in issues:
+        with jira.lock:
+            assert max(jira.pages) < handled[-1] + 4
+        time.sleep(0.001)
+    assert handled == list(range(10))
+
+
+def test_failed_page_names_the_page():
+    jira = make_jira()
+    get = jira.get
+
+    def fail_third_page(url, params):
+        if params["startAt"] == 20:
+            raise Exception("Bad gateway")
+        return get(url, params)
+
+    jira.get = fail_third_page
+    with pytest.raises(Exception, match="page 2 of 10: Bad gateway"):
+        fetch_all_pages(jira, QUERY, 4, max_results=10, raw=True)
@@ -0,0 +1,70 @@
+import pytest
+
+import fake_jira
+import jira_analysis
+
+from analysis_pipeline import ACCUMULATORS, run_pipeline, run_period_pipeline
+from jira_helper import IssueRecord
+from periods import get_rolling_periods
+from stub_jira import serve_fake_jira
+
+
+def test_issues_go_to_every_period_they_fall_in():
+    periods = [
+        {"name": "A", "start": "2022-01-01", "end": "2022-03-01"},
+        {"name": "B", "start": "2022-02-01", "end": "2022-04-01"},
+    ]
+    issues = [
+        IssueRecord("TL-1", resolutiondate="2022-01-15", story_points=1.0),
+        IssueRecord("TL-2", resolutiondate="2022-02-15", story_points=2.0),
+        IssueRecord("TL-3", resolutiondate="2022-03-01", story_points=3.0),
+        IssueRecord("TL-4", resolutiondate=None, story_points=4.0),
+    ]
+    results = run_period_pipeline(
+        issues,
+        periods,
+        lambda issue: issue.resolutiondate,
+        lambda: [ACCUMULATORS["priorities"]()],
+    )
+    assert [
+        [str(issue) for issue in accumulators[0].no_priority_stories]
+        for accumulators in results
+    ] == [["TL-1", "TL-2"], ["TL-2", "TL-3"]]
+
+
+def test_periods_are_analyzed_off_one_fetch(tmp_path):
+    fake = fake_jira.FakeJira(fake_jira.Dataset(400, 5))
+    periods = get_rolling_periods("3x60/30", "2022-07-01")
+    fn = str(tmp_path / "report.txt")
+    with serve_fake_jira(fake) as url:
+        analysis = jira_analysis.JiraAnalysis(url, "user", "token", ["Backend"])
+        fake.reset_stats()
+        results = analysis.run_period_analyses(periods, ["priorities"], fn)
+        searches = fake.stats["searches"]
+        expected = []
+        for period in periods:
+            (alone,) = run_pipeline(
+                analysis.get_issues(
+                    analysis.get_issue_query(period["start"], period["end"], False)
+                ),
+                [ACCUMULATORS["priorities"]()],
+            )
+            expected.append(alone.report())
+
+        with pytest.raises(Exception, match="can't be run per period"):
+            analysis.run_period_analyses(periods, ["write_issues"], fn)
+
+    assert searches == fake.stats["searches"]
+    assert [accumulators[0].report() for accumulators in results] == expected
+    with open(fn, encoding="utf-8") as f:
+        report = f.read()
+    for period in periods:
+        assert (
+            "== %s (>= %s, < %s) =="
+            % (
+                period["name"],
+                period["start"],
+                period["end"],
+            )
+            in report
+        )
@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pytest
+
+from periods import (
+    bucket_dates,
+    get_rolling_periods,
+    load_calendar,
+    parse_jira_dates,
+    sum_by_period,
+)
+
+CALENDAR = [
+    {"name": "A", "start": "2022-01-10", "end": "2022-04-04"},
+    {"name": "B", "start": "2022-04-04", "end": "2022-07-01"},
+    {"name": "C", "start": "2022-08-01", "end": "2022-10-01"},
+]
+
+
+def test_jira_dates_are_read_as_utc():
+    dates = parse_jira_dates(
+        ["2022-04-03T22:30:00.000-0230", "2022-04-04T01:00:00.000+0100", None]
+    )
+    assert list(dates[:2]) == [
+        np.datetime64("2022-04-04T01:00:00.000"),
+        np.datetime64("2022-04-04T00:00:00.000"),
+    ]
+    assert np.isnat(dates[2])
+
+
+def test_dates_bucket_into_the_period_they_start_or_fall_in():
+    dates = parse_jira_dates(
+        [
+            "2022-01-09T23:59:00.000+0000",  # before the calendar
+            "2022-01-10T00:00:00.000+0000",
+            "2022-04-03T23:59:00.000+0000",
+            "2022-04-04T00:00:00.000+0000",
+            "2022-07-15T00:00:00.000+0000",  # between B and C
+            "2022-09-30T12:00:00.000+0000",
+            "2022-10-01T00:00:00.000+0000",  # after the calendar
+            None,
+        ]
+    )
+    assert list(bucket_dates(dates, CALENDAR)) == [-1, 0, 0, 1, -1, 2, -1, -1]
+    assert len(bucket_dates(parse_jira_dates([]), CALENDAR)) == 0
+
+
+def test_sums_by_group_and_period_skip_unbucketed_dates():
+    sums = sum_by_period(
+        np.array([0, 1, 0, 0]),
+        2,
+        np.array([0, 2, 0, -1]),
+        3,
+        np.array([3.0, 5.0, 2.0, 8.0]),
+    )
+    assert sums.tolist() == [[5.0, 0.0, 0.0], [0.0, 0.0, 5.0]]
+
+
+def test_calendar_file_is_sorted_and_checked_for_overlaps(tmp_path):
+    assert load_calendar() == load_calendar(None)
+
+    path = tmp_path / "periods.json"
+    path.write_text(json.dumps([CALENDAR[2], CALENDAR[0], CALENDAR[1]]))
+    assert [period["name"] for period in load_calendar(str(path))] == ["A", "B", "C"]
+
+    path.write_text(json.dumps([CALENDAR[0], dict(CALENDAR[1], start="2022-04-01")]))
+    with pytest.raises(Exception, match="Periods A and B overlap"):
+        load_calendar(str(path))
+    with pytest.raises(Exception, match="Unable to find"):
+        load_calendar(str(tmp_path / "missing.json"))
+
+
+def test_rolling_periods_end_at_the_end_date():
+    assert get_rolling_periods("2x14", "2022-03-01") == [
+        {
+            "name": "2022-02-01 to 2022-02-14",
+            "start": "2022-02-01",
+            "end": "2022-02-15",
+        },
+        {
+            "name": "2022-02-15 to 2022-02-28",
+            "start": "2022-02-15",
+            "end": "2022-03-01",
+        },
+    ]
+    assert [
+        period["start"] for period in get_rolling_periods("3x90/30", "2022-03-01")
+    ] == [
+        "2021-10-02",
+        "2021-11-01",
+        "2021-12-01",
+    ]
+    with pytest.raises(Exception, match="Can't parse"):
+        get_rolling_periods("six weeks", "2022-03-01")
+    with pytest.raises(Exception, match="positive"):
+        get_rolling_periods("0x14", "2022-03-01")
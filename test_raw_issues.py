@@ -0,0 +1,54 @@
+import pytest
+
+from jira import JIRA
+from jira.resources import Issue
+
+import fake_jira
+
+from jira_helper import RawResource, load_issues, search_raw_issues
+from stub_jira import FakeJiraClient
+
+
+def test_raw_issues_read_like_jira_issues():
+    options = dict(JIRA.DEFAULT_OPTIONS, server="http://fake")
+    dataset = fake_jira.Dataset(40, 5)
+    story_points = dataset.custom_fields["Story Points"]
+    sprint = dataset.custom_fields["Sprint"]
+    for raw in (dataset.issue(i, "http://fake") for i in range(1, 41)):
+        issue = Issue(options, None, raw=raw)
+        fast = RawResource(raw)
+        assert str(fast) == str(issue) == raw["key"]
+        for name in ("summary", "created", "resolutiondate", "labels", story_points):
+            assert getattr(fast.fields, name) == getattr(issue.fields, name)
+        # Nested objects print the name Jira's resources would
+        for name in ("status", "issuetype", "assignee"):
+            assert str(getattr(fast.fields, name)) == str(getattr(issue.fields, name))
+        sprints = getattr(fast.fields, sprint) or []
+        assert [s.name for s in sprints] == [
+            s.name for s in getattr(issue.fields, sprint) or []
+        ]
+
+
+def test_missing_raw_fields_are_attribute_errors():
+    fast = RawResource({"key": "TL-1", "fields": {"summary": "Fix it"}})
+    assert not hasattr(fast.fields, "labels")
+    assert getattr(fast.fields, "labels", None) is None
+    with pytest.raises(AttributeError, match="labels"):
+        fast.fields.labels
+
+
+def test_raw_search_and_stored_issues():
+    jira = FakeJiraClient(fake_jira.FakeJira(fake_jira.Dataset(40, 5)))
+    page = search_raw_issues(jira, 'project = "TL"', 10, 5, ["summary"])
+
+    assert (page.startAt, page.maxResults, page.total) == (10, 5, 40)
+    assert [str(issue) for issue in page] == [
+        "TL-30",
+        "TL-29",
+        "TL-28",
+        "TL-27",
+        "TL-26",
+    ]
+    assert list(page[0].raw["fields"]) == ["summary"]
+    loaded = list(load_issues(jira, [issue.raw for issue in page], raw=True))
+    assert [issue.raw for issue in loaded] == [issue.raw for issue in page]
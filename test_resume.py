@@ -0,0 +1,82 @@
+from itertools import islice
+
+from jira_helper import iter_synced_issues
+from jira_store import EpicRollupStore, IssueStore
+from stub_jira import QUERY, StubJira, make_issue
+
+
+# Records the offset of every page of issues it serves, leaving out the key-only
+# searches that prune the store
+class PagedStubJira(StubJira):
+    def __init__(self, issues):
+        super().__init__(issues)
+        self.offsets = []
+
+    def get(self, url, params):
+        if params.get("fields") != "key":
+            self.offsets.append(params["startAt"])
+        return super().get(url, params)
+
+
+def make_jira():
+    return PagedStubJira(
+        {"TL-%03d" % number: make_issue("Open") for number in range(250)}
+    )
+
+
+def fetch_keys(jira, store, resume=False, limit=None):
+    issues = iter_synced_issues(jira, store, QUERY, raw=True, resume=resume)
+    keys = [issue.raw["key"] for issue in islice(issues, limit)]
+    issues.close()
+    return keys
+
+
+def test_interrupted_fetch_resumes_from_its_last_page(tmp_path):
+    jira = make_jira()
+    store = IssueStore(str(tmp_path / "issues.db"))
+    # Stopped partway through the second page, so the first is checkpointed
+    assert len(fetch_keys(jira, store, limit=150)) == 150
+    assert store.get_checkpoint(QUERY)[2] == "1"
+
+    jira.offsets = []
+    keys = fetch_keys(jira, store, resume=True)
+
+    # The last page is fetched again in case issues left the query since
+    assert jira.offsets == [100, 200]
+    assert sorted(keys) == sorted(jira.issues)
+    assert store.get_checkpoint(QUERY) is None
+    assert store.get_last_sync(QUERY) is not None
+
+
+def test_interrupted_fetch_starts_over_without_resume(tmp_path):
+    jira = make_jira()
+    store = IssueStore(str(tmp_path / "issues.db"))
+    fetch_keys(jira, store, limit=150)
+
+    jira.offsets = []
+    keys = fetch_keys(jira, store)
+
+    assert jira.offsets == [0, 100, 200]
+    assert sorted(keys) == sorted(jira.issues)
+
+
+def test_write_plan_skips_written_epics_and_replans_moved_ones(tmp_path):
+    store = EpicRollupStore(str(tmp_path / "issues.db"))
+    targets = {
+        "TL-E1": {"customfield_1": 5.0},
+        "TL-E2": {"customfield_1": 3.0},
+        "TL-E3": {"customfield_1": 1.0},
+        "TL-E4": {"customfield_1": 8.0},
+    }
+    changes = {epic: targets[epic] for epic in ("TL-E1", "TL-E2", "TL-E4")}
+    store.save_write_plan(QUERY, targets, changes)
+    store.mark_written(QUERY, ["TL-E1"])
+
+    # TL-E4's rollup moved while the run was stopped
+    resumed = dict(targets, **{"TL-E4": {"customfield_1": 9.0}})
+    written, unwritten = store.get_write_plan(QUERY, resumed)
+
+    assert written == {"TL-E1", "TL-E3"}
+    assert unwritten == {"TL-E2": {"customfield_1": 3.0}}
+    store.clear_write_plan(QUERY)
+    assert store.get_write_plan(QUERY, resumed) == (set(), {})
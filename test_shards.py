@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import fake_jira
+
+from jira_helper import (
+    fetch_all_pages,
+    get_date_range,
+    iter_sharded_issues,
+    plan_shards,
+    shard_query,
+)
+from stub_jira import FakeJiraClient
+
+QUERY = 'project = "TL" AND resolutiondate >= "2022-02-01"'
+
+
+def test_date_range_comes_from_the_query():
+    assert get_date_range(
+        'project = "TL" AND resolutiondate >= "2022-02-01"'
+        ' AND resolutiondate <= "2022-03-01 12:00"'
+    ) == ("resolutiondate", datetime(2022, 2, 1), datetime(2022, 3, 1, 12, 1))
+    field, start, end = get_date_range('created >= "2022/02/01"')
+    assert (field, start) == ("created", datetime(2022, 2, 1))
+    assert end > datetime.now()
+    assert get_date_range('project = "TL" AND created >= "-1w"') is None
+    assert get_date_range('project = "TL"') is None
+
+
+def test_sharded_fetch_returns_every_issue_once():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(2000, 10))
+    jira = FakeJiraClient(fake)
+    expected = fake.dataset.issue_numbers(QUERY)
+    positions = []
+
+    keys = [
+        issue.key
+        for issue in iter_sharded_issues(
+            jira,
+            QUERY,
+            4,
+            ["key"],
+            raw=True,
+            shard_size=100,
+            on_progress=positions.append,
+        )
+    ]
+
+    assert sorted(keys) == sorted("TL-%d" % i for i in expected)
+    # Shards come newest first, each reported once it's handled
+    assert len(positions) > 1
+    assert positions == sorted(positions, reverse=True)
+
+    # Carrying on from a shard only fetches what's before it
+    before = positions[len(positions) // 2]
+    rest = {
+        issue.key
+        for issue in iter_sharded_issues(
+            jira, QUERY, 4, ["key"], raw=True, shard_size=100, before=before
+        )
+    }
+    assert rest == {
+        "TL-%d" % i
+        for i in fake.dataset.issue_numbers(
+            shard_query(QUERY, "resolutiondate", datetime(2022, 2, 1), before)
+        )
+    }
+
+
+def test_shard_planning_is_capped():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(2000, 10))
+    jira = FakeJiraClient(fake)
+    start, end = datetime(2022, 2, 1), datetime(2022, 4, 1)
+    expected = {
+        "TL-%d" % i
+        for i in fake.dataset.issue_numbers(
+            shard_query(QUERY, "resolutiondate", start, end)
+        )
+    }
+    executor = ThreadPoolExecutor(max_workers=4)
+
+    # One issue per shard would split down to the minute without the caps
+    for max_counts, min_width in ((20, timedelta(hours=1)), (200, timedelta(days=7))):
+        fake.reset_stats()
+        shards = plan_shards(
+            jira,
+            QUERY,
+            "resolutiondate",
+            start,
+            end,
+            1,
+            executor,
+            min_width,
+            max_counts,
+        )
+        assert fake.stats["searches"] <= max_counts
+        assert all(
+            shard_end - shard_start >= min_width for shard_start, shard_end in shards
+        )
+        # Shards that are still too big are paged through
+        keys = set()
+        for shard in shards:
+            issues = fetch_all_pages(
+                jira, shard_query(QUERY, "resolutiondate", *shard), 1, ["key"], raw=True
+            )
+            keys.update(issue.key for issue in issues)
+        assert keys == expected
+    executor.shutdown()
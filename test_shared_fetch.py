@@ -0,0 +1,56 @@
+import fake_jira
+import jira_analysis
+import jira_epic_stories
+
+from jira_combined import ANALYSES, fetch_shared_issues
+from stub_jira import serve_fake_jira
+
+
+def keys(issues):
+    return sorted(str(issue) for issue in issues)
+
+
+def test_one_fetch_splits_into_both_scripts_issues():
+    fake = fake_jira.FakeJira(fake_jira.Dataset(2000, 5))
+    with serve_fake_jira(fake) as url:
+        analysis = jira_analysis.JiraAnalysis(
+            url, "user", "token", ["Backend"], analyses=ANALYSES
+        )
+        epic_analysis = jira_epic_stories.JiraAnalysis(
+            url, "user", "token", ["Backend"]
+        )
+        query = analysis.get_issue_query("2022-03-01", "2022-05-31")
+        epic_query = epic_analysis.get_issue_query("2022-03-01", "2022-05-31", True)
+
+        fake.reset_stats()
+        issues, epic_issues = fetch_shared_issues(
+            analysis, epic_analysis, query, epic_query
+        )
+        shared = fake.stats["issues_served"]
+        fake.reset_stats()
+        analysis.get_issues(query)
+        epic_analysis.get_issues(epic_query)
+
+    # The fake only filters by date so the statuses, types and epics the
+    # queries filter by are checked on the generated issues
+    dataset = fake.dataset
+    epic_link = dataset.custom_fields["Epic Link"]
+    expected = [
+        "TL-%d" % i
+        for i in dataset.issue_numbers(query)
+        if dataset.issue(i, "")["fields"]["status"]["name"] == "Done"
+    ]
+    expected_epic = [
+        "TL-%d" % i
+        for i in dataset.issue_numbers(epic_query)
+        if dataset.issue(i, "")["fields"][epic_link]
+    ]
+
+    assert issues and epic_issues
+    assert keys(issues) == sorted(expected)
+    assert keys(epic_issues) == sorted(expected_epic)
+    # Issues both queries match are only fetched once
+    assert shared < fake.stats["issues_served"]
+    # Each side gets the records its own analyses read
+    assert all(issue.created for issue in epic_issues)
+    assert all(issue.resolutiondate for issue in issues)
@@ -0,0 +1,68 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from analysis_pipeline import TermAccumulator
+from text_terms import TermStore, count_terms, get_months, prune, tokenize
+
+
+def test_months_of_any_jql_date_range():
+    assert get_months("2022-11-15", "2023-01-01") == ["2022-11", "2022-12", "2023-01"]
+    assert get_months("2022/11/30 23:00", "2022-12-01 08:00") == ["2022-11", "2022-12"]
+    with pytest.raises(ValueError, match="Nov 2022"):
+        get_months("Nov 2022", "2022-12-01")
+
+
+def test_tokenize_drops_markup_stopwords_and_numbers():
+    text = (
+        "The login page {code}{color:red} fails for [~ann], see "
+        "https://example.com/x and !screen.png! after 2 retries"
+    )
+    assert tokenize(text) == ["login", "page", "fails", "see", "after", "retries"]
+    assert tokenize(None) == []
+
+
+def test_count_terms_by_ngram():
+    counts = count_terms(["login page fails", "login page"])
+    assert counts[1] == Counter({"login": 2, "page": 2, "fails": 1})
+    assert counts[2] == Counter({"login page": 2, "page fails": 1})
+
+
+def test_prune_keeps_the_most_common_terms_once_grown():
+    counter = Counter({"a": 5, "b": 4, "c": 3, "d": 2, "e": 1})
+    assert prune(counter, max_terms=3) is counter
+    counter["f"] = 1
+    counter["g"] = 1
+    assert set(prune(counter, max_terms=3)) == {"a", "b", "c"}
+
+
+def test_terms_are_counted_per_resolution_month():
+    terms = TermAccumulator(batch_size=2)
+    for date, summary in [
+        ("2022-03-01T10:00:00.000+0000", "login fails"),
+        ("2022-03-20T10:00:00.000+0000", "login slow"),
+        ("2022-04-02T10:00:00.000+0000", "export fails"),
+        (None, "login"),
+    ]:
+        terms.add(SimpleNamespace(resolutiondate=date, summary=summary, description=""))
+    terms.finish()
+
+    assert sorted(terms.counts) == ["2022-03", "2022-04"]
+    assert terms.counts["2022-03"][1] == Counter({"login": 2, "fails": 1, "slow": 1})
+    assert terms.counts["2022-04"][2] == Counter({"export fails": 1})
+
+
+def test_store_replaces_periods_and_sums_over_a_range(tmp_path):
+    store = TermStore(str(tmp_path / "terms.db"))
+    store.replace_periods(
+        {
+            "2022-03": {1: Counter({"login": 2, "fails": 1})},
+            "2022-04": {1: Counter({"fails": 2})},
+        }
+    )
+    store.replace_periods({"2022-04": {1: Counter({"export": 1})}})
+
+    assert store.top_terms() == [("login", 2), ("export", 1), ("fails", 1)]
+    assert store.top_terms(start_period="2022-04") == [("export", 1)]
+    assert store.top_terms(end_period="2022-03", limit=1) == [("login", 2)]
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+from analysis_pipeline import TrendAccumulator
+from trends import TrendCube, get_week_range, pivot
+
+
+def make_issue(resolutiondate, team="core", story_points=None, sprints=()):
+    return SimpleNamespace(
+        resolutiondate=resolutiondate,
+        team=team,
+        assignee="ann",
+        issue_type="story",
+        investment_area=["platform"],
+        story_points=story_points,
+        sprints=sprints,
+    )
+
+
+def test_week_range_covers_whole_weeks_of_any_jql_date():
+    assert get_week_range("2022-03-02", "2022-03-09") == ("2022-02-28", "2022-03-14")
+    assert get_week_range("2022-03-02 10:00", "2022/03/09 23:59") == (
+        "2022-02-28",
+        "2022-03-14",
+    )
+    with pytest.raises(ValueError, match="03-02-2022"):
+        get_week_range("03-02-2022", "2022-03-09")
+
+
+def test_trend_cells_sum_by_resolution_week():
+    trends = TrendAccumulator()
+    trends.add(make_issue("2022-03-01T10:00:00.000+0000", story_points=3, sprints=[1]))
+    trends.add(
+        make_issue("2022-03-06T23:00:00.000+0000", story_points=2, sprints=[1, 2])
+    )
+    trends.add(make_issue("2022-03-07T09:00:00.000+0000", team="web"))
+    trends.add(make_issue(None, story_points=8))
+
+    assert dict(trends.cells) == {
+        ("2022-02-28", "core", "ann", "story", "platform"): [2, 5.0, 3],
+        ("2022-03-07", "web", "ann", "story", "platform"): [1, 0.0, 0],
+    }
+
+
+def test_cube_replaces_only_the_weeks_rebuilt(tmp_path):
+    cube = TrendCube(str(tmp_path / "trends.db"))
+    cube.replace_weeks(
+        "2022-02-28",
+        "2022-03-14",
+        {
+            ("2022-02-28", "core", "ann", "story", ""): [2, 5.0, 3],
+            ("2022-03-07", "web", "ann", "story", ""): [1, 1.0, 1],
+        },
+    )
+    cube.replace_weeks(
+        "2022-03-07",
+        "2022-03-14",
+        {
+            ("2022-03-07", "core", "ann", "bug", ""): [4, 2.0, 4],
+            # Outside the rebuilt range, so it's not stored
+            ("2022-03-14", "core", "ann", "bug", ""): [9, 9.0, 9],
+        },
+    )
+
+    assert cube.query("issues", ["team"]) == [
+        ("2022-02-28", "core", 2),
+        ("2022-03-07", "core", 4),
+    ]
+    assert cube.query("story_points", start_week="2022-03-07") == [("2022-03-07", 2.0)]
+    assert cube.query("sprints", filters={"issue_type": "story"}) == [("2022-02-28", 3)]
+    assert cube.get_last_week() == "2022-03-07"
+    with pytest.raises(Exception, match="Unknown dimension"):
+        cube.query("issues", ["epic"])
+
+
+def test_pivot_fills_missing_weeks_with_zero():
+    rows = [("2022-02-28", "core", 2), ("2022-03-07", "web", 1)]
+    assert pivot(rows, 1) == [
+        "week\tcore\tweb",
+        "2022-02-28\t2\t0",
+        "2022-03-07\t0\t1",
+    ]
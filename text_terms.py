@@ -0,0 +1,193 @@
+#! /usr/bin/env python
+
+import re
+import sys
+import time
+import getopt
+import logging
+import sqlite3
+
+from collections import Counter
+from itertools import chain
+
+from issue_query import read_date
+from util import get_conf_or_env, read_config_file
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("text-terms")
+
+NGRAMS = (1, 2)
+# Distinct terms kept per period and n-gram size, the rarest are dropped past that
+MAX_TERMS = 50000
+# Texts handed to a worker process at a time
+BATCH_SIZE = 2000
+
+STOPWORDS = frozenset(
+    """a an and are as at be but by for from has have i if in into is it its of on
+    or so that the this to was we were will with not no can should would when
+    then than there these those they them our you your""".split()
+)
+
+MARKUP = re.compile(
+    r"https?://\S+|\{(?:code|noformat|quote|color)[^}]*\}|\[~[^\]]*\]|!\S+!"
+)
+TOKEN = re.compile(r"[a-z0-9][a-z0-9_'-]*[a-z0-9]|[a-z]")
+
+TERM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS term_counts (
+    period TEXT NOT NULL,
+    ngram INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (period, ngram, term)
+);
+"""
+
+
+# Lowercase words of a description or summary, without Jira markup, links,
+# mentions, stopwords or bare numbers
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token
+        for token in TOKEN.findall(MARKUP.sub(" ", text.lower()))
+        if token not in STOPWORDS and not token.isdigit()
+    ]
+
+
+# Term counts per n-gram size for a batch of texts. Runs in the worker processes
+# so it only takes and returns plain data
+def count_terms(texts, ngrams=NGRAMS):
+    token_lists = [tokenize(text) for text in texts]
+    counts = {}
+    for n in ngrams:
+        if n == 1:
+            counts[n] = Counter(chain.from_iterable(token_lists))
+        else:
+            counts[n] = Counter(
+                chain.from_iterable(
+                    map(" ".join, zip(*(tokens[i:] for i in range(n))))
+                    for tokens in token_lists
+                )
+            )
+    return counts
+
+
+# Keep a counter to its max_terms most common terms once it has grown to twice
+# that, so memory stays bounded however many texts go through it. Terms that
+# were dropped and come back start counting again, so tail counts are a lower
+# bound while the common terms stay accurate
+def prune(counter, max_terms=MAX_TERMS):
+    if len(counter) <= 2 * max_terms:
+        return counter
+    return Counter(dict(counter.most_common(max_terms)))
+
+
+# Monthly term counts (e.g. 2022-03 by resolution date) so term analysis over
+# any range of months combines stored counts instead of tokenizing again
+class TermStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(TERM_SCHEMA)
+
+    # Replace the periods' counts, counts are {period: {ngram: Counter}}
+    def replace_periods(self, counts):
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM term_counts WHERE period = ?",
+                [(period,) for period in counts],
+            )
+            self.conn.executemany(
+                "INSERT INTO term_counts VALUES (?, ?, ?, ?)",
+                [
+                    (period, n, term, count)
+                    for period, ngram_counts in counts.items()
+                    for n, counter in ngram_counts.items()
+                    for term, count in counter.items()
+                ],
+            )
+        logger.info("Stored term counts for %s", ", ".join(sorted(counts)))
+
+    # The most common terms over [start_period, end_period]
+    def top_terms(self, ngram=1, start_period=None, end_period=None, limit=50):
+        conditions = ["ngram = ?"]
+        params = [ngram]
+        if start_period:
+            conditions.append("period >= ?")
+            params.append(start_period)
+        if end_period:
+            conditions.append("period <= ?")
+            params.append(end_period)
+        return self.conn.execute(
+            """SELECT term, SUM(count) AS total FROM term_counts WHERE %s
+            GROUP BY term ORDER BY total DESC, term LIMIT ?"""
+            % " AND ".join(conditions),
+            params + [limit],
+        ).fetchall()
+
+
+# Months are named like 2022-03
+def get_month(date):
+    return date[:7]
+
+
+# The month after one like 2022-12
+def get_next_month(month):
+    year, number = int(month[:4]), int(month[5:7])
+    if number == 12:
+        return "%04d-01" % (year + 1)
+    return "%04d-%02d" % (year, number + 1)
+
+
+# Every month a date range touches, the range can end partway through a month
+# and its dates can be any date JQL reads
+def get_months(start_date, end_date):
+    end_month = read_date(end_date).strftime("%Y-%m")
+    months = [read_date(start_date).strftime("%Y-%m")]
+    while get_next_month(months[-1]) <= end_month:
+        months.append(get_next_month(months[-1]))
+    return months
+
+
+if __name__ == "__main__":
+    config_data = read_config_file("config.env")
+    store_file = get_conf_or_env("JIRA_TERM_STORE", config_data) or "jira_terms.db"
+    ngram = 1
+    start_period = None
+    end_period = None
+    limit = 50
+
+    usage = (
+        "text_terms.py [--store <file>] [--ngram 1|2] [--start <yyyy-mm>] "
+        "[--end <yyyy-mm>] [--top <count>]"
+    )
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:], "h", ["store=", "ngram=", "start=", "end=", "top="]
+        )
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(usage)
+            sys.exit()
+        elif opt == "--store":
+            store_file = arg
+        elif opt == "--ngram":
+            ngram = int(arg)
+        elif opt == "--start":
+            start_period = arg
+        elif opt == "--end":
+            end_period = arg
+        elif opt == "--top":
+            limit = int(arg)
+
+    start = time.time()
+    terms = TermStore(store_file).top_terms(ngram, start_period, end_period, limit)
+    logger.info("Combined stored term counts in %.1fms", (time.time() - start) * 1000)
+    for term, count in terms:
+        print("%s\t%s" % (term, count))
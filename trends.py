@@ -0,0 +1,208 @@
+#! /usr/bin/env python
+
+import sys
+import time
+import getopt
+import logging
+import sqlite3
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from issue_query import read_date
+from util import get_conf_or_env, read_config_file
+
+FORMAT = "%(asctime)-15s %(message)s"
+logging.basicConfig(format=FORMAT, level=logging.DEBUG)
+logger = logging.getLogger("trends")
+
+DIMENSIONS = ["team", "assignee", "issue_type", "investment_area"]
+MEASURES = ["issues", "story_points", "sprints"]
+
+TREND_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trend_cube (
+    week TEXT NOT NULL,
+    team TEXT NOT NULL,
+    assignee TEXT NOT NULL,
+    issue_type TEXT NOT NULL,
+    investment_area TEXT NOT NULL,
+    issues INTEGER NOT NULL,
+    story_points REAL NOT NULL,
+    sprints INTEGER NOT NULL,
+    PRIMARY KEY (week, team, assignee, issue_type, investment_area)
+);
+"""
+
+
+# Weeks start on Monday and are named by that day
+def get_week(date):
+    return (date - timedelta(days=date.weekday())).strftime("%Y-%m-%d")
+
+
+# The whole weeks covering a date range as [start_week, end_week), end_date is
+# inclusive like the scripts' date ranges and can be any date JQL reads
+def get_week_range(start_date, end_date):
+    start = read_date(start_date)
+    end = read_date(end_date) + timedelta(days=7)
+    return get_week(start), get_week(end)
+
+
+# Weekly aggregates of resolved issues by team, assignee, issue type and
+# investment area, with the number of issues, their story points and the
+# sprints they took. Cells are built by the trends accumulator and a range of
+# whole weeks is replaced at a time, so trend queries read the cube instead of
+# going back to the issues
+class TrendCube:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(TREND_SCHEMA)
+
+    # Replace the weeks in [start_week, end_week) with the cells built for them,
+    # cells are keyed by (week, team, assignee, issue type, investment area)
+    # with [issues, story points, sprints] values
+    def replace_weeks(self, start_week, end_week, cells):
+        rows = [
+            key + tuple(values)
+            for key, values in cells.items()
+            if start_week <= key[0] < end_week
+        ]
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM trend_cube WHERE week >= ? AND week < ?",
+                (start_week, end_week),
+            )
+            self.conn.executemany(
+                "INSERT INTO trend_cube VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        logger.info(
+            "Stored %d trend cells for the weeks from %s to before %s",
+            len(rows),
+            start_week,
+            end_week,
+        )
+
+    # Sum a measure per week and group over [start_week, end_week), optionally
+    # only for cells matching filters ({dimension: value}). Returns rows of
+    # (week, *group values, total) ordered by week
+    def query(self, measure, group_by=(), start_week=None, end_week=None, filters=None):
+        if measure not in MEASURES:
+            raise Exception(
+                "Unknown measure %s, pick from %s" % (measure, ", ".join(MEASURES))
+            )
+        filters = filters or {}
+        for dimension in list(group_by) + list(filters):
+            if dimension not in DIMENSIONS:
+                raise Exception(
+                    "Unknown dimension %s, pick from %s"
+                    % (dimension, ", ".join(DIMENSIONS))
+                )
+
+        conditions = []
+        params = []
+        if start_week:
+            conditions.append("week >= ?")
+            params.append(start_week)
+        if end_week:
+            conditions.append("week < ?")
+            params.append(end_week)
+        for dimension, value in filters.items():
+            conditions.append("%s = ?" % dimension)
+            params.append(value)
+
+        columns = ", ".join(["week"] + list(group_by))
+        return self.conn.execute(
+            "SELECT %s, SUM(%s) FROM trend_cube %s GROUP BY %s ORDER BY week"
+            % (
+                columns,
+                measure,
+                "WHERE " + " AND ".join(conditions) if conditions else "",
+                columns,
+            ),
+            params,
+        ).fetchall()
+
+    # Most recent week in the cube, None if it's empty
+    def get_last_week(self):
+        return self.conn.execute("SELECT MAX(week) FROM trend_cube").fetchone()[0]
+
+
+# A week by group table from query rows, weeks without a cell are 0
+def pivot(rows, num_groups):
+    table = defaultdict(dict)
+    groups = set()
+    for row in rows:
+        group = " / ".join(str(value) or "None" for value in row[1 : 1 + num_groups])
+        table[row[0]][group] = row[-1]
+        groups.add(group)
+    groups = sorted(groups)
+    lines = ["\t".join(["week"] + groups)]
+    for week in sorted(table):
+        lines.append(
+            "\t".join([week] + [str(table[week].get(group, 0)) for group in groups])
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    config_data = read_config_file("config.env")
+    cube_file = get_conf_or_env("JIRA_TREND_CUBE", config_data) or "jira_trends.db"
+    measure = "story_points"
+    group_by = ["team"]
+    num_weeks = 52
+    end_date = None
+    filters = {}
+
+    usage = (
+        "trends.py [--cube <file>] [--measure issues|story_points|sprints] "
+        "[--by <dimension,dimension>] [--weeks <count>] [--end <date>] "
+        "[--filter <dimension>=<value>]"
+    )
+    try:
+        opts, args = getopt.getopt(
+            sys.argv[1:],
+            "h",
+            ["cube=", "measure=", "by=", "weeks=", "end=", "filter="],
+        )
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-h":
+            print(usage)
+            print("Dimensions: %s" % ", ".join(DIMENSIONS))
+            sys.exit()
+        elif opt == "--cube":
+            cube_file = arg
+        elif opt == "--measure":
+            measure = arg
+        elif opt == "--by":
+            group_by = [dimension for dimension in arg.split(",") if dimension]
+        elif opt == "--weeks":
+            num_weeks = int(arg)
+        elif opt == "--end":
+            end_date = arg
+        elif opt == "--filter":
+            dimension, value = arg.split("=", 1)
+            filters[dimension] = value
+
+    cube = TrendCube(cube_file)
+    if end_date:
+        end_week = get_week_range(end_date, end_date)[1]
+    else:
+        last_week = cube.get_last_week()
+        if last_week is None:
+            logger.error(
+                "%s is empty, build it with jira_analysis.py --trends", cube_file
+            )
+            sys.exit(1)
+        end_week = get_week_range(last_week, last_week)[1]
+    start_week = get_week(
+        datetime.strptime(end_week, "%Y-%m-%d") - timedelta(days=7 * num_weeks)
+    )
+
+    start = time.time()
+    rows = cube.query(measure, group_by, start_week, end_week, filters)
+    logger.info("Queried %d cells in %.1fms", len(rows), (time.time() - start) * 1000)
+    for line in pivot(rows, len(group_by)):
+        print(line)
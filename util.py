@@ -1,7 +1,13 @@
 #! /usr/bin/env python
 
 import os
+import json
+import time
 import logging
+import threading
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
 
 FORMAT = "%(asctime)-15s %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.DEBUG)
@@ -47,3 +53,127 @@ def read_config_file(filepath):
     else:
         logger.warn("Unable to find config file at %s", filepath)
     return out
+
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+# Set the log level for the whole run from LOG_LEVEL (defaults to DEBUG, also
+# when it's set but empty). Hot paths log with %-style arguments so nothing is
+# formatted below the level
+def configure_logging(config_map):
+    level = (get_conf_or_env("LOG_LEVEL", config_map) or "DEBUG").strip().upper()
+    if level not in LOG_LEVELS:
+        raise Exception(
+            "Unknown LOG_LEVEL %s, use one of %s" % (level, ", ".join(LOG_LEVELS))
+        )
+    logging.getLogger().setLevel(getattr(logging, level))
+
+
+# Timings of the phases of a run (field lookup, fetch, analysis, CSV write, epic
+# update, Slack post, Sheets read) and counters for API calls, bytes, retries and
+# cache hits, shared by everything in the process
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.spans = defaultdict(lambda: [0, 0.0])
+        self.counters = Counter()
+
+    # Time a phase, nested and repeated spans each add to their own total. Spans
+    # run in worker threads add up their time so they can exceed the runtime
+    @contextmanager
+    def span(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, time.time() - start)
+
+    def record(self, name, seconds):
+        with self.lock:
+            span = self.spans[name]
+            span[0] += 1
+            span[1] += seconds
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def summary(self):
+        with self.lock:
+            return {
+                "runtime_seconds": round(time.time() - self.started, 3),
+                "spans": {
+                    name: {"count": count, "seconds": round(seconds, 3)}
+                    for name, (count, seconds) in sorted(self.spans.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    # The summary in the Prometheus text format for node_exporter's textfile
+    # collector
+    def prometheus(self, script, summary=None):
+        summary = summary or self.summary()
+        labels = 'script="%s"' % script
+        lines = [
+            "# TYPE automating_management_runtime_seconds gauge",
+            "automating_management_runtime_seconds{%s} %s"
+            % (labels, summary["runtime_seconds"]),
+            "# TYPE automating_management_span_seconds gauge",
+        ]
+        for name, span in summary["spans"].items():
+            lines.append(
+                'automating_management_span_seconds{%s,span="%s"} %s'
+                % (labels, name, span["seconds"])
+            )
+        lines.append("# TYPE automating_management_span_count gauge")
+        for name, span in summary["spans"].items():
+            lines.append(
+                'automating_management_span_count{%s,span="%s"} %s'
+                % (labels, name, span["count"])
+            )
+        lines.append("# TYPE automating_management_count gauge")
+        for name, value in summary["counters"].items():
+            lines.append(
+                'automating_management_count{%s,name="%s"} %s' % (labels, name, value)
+            )
+        return "\n".join(lines) + "\n"
+
+    # Log the summary and write it to METRICS_FILE (JSON) and METRICS_PROM_FILE
+    # (Prometheus textfile) when they're set
+    def write(self, script, config_map):
+        summary = self.summary()
+        logger.info("Metrics for %s: %s", script, json.dumps(summary))
+        json_file = get_conf_or_env("METRICS_FILE", config_map)
+        if json_file:
+            write_atomic(json_file, json.dumps(dict(summary, script=script), indent=2))
+        prom_file = get_conf_or_env("METRICS_PROM_FILE", config_map)
+        if prom_file:
+            write_atomic(prom_file, self.prometheus(script, summary))
+        return summary
+
+
+# Write through a temporary file so readers never see half a file
+def write_atomic(filepath, data):
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, filepath)
+
+
+METRICS = Metrics()
+
+
+# Count every call a requests session makes, the bytes it gets back and the
+# throttled or failed responses that get retried
+def instrument_session(session, prefix):
+    def count_response(response, *args, **kwargs):
+        METRICS.incr(prefix + "_api_calls")
+        METRICS.incr(prefix + "_bytes_received", len(response.content or b""))
+        if response.status_code == 429 or response.status_code >= 500:
+            METRICS.incr(prefix + "_retryable_responses")
+        return response
+
+    session.hooks["response"].append(count_response)
+    return session